@@ -1,17 +1,25 @@
 from datetime import datetime, timedelta
 from typing import Optional
+import hashlib
+import hmac
+import time
 import bcrypt
 import jwt
-from fastapi import HTTPException, Security, Depends
+from cachetools import TLRUCache
+from fastapi import HTTPException, Security, Depends, Header, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 import os
 from dotenv import load_dotenv
 
+from metrics import register
+
 load_dotenv()
 
 JWT_SECRET = os.getenv("JWT_SECRET", "default_secret_key")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-JWT_EXPIRATION_MINUTES = int(os.getenv("JWT_EXPIRATION_MINUTES", 10080))
+JWT_EXPIRATION_MINUTES = int(os.getenv("JWT_EXPIRATION_MINUTES", 15))  # clients renew via /auth/refresh
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", 10000))  # 0 disables the verified-token cache
 
 security = HTTPBearer()
 
@@ -50,13 +58,93 @@ def decode_token(token: str) -> dict:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
+class VerifiedTokenCache:
+    """Bounded LRU of already verified tokens, keyed by token digest and dropped at the token's exp"""
+
+    def __init__(self, size: int = JWT_CACHE_SIZE):
+        self._cache = TLRUCache(maxsize=size, ttu=lambda _key, payload, _now: payload.get('exp', 0), timer=time.time) if size else None
+        self.hits = 0
+        self.misses = 0
+
+    def verify(self, token: str) -> dict:
+        if self._cache is None:
+            return decode_token(token)
+        key = hashlib.sha256(token.encode('utf-8')).digest()
+        payload = self._cache.get(key)
+        if payload is not None:
+            self.hits += 1
+            return payload
+        self.misses += 1
+        payload = decode_token(token)
+        self._cache[key] = payload
+        return payload
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self._cache is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "cached": len(self._cache) if self._cache is not None else 0,
+        }
+
+
+token_cache = VerifiedTokenCache()
+register("jwt_cache", token_cache.stats)
+
+
+class RevocationList:
+    """In-memory set of revoked session ids, kept in sync with Mongo by token_service"""
+
+    def __init__(self):
+        self._revoked = {}  # sid -> epoch seconds after which its access tokens have expired anyway
+        self.refreshed_at = None
+
+    def __contains__(self, sid) -> bool:
+        return sid is not None and sid in self._revoked
+
+    def add(self, sid: str, expires_at: float):
+        self._revoked[sid] = expires_at
+
+    def replace(self, revoked: dict):
+        # Sessions revoked locally since the load started stay revoked
+        now = time.time()
+        merged = {sid: exp for sid, exp in self._revoked.items() if exp > now}
+        merged.update(revoked)
+        self._revoked = merged
+        self.refreshed_at = datetime.utcnow()
+
+    def stats(self) -> dict:
+        return {
+            "revoked_sessions": len(self._revoked),
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+        }
+
+
+revoked_sessions = RevocationList()
+register("revocations", revoked_sessions.stats)
+
+
+def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
     """Get current user from JWT token"""
-    token = credentials.credentials
-    payload = decode_token(token)
+    # Batch sub-requests reuse the token already decoded for the batch
+    payload = getattr(request.state, "auth_payload", None)
+    if payload is not None:
+        return payload
+    payload = token_cache.verify(credentials.credentials)
+    if payload.get('sid') in revoked_sessions:
+        raise HTTPException(status_code=401, detail="Session has been revoked")
+    request.state.auth_payload = payload
     return payload
 
 
+def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """Allow the request only with the configured X-Admin-Key; admin routes are closed when it is unset"""
+    if not ADMIN_API_KEY or not x_admin_key or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+
 def generate_member_id() -> str:
     """Generate a unique member ID"""
     import random
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import os
+import time
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel, Field
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", 20))
+
+# Request headers passed from the batch request to every sub-request
+FORWARDED_HEADERS = {b"authorization", b"accept-language", b"user-agent", b"x-forwarded-for"}
+
+# Response headers copied into each sub-response
+RETURNED_HEADERS = {b"etag", b"x-next-cursor", b"cache-control", b"retry-after"}
+
+# Paths that make no sense inside a batch: recursion and binary downloads
+EXCLUDED_PREFIXES = ("/api/batch", "/api/blobs/")
+
+
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = None  # echoed back so the client can match responses
+    method: str = "GET"
+    path: str  # e.g. /api/vehicles?limit=20
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., min_length=1, max_length=BATCH_MAX_REQUESTS)
+
+
+class BatchSubResponse(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: dict = {}
+    duration_ms: float
+    body: Optional[object] = None
+
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
+    duration_ms: float
+
+
+def _error(sub: BatchSubRequest, status: int, detail: str) -> bytes:
+    return json.dumps({
+        "id": sub.id, "status": status, "headers": {}, "duration_ms": 0.0, "body": {"detail": detail}
+    }).encode('utf-8')
+
+
+async def _dispatch(app, parent_scope: dict, state: dict, sub: BatchSubRequest) -> bytes:
+    """Run one GET through the ASGI app in-process and return its serialized sub-response"""
+    if sub.method.upper() != "GET":
+        return _error(sub, 405, "Only GET requests can be batched")
+    url = urlsplit(sub.path)
+    if not url.path.startswith("/api/") or url.path.startswith(EXCLUDED_PREFIXES):
+        return _error(sub, 400, "Path cannot be batched")
+
+    scope = {
+        "type": "http",
+        "asgi": parent_scope.get("asgi", {"version": "3.0"}),
+        "http_version": parent_scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": parent_scope.get("scheme", "http"),
+        "server": parent_scope.get("server"),
+        "client": parent_scope.get("client"),
+        "root_path": parent_scope.get("root_path", ""),
+        "path": url.path,
+        "raw_path": url.path.encode('utf-8'),
+        "query_string": url.query.encode('utf-8'),
+        "headers": [(k, v) for k, v in parent_scope["headers"] if k in FORWARDED_HEADERS],
+        # Shared per-batch state: the decoded token and user record are reused by every sub-request
+        "state": dict(state),
+    }
+
+    status = 500
+    headers = {}
+    chunks = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            for name, value in message.get("headers", []):
+                if name in RETURNED_HEADERS:
+                    headers[name.decode('latin-1')] = value.decode('latin-1')
+                elif name == b"content-type":
+                    headers["content-type"] = value.decode('latin-1')
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    started = time.perf_counter()
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # ServerErrorMiddleware has already sent its 500 body; don't fail the whole batch
+        status = 500
+    duration_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    body = b"".join(chunks)
+    is_json = headers.pop("content-type", "").startswith("application/json")
+    if not body:
+        body = b"null"
+    elif not is_json:
+        body = json.dumps(body.decode('utf-8', errors='replace')).encode('utf-8')
+
+    # The sub-response body is already JSON, so it is spliced in rather than parsed and re-encoded
+    head = json.dumps({"id": sub.id, "status": status, "headers": headers, "duration_ms": duration_ms})
+    return head[:-1].encode('utf-8') + b', "body": ' + body + b"}"
+
+
+async def run_batch(app, parent_scope: dict, state: dict, requests: List[BatchSubRequest]) -> bytes:
+    """Run every sub-request concurrently; returns the serialized BatchResponse body"""
+    started = time.perf_counter()
+    parts = await asyncio.gather(*[_dispatch(app, parent_scope, state, sub) for sub in requests])
+    duration_ms = round((time.perf_counter() - started) * 1000, 2)
+    return b'{"responses": [' + b", ".join(parts) + b'], "duration_ms": ' + str(duration_ms).encode('ascii') + b"}"
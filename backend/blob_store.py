@@ -0,0 +1,261 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+BLOB_BACKEND = os.getenv("BLOB_BACKEND", "filesystem")  # filesystem or gridfs
+BLOB_STORAGE_PATH = Path(os.getenv("BLOB_STORAGE_PATH", Path(__file__).parent / "blobs"))
+# Prefix for blob URLs in responses; when empty they are server-relative and clients resolve them against the API URL
+BLOB_PUBLIC_BASE_URL = os.getenv("BLOB_PUBLIC_BASE_URL", "").rstrip("/")
+BLOB_URL_SECRET = os.getenv("BLOB_URL_SECRET") or os.getenv("JWT_SECRET", "default_secret_key")
+# Signed URLs are identical for a whole window and stay valid for the next one, so cached responses keep working links
+BLOB_URL_WINDOW_SECONDS = int(os.getenv("BLOB_URL_WINDOW_SECONDS", 3600))
+
+BLOB_REF_PREFIX = "blob:"
+CHUNK_SIZE = 256 * 1024
+# Shorter strings are treated as plain text even if they happen to be valid base64
+MIN_INLINE_LENGTH = 128
+
+# Document fields that hold images/attachments, keyed by collection
+BLOB_FIELDS = {
+    "vehicles": ["image"],
+    "insurance_policies": ["documents"],
+    "finance_products": ["documents"],
+    "roadside_assistance": ["membership_card"],
+    "service_bookings": ["issue_photos"],
+    "dealers": ["logo"],
+    "providers": ["logo"],
+}
+
+# Personal documents are only served through signed, expiring URLs; every other blob field is public
+PRIVATE_BLOB_FIELDS = {"documents", "membership_card", "issue_photos"}
+PRIVATE_BLOB_COLLECTIONS = {c for c, fields in BLOB_FIELDS.items() if PRIVATE_BLOB_FIELDS.intersection(fields)}
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+_DATA_URI_RE = re.compile(r"^data:([\w.+-]+/[\w.+-]+)?(?:;[\w-]+=[\w.-]+)*;base64,", re.IGNORECASE)
+
+_MAGIC_NUMBERS = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+    (b"%PDF", "application/pdf"),
+]
+
+
+def is_blob_hash(value: str) -> bool:
+    return bool(_HASH_RE.match(value))
+
+
+def is_blob_ref(value) -> bool:
+    return isinstance(value, str) and value.startswith(BLOB_REF_PREFIX)
+
+
+def url_window(now: Optional[float] = None) -> int:
+    """Index of the current signing window; responses with signed URLs change when it does"""
+    return int((time.time() if now is None else now) // BLOB_URL_WINDOW_SECONDS)
+
+
+def sign_blob(blob_hash: str, expires: int) -> str:
+    return hmac.new(BLOB_URL_SECRET.encode(), f"{blob_hash}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def verify_blob_signature(blob_hash: str, expires: Optional[int], signature: Optional[str]) -> bool:
+    if expires is None or not signature or expires < time.time():
+        return False
+    return hmac.compare_digest(sign_blob(blob_hash, expires), signature)
+
+
+def blob_url(value, private: bool = False):
+    """Turn a stored blob reference into a fetchable URL, signed when private; other values pass through"""
+    if not is_blob_ref(value):
+        return value
+    blob_hash = value[len(BLOB_REF_PREFIX):]
+    url = f"{BLOB_PUBLIC_BASE_URL}/api/blobs/{blob_hash}"
+    if private:
+        expires = (url_window() + 2) * BLOB_URL_WINDOW_SECONDS
+        url += f"?expires={expires}&signature={sign_blob(blob_hash, expires)}"
+    return url
+
+
+def resolve_blob_refs(doc: dict) -> dict:
+    """Replace blob references in a document's top-level fields with URLs"""
+    for key, value in doc.items():
+        private = key in PRIVATE_BLOB_FIELDS
+        if is_blob_ref(value):
+            doc[key] = blob_url(value, private)
+        elif isinstance(value, list) and any(is_blob_ref(v) for v in value):
+            doc[key] = [blob_url(v, private) for v in value]
+    return doc
+
+
+def sniff_content_type(data: bytes) -> str:
+    for magic, content_type in _MAGIC_NUMBERS:
+        if data.startswith(magic):
+            return content_type
+    if data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def decode_inline(value: str) -> Optional[Tuple[bytes, str]]:
+    """Decode a base64 string or data URI; None if it is not inline binary"""
+    if len(value) < MIN_INLINE_LENGTH:
+        return None
+    content_type = None
+    match = _DATA_URI_RE.match(value)
+    if match:
+        content_type = match.group(1)
+        value = value[match.end():]
+    try:
+        data = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    if not data:
+        return None
+    return data, content_type or sniff_content_type(data)
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range Range header into inclusive (start, end); None if unsatisfiable"""
+    match = re.match(r"^bytes=(\d*)-(\d*)$", header.strip())
+    if not match or not any(match.groups()) or size == 0:
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+class FilesystemBackend:
+    """Stores blobs as files fanned out by hash prefix"""
+
+    def __init__(self, root: Path = BLOB_STORAGE_PATH):
+        self.root = root
+
+    def _path(self, blob_hash: str) -> Path:
+        return self.root / blob_hash[:2] / blob_hash
+
+    def _write(self, blob_hash: str, data: bytes):
+        path = self._path(blob_hash)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def _read(self, blob_hash: str, start: int, length: int) -> bytes:
+        with open(self._path(blob_hash), "rb") as f:
+            f.seek(start)
+            return f.read(length)
+
+    async def write(self, db, blob_hash: str, data: bytes):
+        await asyncio.get_running_loop().run_in_executor(None, self._write, blob_hash, data)
+
+    async def stream(self, db, blob_hash: str, start: int, end: int) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        position = start
+        while position <= end:
+            length = min(CHUNK_SIZE, end - position + 1)
+            chunk = await loop.run_in_executor(None, self._read, blob_hash, position, length)
+            if not chunk:
+                break
+            position += len(chunk)
+            yield chunk
+
+
+class GridFSBackend:
+    """Stores blobs in a GridFS bucket, one file per hash"""
+
+    bucket_name = "blobs_fs"
+
+    def _bucket(self, db):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+        return AsyncIOMotorGridFSBucket(db, bucket_name=self.bucket_name, chunk_size_bytes=CHUNK_SIZE)
+
+    async def write(self, db, blob_hash: str, data: bytes):
+        await self._bucket(db).upload_from_stream(blob_hash, data)
+
+    async def stream(self, db, blob_hash: str, start: int, end: int) -> AsyncIterator[bytes]:
+        grid_out = await self._bucket(db).open_download_stream_by_name(blob_hash)
+        grid_out.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await grid_out.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class BlobStore:
+    """Content-addressed (SHA-256) blob storage with metadata in the blobs collection"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def put(self, db, data: bytes, content_type: str, public: bool = False) -> str:
+        """Store bytes once per distinct content and return the hash; public blobs are readable without a signed URL"""
+        blob_hash = hashlib.sha256(data).hexdigest()
+        existing = await db.blobs.find_one({"_id": blob_hash}, {"public": 1})
+        if existing is None:
+            await self.backend.write(db, blob_hash, data)
+            try:
+                await db.blobs.insert_one({
+                    "_id": blob_hash,
+                    "size": len(data),
+                    "content_type": content_type,
+                    "public": public,
+                    "created_at": datetime.utcnow()
+                })
+                return blob_hash
+            except DuplicateKeyError:
+                existing = {}
+        # The same bytes uploaded as a public image are public, whatever else references them
+        if public and not existing.get('public'):
+            await db.blobs.update_one({"_id": blob_hash}, {"$set": {"public": True}})
+        return blob_hash
+
+    async def get_meta(self, db, blob_hash: str) -> Optional[dict]:
+        if not is_blob_hash(blob_hash):
+            return None
+        return await db.blobs.find_one({"_id": blob_hash})
+
+    def stream(self, db, blob_hash: str, start: int, end: int) -> AsyncIterator[bytes]:
+        return self.backend.stream(db, blob_hash, start, end)
+
+    async def externalize(self, db, value, public: bool = False):
+        """Move an inline base64 value (or list of them) into the store, returning references"""
+        if isinstance(value, list):
+            return [await self.externalize(db, v, public) for v in value]
+        if not isinstance(value, str) or is_blob_ref(value):
+            return value
+        decoded = decode_inline(value)
+        if decoded is None:
+            return value
+        data, content_type = decoded
+        return BLOB_REF_PREFIX + await self.put(db, data, content_type, public)
+
+    async def externalize_fields(self, db, collection: str, doc: dict) -> dict:
+        """Externalize every blob field of a document in place"""
+        for field in BLOB_FIELDS.get(collection, []):
+            if doc.get(field):
+                doc[field] = await self.externalize(db, doc[field], field not in PRIVATE_BLOB_FIELDS)
+        return doc
+
+
+blob_store = BlobStore(GridFSBackend() if BLOB_BACKEND == "gridfs" else FilesystemBackend())
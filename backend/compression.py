@@ -0,0 +1,255 @@
+import os
+import time
+import zlib
+from typing import Dict, Optional
+
+from metrics import register
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/", b"application/javascript", b"application/xml", b"image/svg+xml")
+
+# Status codes that never carry a body worth compressing
+_SKIPPED_STATUSES = {204, 206, 304}
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            accepted[token.lower()] = q
+
+    def q_for(encoding):
+        return accepted.get(encoding, accepted.get("*", 0.0))
+
+    if brotli is not None and q_for("br") > 0:
+        return "br"
+    if q_for("gzip") > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+            self._flush = self._c.finish
+            self._compress = self._c.process
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._c = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._flush = self._c.flush
+            self._compress = self._c.compress
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        return self._flush()
+
+
+class RouteCompressionStats:
+    __slots__ = ("responses", "compressed", "bytes_in", "bytes_out", "cpu_seconds")
+
+    def __init__(self):
+        self.responses = 0
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "responses": self.responses,
+            "compressed": self.compressed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+            "cpu_ms": round(self.cpu_seconds * 1000, 2),
+        }
+
+
+_route_stats: Dict[str, RouteCompressionStats] = {}
+
+# Requests that matched no route (404s, probes) share one entry so arbitrary paths can't grow the table
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _stats_for(scope) -> RouteCompressionStats:
+    route = scope.get("route")
+    key = f"{scope['method']} {getattr(route, 'path', None) or UNMATCHED_ROUTE}"
+    stats = _route_stats.get(key)
+    if stats is None:
+        stats = _route_stats[key] = RouteCompressionStats()
+    return stats
+
+
+def compression_stats() -> dict:
+    return {
+        "encodings": ["br", "gzip"] if brotli is not None else ["gzip"],
+        "min_size": COMPRESSION_MIN_SIZE,
+        "routes": {route: stats.snapshot() for route, stats in _route_stats.items()},
+    }
+
+
+def with_vary(headers: list) -> list:
+    """Response headers with Accept-Encoding added to Vary, since the body depends on it"""
+    vary = None
+    merged = []
+    for name, value in headers:
+        if name == b"vary":
+            vary = value
+        else:
+            merged.append((name, value))
+    if vary is None:
+        vary = b"Accept-Encoding"
+    elif b"accept-encoding" not in vary.lower():
+        vary += b", Accept-Encoding"
+    merged.append((b"vary", vary))
+    return merged
+
+
+def is_compressible(headers: dict) -> bool:
+    return headers.get(b"content-type", b"").startswith(COMPRESSIBLE_TYPES)
+
+
+def _tag_etag(etag: bytes, encoding: str) -> bytes:
+    # Each encoding is a different representation, so it needs its own strong ETag
+    if etag.endswith(b'"'):
+        return etag[:-1] + b"-" + encoding.encode('ascii') + b'"'
+    return etag
+
+
+class CompressionMiddleware:
+    """Negotiated gzip/brotli compression of text responses, streaming for chunked bodies"""
+
+    def __init__(self, app, enabled: bool = COMPRESSION_ENABLED):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope["headers"])
+        encoding = negotiate_encoding(request_headers.get(b"accept-encoding", b"").decode('latin-1'))
+        if encoding is None or b"range" in request_headers:
+            # Not compressed for this client, but the representation still varies by Accept-Encoding
+            async def send_with_vary(message):
+                if message["type"] == "http.response.start" and is_compressible(dict(message.get("headers", []))):
+                    message = {**message, "headers": with_vary(message.get("headers", []))}
+                await send(message)
+
+            await self.app(scope, receive, send_with_vary)
+            return
+
+        # Conditional requests arrive with our encoded ETag; the app only knows the plain one
+        suffix = f'-{encoding}"'.encode('ascii')
+        client_sent_encoded_tag = False
+        if b"if-none-match" in request_headers:
+            tags = request_headers[b"if-none-match"]
+            client_sent_encoded_tag = suffix in tags
+            scope = dict(scope)
+            scope["headers"] = [
+                (name, tags.replace(suffix, b'"') if name == b"if-none-match" else value)
+                for name, value in scope["headers"]
+            ]
+
+        start = None
+        compressor = None
+        stats = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, stats, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                if message["status"] == 304 and client_sent_encoded_tag and b"etag" in headers:
+                    message = {**message, "headers": [
+                        (n, _tag_etag(v, encoding) if n == b"etag" else v)
+                        for n, v in message.get("headers", [])
+                    ]}
+                if (
+                    message["status"] in _SKIPPED_STATUSES
+                    or b"content-encoding" in headers
+                    or not is_compressible(headers)
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                stats = _stats_for(scope)
+                stats.responses += 1
+                if not more_body and len(body) < COMPRESSION_MIN_SIZE:
+                    stats.bytes_in += len(body)
+                    stats.bytes_out += len(body)
+                    passthrough = True
+                    await send({**start, "headers": with_vary(start.get("headers", []))})
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding)
+                headers = with_vary([
+                    (n, _tag_etag(v, encoding) if n == b"etag" else v)
+                    for n, v in start.get("headers", [])
+                    if n != b"content-length"
+                ])
+                headers.append((b"content-encoding", encoding.encode('ascii')))
+
+                started = time.perf_counter()
+                compressed = compressor.compress(body)
+                if not more_body:
+                    compressed += compressor.finish()
+                    headers.append((b"content-length", str(len(compressed)).encode('ascii')))
+                stats.cpu_seconds += time.perf_counter() - started
+                stats.compressed += 1
+                stats.bytes_in += len(body)
+                stats.bytes_out += len(compressed)
+
+                await send({**start, "headers": headers})
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+
+            # Later chunks of a streamed body
+            started = time.perf_counter()
+            compressed = compressor.compress(body)
+            if not more_body:
+                compressed += compressor.finish()
+            stats.cpu_seconds += time.perf_counter() - started
+            stats.bytes_in += len(body)
+            stats.bytes_out += len(compressed)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+register("compression", compression_stats)
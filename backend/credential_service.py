@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
+
+import auth_utils
+from metrics import LatencyHistogram, register
+from process_pool import new_process_pool
+
+AUTH_POOL_MODE = os.getenv("AUTH_POOL_MODE", "thread")  # thread or process
+AUTH_POOL_WORKERS = int(os.getenv("AUTH_POOL_WORKERS", 4))
+AUTH_QUEUE_LIMIT = int(os.getenv("AUTH_QUEUE_LIMIT", 64))
+
+
+class CredentialService:
+    """Runs bcrypt hashing/verification on a bounded worker pool off the event loop"""
+
+    def __init__(self, mode: str = AUTH_POOL_MODE, workers: int = AUTH_POOL_WORKERS,
+                 queue_limit: int = AUTH_QUEUE_LIMIT):
+        self.mode = mode
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.rejected = 0
+        self.latency = LatencyHistogram()
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = new_process_pool(self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="credentials")
+        return self._executor
+
+    def start(self):
+        """Create the pool from the lifespan instead of on the first login"""
+        self._get_executor()
+
+    async def _run(self, fn, *args):
+        # Requests beyond the running workers plus the queue allowance are shed
+        # instead of piling up behind a login spike.
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Authentication service busy, please retry",
+                headers={"Retry-After": "1"}
+            )
+
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+            self.latency.observe(time.perf_counter() - started)
+
+    async def hash_password(self, password: str) -> str:
+        """Hash a password using bcrypt on the worker pool"""
+        return await self._run(auth_utils.hash_password, password)
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash on the worker pool"""
+        return await self._run(auth_utils.verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        """Pool configuration, queue depth and latency histogram"""
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": min(self.pending, self.workers),
+            "queued": max(self.pending - self.workers, 0),
+            "rejected": self.rejected,
+            "latency": self.latency.snapshot(),
+        }
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+credential_service = CredentialService()
+register("credentials", credential_service.stats)
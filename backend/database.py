@@ -0,0 +1,36 @@
+import asyncio
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+load_dotenv(Path(__file__).parent / '.env')
+
+# Pool limits apply per worker process, so the cluster sees workers * MONGO_MAX_POOL_SIZE connections at most
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 5))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+
+
+def create_client() -> AsyncIOMotorClient:
+    """Motor client for the current worker; create it inside the worker's event loop, never before a fork"""
+    return AsyncIOMotorClient(
+        os.environ['MONGO_URL'],
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        appname=f"api-{os.getpid()}"
+    )
+
+
+def get_database(client: AsyncIOMotorClient):
+    return client[os.environ['DB_NAME']]
+
+
+async def warm_up(db, connections: int = MONGO_MIN_POOL_SIZE):
+    """Open the pool's first connections so the worker's first requests don't pay for the handshakes"""
+    # Concurrent pings force the driver to check out (and so create) that many connections
+    await asyncio.gather(*(db.command("ping") for _ in range(max(1, connections))))
@@ -0,0 +1,154 @@
+import logging
+import os
+from datetime import datetime
+from typing import List
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from sync_service import SYNC_TOMBSTONE_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+VERIFY_INDEX_USAGE = os.getenv("VERIFY_INDEX_USAGE", "false").lower() == "true"
+
+# Every index the API relies on, keyed by collection
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("member_id", ASCENDING)], name="member_id_unique", unique=True),
+    ],
+    "vehicles": [
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_id"),
+        IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING)], name="user_id_updated_at"),
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="user_id_created_at_id"),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)], name="user_id_status_id"),
+    ],
+    "insurance_policies": [
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_id"),
+        IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING)], name="user_id_updated_at"),
+        IndexModel([("user_id", ASCENDING), ("end_date", ASCENDING), ("_id", ASCENDING)], name="user_id_end_date_id"),
+    ],
+    "finance_products": [
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_id"),
+        IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING)], name="user_id_updated_at"),
+        IndexModel([("user_id", ASCENDING), ("end_date", ASCENDING), ("_id", ASCENDING)], name="user_id_end_date_id"),
+    ],
+    "roadside_assistance": [
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_id"),
+        IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING)], name="user_id_updated_at"),
+        IndexModel([("user_id", ASCENDING), ("end_date", ASCENDING), ("_id", ASCENDING)], name="user_id_end_date_id"),
+    ],
+    "service_bookings": [
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_id"),
+        IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING)], name="user_id_updated_at"),
+        IndexModel([("user_id", ASCENDING), ("booking_date", ASCENDING), ("_id", ASCENDING)], name="user_id_booking_date_id"),
+    ],
+    "transfers": [
+        IndexModel([("from_user_id", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)], name="from_user_id_status_id"),
+        IndexModel([("from_user_id", ASCENDING), ("status", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+                   name="from_user_id_status_created_at_id"),
+        IndexModel([("from_user_id", ASCENDING), ("updated_at", ASCENDING)], name="from_user_id_updated_at"),
+    ],
+    "refresh_tokens": [
+        IndexModel([("user_id", ASCENDING), ("family", ASCENDING)], name="user_id_family"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "revoked_sessions": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "tombstones": [
+        IndexModel([("user_id", ASCENDING), ("deleted_at", ASCENDING)], name="user_id_deleted_at"),
+        IndexModel([("deleted_at", ASCENDING)], name="deleted_at_ttl",
+                   expireAfterSeconds=SYNC_TOMBSTONE_RETENTION_DAYS * 86400),
+    ],
+    "dealers": [
+        IndexModel([("is_approved", ASCENDING), ("_id", ASCENDING)], name="is_approved_id"),
+        IndexModel([("is_approved", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)], name="is_approved_name_id"),
+        # $geoNear requires exactly one 2dsphere index on the collection
+        IndexModel([("location", GEOSPHERE), ("is_approved", ASCENDING)], name="location_2dsphere_is_approved"),
+    ],
+    "promotions": [
+        IndexModel([("start_date", ASCENDING), ("end_date", ASCENDING)], name="start_date_end_date"),
+        IndexModel([("end_date", ASCENDING), ("_id", ASCENDING)], name="end_date_id"),
+    ],
+    "providers": [
+        IndexModel([("provider_type", ASCENDING), ("_id", ASCENDING)], name="provider_type_id"),
+        IndexModel([("provider_type", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)], name="provider_type_name_id"),
+    ],
+    "marketplace_listings": [
+        IndexModel([("status", ASCENDING), ("make", ASCENDING), ("model", ASCENDING),
+                    ("year", ASCENDING), ("price", ASCENDING)], name="status_make_model_year_price"),
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)], name="status_id"),
+        IndexModel([("status", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)], name="status_price_id"),
+        IndexModel([("status", ASCENDING), ("year", ASCENDING), ("_id", ASCENDING)], name="status_year_id"),
+        IndexModel([("status", ASCENDING), ("listed_date", DESCENDING), ("_id", DESCENDING)], name="status_listed_date_id"),
+        IndexModel([("title", TEXT), ("description", TEXT)], name="title_description_text",
+                   weights={"title": 5, "description": 1}),
+    ],
+    "rego_jobs": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease_expires_at"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "rego_scan_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+
+def query_shapes() -> List[tuple]:
+    """Representative (collection, filter) pairs for the hot queries in server.py"""
+    now = datetime.utcnow()
+    user_id = "000000000000000000000000"
+    return [
+        ("users", {"email": "user@example.com"}),
+        ("users", {"member_id": "MV-0000000"}),
+        ("vehicles", {"user_id": user_id}),
+        ("insurance_policies", {"user_id": user_id, "end_date": {"$gt": now}}),
+        ("finance_products", {"user_id": user_id, "end_date": {"$gt": now}}),
+        ("roadside_assistance", {"user_id": user_id, "end_date": {"$gt": now}}),
+        ("service_bookings", {"user_id": user_id}),
+        ("vehicles", {"user_id": user_id, "updated_at": {"$gte": now}}),
+        ("tombstones", {"user_id": user_id, "deleted_at": {"$gte": now}}),
+        ("transfers", {"from_user_id": user_id, "status": "pending"}),
+        ("dealers", {"is_approved": True}),
+        ("promotions", {"start_date": {"$lte": now}, "end_date": {"$gte": now}}),
+        ("providers", {"provider_type": "Insurance"}),
+        ("marketplace_listings", {"status": "Active", "make": "Toyota", "model": "Camry",
+                                  "year": {"$gte": 2015}, "price": {"$lte": 30000}}),
+    ]
+
+
+async def ensure_indexes(db):
+    """Create all declared indexes; safe to run on every startup"""
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error(f"Failed to create indexes on {collection}: {str(e)}")
+
+
+def _has_collscan(plan) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(v) for v in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(p) for p in plan)
+    return False
+
+
+async def verify_index_usage(db):
+    """Explain every registered query shape and fail if any of them scans a whole collection"""
+    offenders = []
+    for collection, query in query_shapes():
+        explain = await db[collection].find(query).explain()
+        if _has_collscan(explain.get("queryPlanner", {}).get("winningPlan")):
+            offenders.append(f"{collection} {query}")
+
+    if offenders:
+        raise RuntimeError("Queries without index support: " + "; ".join(offenders))
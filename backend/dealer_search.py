@@ -0,0 +1,52 @@
+import os
+from typing import List, Optional
+
+DEALER_NEARBY_DEFAULT_RADIUS_KM = float(os.getenv("DEALER_NEARBY_DEFAULT_RADIUS_KM", 25))
+DEALER_NEARBY_MAX_RADIUS_KM = float(os.getenv("DEALER_NEARBY_MAX_RADIUS_KM", 500))
+
+
+def geo_point(latitude, longitude) -> Optional[dict]:
+    """GeoJSON point for a lat/lng pair, or None if either coordinate is missing or out of range"""
+    if latitude is None or longitude is None:
+        return None
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    # GeoJSON coordinates are [longitude, latitude]
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def nearby_pipeline(
+    lat: float,
+    lng: float,
+    radius_km: float,
+    limit: int,
+    service: Optional[str] = None,
+    dealer_type: Optional[str] = None,
+    projection: Optional[dict] = None
+) -> List[dict]:
+    """Approved dealers within radius_km of the point, nearest first, with distance_km added"""
+    query = {"is_approved": True}
+    if dealer_type:
+        query['dealer_type'] = dealer_type
+    if service:
+        query['services_offered'] = service
+
+    pipeline = [
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": [lng, lat]},
+            "key": "location",
+            "distanceField": "distance_km",
+            "distanceMultiplier": 0.001,
+            "maxDistance": radius_km * 1000,
+            "spherical": True,
+            "query": query
+        }},
+        {"$limit": limit},
+    ]
+    if projection is not None:
+        pipeline.append({"$project": {**projection, "distance_km": 1}})
+    return pipeline
@@ -0,0 +1,45 @@
+from typing import Dict, Iterable, List, Optional
+
+from bson import ObjectId
+
+
+def _object_ids(values: Iterable) -> List[ObjectId]:
+    ids = set()
+    for value in values:
+        if isinstance(value, ObjectId):
+            ids.add(value)
+        elif isinstance(value, str) and ObjectId.is_valid(value):
+            ids.add(ObjectId(value))
+    return list(ids)
+
+
+async def fetch_by_ids(collection, ids: Iterable, projection: Optional[dict] = None) -> Dict[str, dict]:
+    """Load every referenced document with a single $in query, keyed by string id"""
+    object_ids = _object_ids(ids)
+    if not object_ids:
+        return {}
+    docs = await collection.find({"_id": {"$in": object_ids}}, projection).to_list(len(object_ids))
+    return {str(doc['_id']): doc for doc in docs}
+
+
+async def attach(
+    db,
+    docs: List[dict],
+    local_field: str,
+    collection: str,
+    as_field: str,
+    projection: Optional[dict] = None
+) -> Dict[str, dict]:
+    """Set docs[i][as_field] to the referenced document (or None) using one batched lookup"""
+    related = await fetch_by_ids(db[collection], (d.get(local_field) for d in docs), projection)
+    for doc in docs:
+        doc[as_field] = related.get(str(doc.get(local_field)))
+    return related
+
+
+async def attach_names(db, docs: List[dict], local_field: str, collection: str, as_field: str):
+    """Set docs[i][as_field] to the referenced document's name"""
+    related = await fetch_by_ids(db[collection], (d.get(local_field) for d in docs), {"name": 1})
+    for doc in docs:
+        match = related.get(str(doc.get(local_field)))
+        doc[as_field] = match.get('name') if match else None
@@ -0,0 +1,60 @@
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Optional, Sequence, Type
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, create_model
+
+# Attachment fields left out of list views unless asked for with fields=.
+# Vehicle images and logos are blob URLs that the list screens display, so
+# they stay in by default.
+HEAVY_FIELDS = {
+    "insurance_policies": ("documents",),
+    "finance_products": ("documents",),
+    "roadside_assistance": ("membership_card",),
+    "service_bookings": ("issue_photos",),
+}
+
+FieldsParam = Query(None, description="Comma separated fields to return, or * for every field")
+
+
+def select_fields(
+    fields: Optional[str],
+    model: Type[BaseModel],
+    default_exclude: Sequence[str] = ()
+) -> FrozenSet[str]:
+    """Parse a comma separated fields= value into the set of response fields to return"""
+    available = set(model.model_fields)
+    if not fields:
+        return frozenset(available - set(default_exclude))
+    if fields.strip() == "*":
+        return frozenset(available)
+
+    selected = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = selected - available
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(sorted(unknown))}"
+        )
+    selected.add("id")
+    return frozenset(selected)
+
+
+def projection_for(selected: Iterable[str], depends_on: Iterable[str] = ()) -> Dict[str, int]:
+    """Mongo projection for the selected response fields plus any fields needed to compute them"""
+    projection = {field: 1 for field in selected if field != "id"}
+    projection.update({field: 1 for field in depends_on})
+    return projection
+
+
+@lru_cache(maxsize=256)
+def slim_model(model: Type[BaseModel], selected: FrozenSet[str]) -> Type[BaseModel]:
+    """Response model containing only the selected fields of model"""
+    if selected == frozenset(model.model_fields):
+        return model
+    definitions = {
+        name: (field.annotation, field)
+        for name, field in model.model_fields.items()
+        if name in selected
+    }
+    return create_model(f"{model.__name__}Fields", **definitions)
@@ -0,0 +1,231 @@
+import asyncio
+import base64
+import io
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from cachetools import LRUCache
+from PIL import Image, ImageOps
+
+from blob_store import blob_store, decode_inline, is_blob_ref, BLOB_PUBLIC_BASE_URL, BLOB_REF_PREFIX
+from metrics import LatencyHistogram, register
+from process_pool import new_process_pool
+
+logger = logging.getLogger(__name__)
+
+IMAGE_POOL_WORKERS = int(os.getenv("IMAGE_POOL_WORKERS", 2))
+IMAGE_VARIANT_CACHE_SIZE = int(os.getenv("IMAGE_VARIANT_CACHE_SIZE", 10000))
+REGO_MAX_DIMENSION = int(os.getenv("REGO_MAX_DIMENSION", 1600))
+REGO_JPEG_QUALITY = int(os.getenv("REGO_JPEG_QUALITY", 70))
+
+# Errors PIL raises for truncated, corrupt or oversized (decompression bomb) images
+UNDECODABLE_IMAGE_ERRORS = (OSError, ValueError, SyntaxError, Image.DecompressionBombError)
+
+# Variant name -> (max width/height in pixels, JPEG quality)
+VARIANTS = {
+    "thumbnail": (320, 75),
+    "medium": (1024, 80),
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def start_image_pool():
+    """Create the pool from the lifespan, so its server process starts with the worker rather than mid-request"""
+    get_image_pool()
+
+
+def get_image_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all CPU-bound image work; created on first use outside the app (migrations, tests)"""
+    global _pool
+    if _pool is None:
+        _pool = new_process_pool(IMAGE_POOL_WORKERS)
+    return _pool
+
+
+def shutdown_image_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def render_variant(data: bytes, max_dimension: int, quality: int) -> bytes:
+    """Decode an image, apply EXIF orientation, downscale and re-encode as JPEG"""
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_dimension, max_dimension))
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        output = io.BytesIO()
+        img.save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+        return output.getvalue()
+
+
+def preprocess_rego_image(data: bytes, max_dimension: int, quality: int) -> Tuple[bytes, Dict[str, float]]:
+    """Prepare a registration photo for the model: orient, downscale, greyscale JPEG"""
+    timings = {}
+    started = time.perf_counter()
+    img = Image.open(io.BytesIO(data))
+    img.draft("L", (max_dimension, max_dimension))
+    img.load()
+    timings["decode"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((max_dimension, max_dimension))
+    img = img.convert("L")
+    timings["resize"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    output = io.BytesIO()
+    img.save(output, "JPEG", quality=quality, optimize=True)
+    timings["encode"] = time.perf_counter() - started
+    return output.getvalue(), timings
+
+
+class RegoImagePreprocessor:
+    """Runs preprocess_rego_image on the image pool and records per-stage timings"""
+
+    def __init__(self, max_dimension: int = REGO_MAX_DIMENSION, quality: int = REGO_JPEG_QUALITY):
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.failures = 0
+        self.stage_latency = {stage: LatencyHistogram() for stage in ("decode", "resize", "encode", "total")}
+
+    async def process(self, image_base64: str) -> str:
+        """Return a smaller base64 JPEG; the input is passed through if it cannot be decoded"""
+        decoded = decode_inline(image_base64)
+        if decoded is None:
+            return image_base64
+        data, _ = decoded
+
+        started = time.perf_counter()
+        try:
+            processed, timings = await asyncio.get_running_loop().run_in_executor(
+                get_image_pool(), preprocess_rego_image, data, self.max_dimension, self.quality
+            )
+        except Exception:
+            self.failures += 1
+            return image_base64
+        timings["total"] = time.perf_counter() - started
+
+        for stage, seconds in timings.items():
+            self.stage_latency[stage].observe(seconds)
+        self.bytes_in += len(data)
+        self.bytes_out += len(processed)
+        return base64.b64encode(processed).decode('ascii')
+
+    def stats(self) -> dict:
+        return {
+            "max_dimension": self.max_dimension,
+            "quality": self.quality,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "failures": self.failures,
+            "stages": {stage: h.snapshot() for stage, h in self.stage_latency.items()},
+        }
+
+
+def variant_url(value, variant: str):
+    """URL of a resized variant for a blob reference; other values pass through"""
+    if is_blob_ref(value):
+        return f"{BLOB_PUBLIC_BASE_URL}/api/blobs/{value[len(BLOB_REF_PREFIX):]}/{variant}"
+    return value
+
+
+class VariantService:
+    """Lazily generates, stores and caches resized image variants"""
+
+    def __init__(self, cache_size: int = IMAGE_VARIANT_CACHE_SIZE):
+        self._cache = LRUCache(maxsize=cache_size)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.render_latency = LatencyHistogram()
+
+    async def get_variant(self, db, blob_hash: str, variant: str) -> Optional[str]:
+        """Hash of the requested variant, generating it on first use; None if not a decodable image"""
+        key = f"{blob_hash}:{variant}"
+        if key in self._cache:
+            self.hits += 1
+            return self._cache[key]
+
+        doc = await db.blob_variants.find_one({"_id": key})
+        if doc:
+            self.hits += 1
+            self._cache[key] = doc['blob_hash']
+            return doc['blob_hash']
+
+        # Concurrent requests for the same variant share one render
+        task = self._in_flight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._generate(db, blob_hash, variant, key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _generate(self, db, blob_hash: str, variant: str, key: str) -> Optional[str]:
+        meta = await blob_store.get_meta(db, blob_hash)
+        if not meta or not meta['content_type'].startswith("image/"):
+            return None
+
+        data = b"".join([chunk async for chunk in blob_store.stream(db, blob_hash, 0, meta['size'] - 1)])
+        max_dimension, quality = VARIANTS[variant]
+        started = time.perf_counter()
+        try:
+            rendered = await asyncio.get_running_loop().run_in_executor(
+                get_image_pool(), render_variant, data, max_dimension, quality
+            )
+        except UNDECODABLE_IMAGE_ERRORS as e:
+            # Remember the failure so the blob is not re-rendered on every request
+            self.failures += 1
+            logger.error(f"Cannot render {variant} of blob {blob_hash}: {e}")
+            await db.blob_variants.update_one(
+                {"_id": key},
+                {"$set": {"blob_hash": None, "source_hash": blob_hash, "variant": variant,
+                          "error": str(e), "created_at": datetime.utcnow()}},
+                upsert=True
+            )
+            self._cache[key] = None
+            return None
+        self.render_latency.observe(time.perf_counter() - started)
+
+        variant_hash = await blob_store.put(db, rendered, "image/jpeg")
+        await db.blob_variants.update_one(
+            {"_id": key},
+            {"$set": {"blob_hash": variant_hash, "source_hash": blob_hash, "variant": variant,
+                      "size": len(rendered), "created_at": datetime.utcnow()}},
+            upsert=True
+        )
+        self._cache[key] = variant_hash
+        return variant_hash
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "in_flight": len(self._in_flight),
+            "cached": len(self._cache),
+            "render_latency": self.render_latency.snapshot(),
+        }
+
+
+variant_service = VariantService()
+register("image_variants", variant_service.stats)
+
+rego_preprocessor = RegoImagePreprocessor()
+register("rego_preprocessing", rego_preprocessor.stats)
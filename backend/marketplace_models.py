@@ -31,3 +31,4 @@ class MarketplaceListingResponse(BaseModel):
     contact_email: Optional[str] = None
     listed_date: datetime
     status: str  # Active, Sold
+    features: List[str] = []
@@ -0,0 +1,165 @@
+import os
+import time
+from typing import Optional
+
+from cachetools import TTLCache
+from fastapi import Query
+
+from metrics import LatencyHistogram, register
+
+MARKETPLACE_FACET_TTL_SECONDS = int(os.getenv("MARKETPLACE_FACET_TTL_SECONDS", 30))
+MARKETPLACE_FACET_CACHE_SIZE = int(os.getenv("MARKETPLACE_FACET_CACHE_SIZE", 512))
+
+# Sort keys with a matching {status, <key>, _id} index
+LISTING_SORTS = ["price", "year", "listed_date"]
+
+
+class ListingFilters:
+    """Marketplace search parameters shared by the listing and facet endpoints"""
+
+    def __init__(
+        self,
+        q: Optional[str] = Query(None, description="Free text search over title and description"),
+        make: Optional[str] = None,
+        model: Optional[str] = None,
+        year_min: Optional[int] = None,
+        year_max: Optional[int] = None,
+        price_min: Optional[float] = None,
+        price_max: Optional[float] = None,
+        status: str = "Active"
+    ):
+        self.q = q
+        self.make = make
+        self.model = model
+        self.year_min = year_min
+        self.year_max = year_max
+        self.price_min = price_min
+        self.price_max = price_max
+        self.status = status
+
+    def query(self) -> dict:
+        """Mongo filter, with equality fields first so the compound index prefix is used"""
+        query = {"status": self.status}
+        if self.make:
+            query['make'] = self.make
+        if self.model:
+            query['model'] = self.model
+        if self.year_min is not None or self.year_max is not None:
+            query['year'] = _range(self.year_min, self.year_max)
+        if self.price_min is not None or self.price_max is not None:
+            query['price'] = _range(self.price_min, self.price_max)
+        if self.q:
+            query['$text'] = {"$search": self.q}
+        return query
+
+    def cache_key(self) -> tuple:
+        return (self.q, self.make, self.model, self.year_min, self.year_max,
+                self.price_min, self.price_max, self.status)
+
+
+def _range(low, high) -> dict:
+    bounds = {}
+    if low is not None:
+        bounds['$gte'] = low
+    if high is not None:
+        bounds['$lte'] = high
+    return bounds
+
+
+def listing_from_vehicle(vehicle: dict) -> dict:
+    """Vehicle fields copied onto a listing so searches never join back to vehicles"""
+    return {
+        "dealer_id": vehicle.get('dealer_id'),
+        "make": vehicle['make'],
+        "model": vehicle['model'],
+        "year": vehicle['year'],
+        "odometer": vehicle.get('odometer'),
+        "images": [vehicle['image']] if vehicle.get('image') else [],
+    }
+
+
+YEAR_BUCKETS = [0, 2000, 2005, 2010, 2015, 2020, 2025, 3000]
+PRICE_BUCKETS = [0, 5000, 10000, 20000, 30000, 50000, 75000, 100000, float("inf")]
+
+
+def facet_pipeline(query: dict) -> list:
+    """Single $facet aggregation returning counts per make, model, year band and price band"""
+    return [
+        {"$match": query},
+        {"$facet": {
+            "make": [
+                {"$group": {"_id": "$make", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}}
+            ],
+            "model": [
+                {"$group": {"_id": {"make": "$make", "model": "$model"}, "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}}
+            ],
+            "year": [
+                {"$bucket": {"groupBy": "$year", "boundaries": YEAR_BUCKETS, "default": "other"}}
+            ],
+            "price": [
+                {"$bucket": {"groupBy": "$price", "boundaries": PRICE_BUCKETS, "default": "other"}}
+            ],
+        }}
+    ]
+
+
+def _bands(buckets: list, boundaries: list) -> list:
+    upper = dict(zip(boundaries, boundaries[1:]))
+    return [
+        {"min": b['_id'], "max": None if upper[b['_id']] == float("inf") else upper[b['_id']], "count": b['count']}
+        for b in buckets if b['_id'] != "other"
+    ]
+
+
+def format_facets(result: dict) -> dict:
+    return {
+        "make": [{"value": m['_id'], "count": m['count']} for m in result['make'] if m['_id']],
+        "model": [
+            {"make": m['_id'].get('make'), "value": m['_id'].get('model'), "count": m['count']}
+            for m in result['model'] if m['_id'].get('model')
+        ],
+        "year": _bands(result['year'], YEAR_BUCKETS),
+        "price": _bands(result['price'], PRICE_BUCKETS),
+    }
+
+
+class FacetCache:
+    """Short-lived cache of facet counts keyed by the active filter set"""
+
+    def __init__(self, ttl: int = MARKETPLACE_FACET_TTL_SECONDS, size: int = MARKETPLACE_FACET_CACHE_SIZE):
+        self._cache = TTLCache(maxsize=size, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self.latency = LatencyHistogram()
+
+    async def get(self, db, filters: ListingFilters) -> dict:
+        key = filters.cache_key()
+        if key in self._cache:
+            self.hits += 1
+            return self._cache[key]
+
+        self.misses += 1
+        started = time.perf_counter()
+        result = await db.marketplace_listings.aggregate(facet_pipeline(filters.query())).to_list(1)
+        self.latency.observe(time.perf_counter() - started)
+
+        facets = format_facets(result[0])
+        self._cache[key] = facets
+        return facets
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "cached": len(self._cache),
+            "aggregation_latency": self.latency.snapshot(),
+        }
+
+
+facet_cache = FacetCache()
+register("marketplace_facets", facet_cache.stats)
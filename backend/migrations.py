@@ -0,0 +1,144 @@
+"""
+One-off data migrations.
+
+Usage: python migrations.py [name ...]   (runs every migration when no name is given)
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from blob_store import blob_store, BLOB_FIELDS, BLOB_REF_PREFIX, PRIVATE_BLOB_FIELDS
+from database import create_client, get_database
+from dealer_search import geo_point
+from user_repository import normalize_email
+import versioning
+from marketplace_search import listing_from_vehicle
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def migrate_inline_blobs(db):
+    """Move inline base64 images/documents into the blob store"""
+    for collection, fields in BLOB_FIELDS.items():
+        migrated = 0
+        query = {"$or": [{field: {"$exists": True, "$ne": None}} for field in fields]}
+        async for doc in db[collection].find(query, {"user_id": 1, **{field: 1 for field in fields}}):
+            update_dict = {}
+            for field in fields:
+                if doc.get(field):
+                    externalized = await blob_store.externalize(db, doc[field], field not in PRIVATE_BLOB_FIELDS)
+                    if externalized != doc[field]:
+                        update_dict[field] = externalized
+            if update_dict:
+                # Responses now carry blob URLs instead of base64, so ETags must change
+                update_dict['updated_at'] = datetime.utcnow()
+                await db[collection].update_one({"_id": doc['_id']}, {"$set": update_dict, "$inc": {"version": 1}})
+                if doc.get('user_id'):
+                    await versioning.bump(db, collection, doc['user_id'])
+                migrated += 1
+        logger.info(f"{collection}: moved inline blobs out of {migrated} documents")
+
+
+async def mark_public_blobs(db):
+    """Flag blobs referenced by public fields (vehicle images, logos) so they are served without a signed URL"""
+    for collection, fields in BLOB_FIELDS.items():
+        for field in fields:
+            if field in PRIVATE_BLOB_FIELDS:
+                continue
+            hashes = set()
+            async for doc in db[collection].find({field: {"$regex": f"^{BLOB_REF_PREFIX}"}}, {field: 1}):
+                values = doc[field] if isinstance(doc[field], list) else [doc[field]]
+                hashes.update(v[len(BLOB_REF_PREFIX):] for v in values if isinstance(v, str) and v.startswith(BLOB_REF_PREFIX))
+            if hashes:
+                result = await db.blobs.update_many({"_id": {"$in": list(hashes)}}, {"$set": {"public": True}})
+                logger.info(f"{collection}.{field}: marked {result.modified_count} blobs public")
+
+
+async def backfill_listing_vehicle_fields(db):
+    """Copy make/model/year/odometer/images from vehicles onto older marketplace listings"""
+    updated = 0
+    removed = 0
+    async for listing in db.marketplace_listings.find({"make": {"$exists": False}}, {"vehicle_id": 1}):
+        vehicle_id = listing.get('vehicle_id')
+        vehicle = None
+        if vehicle_id and ObjectId.is_valid(vehicle_id):
+            vehicle = await db.vehicles.find_one({"_id": ObjectId(vehicle_id)})
+        if vehicle:
+            await db.marketplace_listings.update_one(
+                {"_id": listing['_id']},
+                {"$set": listing_from_vehicle(vehicle)}
+            )
+            updated += 1
+        else:
+            # The vehicle is gone, so the listing can never be completed; take it out of search
+            await db.marketplace_listings.update_one({"_id": listing['_id']}, {"$set": {"status": "Removed"}})
+            removed += 1
+    logger.info(f"marketplace_listings: backfilled vehicle fields on {updated} listings, removed {removed} orphaned listings")
+
+
+async def backfill_dealer_locations(db):
+    """Build GeoJSON location points from dealer latitude/longitude for the nearby search"""
+    updated = 0
+    skipped = 0
+    query = {"location": {"$exists": False}, "latitude": {"$ne": None}, "longitude": {"$ne": None}}
+    async for dealer in db.dealers.find(query, {"latitude": 1, "longitude": 1}):
+        location = geo_point(dealer.get('latitude'), dealer.get('longitude'))
+        if location is None:
+            skipped += 1
+            continue
+        await db.dealers.update_one({"_id": dealer['_id']}, {"$set": {"location": location}})
+        updated += 1
+    logger.info(f"dealers: backfilled location on {updated} dealers, skipped {skipped} with invalid coordinates")
+
+
+async def normalize_user_emails(db):
+    """Lower-case stored emails so case-normalized logins hit the unique email index"""
+    updated = 0
+    conflicts = 0
+    async for user in db.users.find({"email": {"$regex": "[A-Z]|^\\s|\\s$"}}, {"email": 1}):
+        email = normalize_email(user['email'])
+        if await db.users.find_one({"email": email, "_id": {"$ne": user['_id']}}, {"_id": 1}):
+            # Two accounts differing only by case need a manual merge
+            logger.error(f"users: cannot normalize {user['_id']}, {email} belongs to another account")
+            conflicts += 1
+            continue
+        await db.users.update_one({"_id": user['_id']}, {"$set": {"email": email}})
+        updated += 1
+    logger.info(f"users: normalized {updated} emails, {conflicts} conflicts left unchanged")
+
+
+MIGRATIONS = {
+    "inline_blobs": migrate_inline_blobs,
+    "public_blobs": mark_public_blobs,
+    "listing_vehicle_fields": backfill_listing_vehicle_fields,
+    "dealer_locations": backfill_dealer_locations,
+    "user_emails": normalize_user_emails,
+}
+
+
+async def run(names):
+    client = create_client()
+    db = get_database(client)
+    try:
+        for name in names:
+            logger.info(f"Running migration {name}")
+            await MIGRATIONS[name](db)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    requested = sys.argv[1:] or list(MIGRATIONS)
+    unknown = [name for name in requested if name not in MIGRATIONS]
+    if unknown:
+        sys.exit(f"Unknown migration(s): {', '.join(unknown)}. Available: {', '.join(MIGRATIONS)}")
+    asyncio.run(run(requested))
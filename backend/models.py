@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from bson import ObjectId
 
@@ -50,9 +50,20 @@ class UserUpdate(BaseModel):
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
     user: UserResponse
 
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
+class RefreshTokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    refresh_token: str
+
+
 # Vehicle Models
 class VehicleCreate(BaseModel):
     rego: str
@@ -102,6 +113,14 @@ class VehicleResponse(BaseModel):
 class RegoScanRequest(BaseModel):
     image_base64: str
 
+class RegoScanJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued, running, done, failed
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
 
 # Insurance Models
 class InsurancePolicyCreate(BaseModel):
@@ -129,6 +148,7 @@ class InsurancePolicyResponse(BaseModel):
     vehicle_id: str
     policy_type: str
     provider_id: str
+    provider_name: Optional[str] = None
     policy_number: str
     premium: float
     start_date: datetime
@@ -232,6 +252,10 @@ class DealerResponse(BaseModel):
     is_approved: bool
 
 
+class DealerNearbyResponse(DealerResponse):
+    distance_km: float
+
+
 # Promotion Models
 class PromotionResponse(BaseModel):
     id: str
@@ -268,6 +292,7 @@ class ServiceBookingResponse(BaseModel):
     user_id: str
     vehicle_id: str
     dealer_id: str
+    dealer_name: Optional[str] = None
     service_type: str
     booking_date: datetime
     notes: Optional[str] = None
@@ -297,6 +322,20 @@ class DashboardStats(BaseModel):
     active_roadside_memberships: int
 
 
+# Sync Models
+class SyncResponse(BaseModel):
+    sync_token: str  # continues the run while has_more is set, then is the baseline for the next sync
+    full_sync: bool  # True when the client should replace its local state with this run's pages
+    has_more: bool = False
+    vehicles: List[VehicleResponse] = []
+    insurance_policies: List[InsurancePolicyResponse] = []
+    finance_products: List[FinanceProductResponse] = []
+    roadside_assistance: List[RoadsideAssistanceResponse] = []
+    service_bookings: List[ServiceBookingResponse] = []
+    transfers: List[dict] = []
+    deleted: Dict[str, List[str]] = {}  # collection -> ids removed since the token
+
+
 # Settings Models
 
 # Profile Update (for Settings Account tab)
@@ -0,0 +1,117 @@
+import base64
+import binascii
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from bson import json_util
+from fastapi import HTTPException, Query
+
+from serialization import FastJSONResponse
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 100))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 500))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """Query parameters shared by every paginated list endpoint"""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        sort: Optional[str] = Query(None, description="Sort field, prefix with - for descending")
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.sort = sort
+
+
+def parse_sort(sort: Optional[str], allowed: Sequence[str] = ()) -> Tuple[str, int]:
+    """Turn 'field' / '-field' into (field, direction), restricted to index-backed fields"""
+    if not sort:
+        return "_id", 1
+    direction = -1 if sort.startswith("-") else 1
+    field = sort.lstrip("-+")
+    if field == "id":
+        field = "_id"
+    if field != "_id" and field not in allowed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot sort by '{field}'. Allowed: {', '.join(['id', *allowed])}"
+        )
+    return field, direction
+
+
+def encode_cursor(field: str, doc: dict) -> str:
+    payload = json_util.dumps({"f": field, "v": doc.get(field), "id": doc['_id']})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip("=")
+
+
+def decode_cursor(cursor: str, field: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded).decode('utf-8'))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(payload, dict) or payload.get("f") != field or "id" not in payload:
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+    return payload
+
+
+def validate_page(page: PageParams, allowed_sorts: Sequence[str] = ()):
+    """Reject a bad sort or cursor before a conditional request is answered, so it gets a 400 rather than a 304"""
+    field, _ = parse_sort(page.sort, allowed_sorts)
+    if page.cursor:
+        decode_cursor(page.cursor, field)
+
+
+def keyset_filter(field: str, direction: int, position: dict) -> dict:
+    """Filter selecting documents strictly after the cursor position"""
+    op = "$gt" if direction == 1 else "$lt"
+    if field == "_id":
+        return {"_id": {op: position['id']}}
+    return {"$or": [
+        {field: {op: position['v']}},
+        {field: position['v'], "_id": {op: position['id']}}
+    ]}
+
+
+async def paginate(
+    collection,
+    query: dict,
+    page: PageParams,
+    allowed_sorts: Sequence[str] = (),
+    projection: Optional[dict] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one page using keyset pagination on (sort field, _id); returns (docs, next_cursor)"""
+    field, direction = parse_sort(page.sort, allowed_sorts)
+    if page.cursor:
+        query = {"$and": [query, keyset_filter(field, direction, decode_cursor(page.cursor, field))]}
+
+    sort_spec = [(field, direction)]
+    if field != "_id":
+        sort_spec.append(("_id", direction))
+        if projection is not None:
+            # The cursor is built from the last document's sort value
+            projection = {**projection, field: 1}
+
+    docs = await collection.find(query, projection).sort(sort_spec).limit(page.limit + 1).to_list(page.limit + 1)
+    next_cursor = None
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        next_cursor = encode_cursor(field, docs[-1])
+    return docs, next_cursor
+
+
+def list_response(items: list, next_cursor: Optional[str]) -> FastJSONResponse:
+    """JSON list body with the next page cursor in a response header"""
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return FastJSONResponse(content=items, headers=headers)
+
+
+def with_filters(query: dict, **filters) -> dict:
+    """Add equality filters for every query parameter that was supplied"""
+    query.update({field: value for field, value in filters.items() if value is not None})
+    return query
@@ -0,0 +1,13 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Workers run threads (Motor, anyio), and a child forked from a threaded process can
+# inherit a lock held by another thread and deadlock. "forkserver" forks children from a
+# clean single-threaded server process; use "spawn" where forkserver is unavailable.
+PROCESS_POOL_START_METHOD = os.getenv("PROCESS_POOL_START_METHOD", "forkserver")
+
+
+def new_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Process pool whose children are never forked from the threaded worker"""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(PROCESS_POOL_START_METHOD))
@@ -0,0 +1,199 @@
+import math
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+from cachetools import TTLCache
+from fastapi import HTTPException, Request
+from pymongo import ReturnDocument
+
+from metrics import register
+from user_repository import normalize_email
+
+LOGIN_RATE_LIMIT_ENABLED = os.getenv("LOGIN_RATE_LIMIT_ENABLED", "true").lower() == "true"
+LOGIN_RATE_LIMIT_WINDOW_SECONDS = int(os.getenv("LOGIN_RATE_LIMIT_WINDOW_SECONDS", 300))
+LOGIN_RATE_LIMIT_PER_EMAIL = int(os.getenv("LOGIN_RATE_LIMIT_PER_EMAIL", 5))
+# Only failed attempts count per IP, since carrier NAT puts many legitimate users behind one address
+LOGIN_RATE_LIMIT_PER_IP = int(os.getenv("LOGIN_RATE_LIMIT_PER_IP", 100))
+LOGIN_RATE_LIMIT_MAX_KEYS = int(os.getenv("LOGIN_RATE_LIMIT_MAX_KEYS", 100000))
+# "memory" keeps counters per worker; "mongo" also enforces them across workers via the rate_limits collection
+LOGIN_RATE_LIMIT_BACKEND = os.getenv("LOGIN_RATE_LIMIT_BACKEND", "memory")
+# Number of reverse proxies in front of the API that append to X-Forwarded-For; must match the deployment.
+# 0 (the default) ignores the header, otherwise any client could pick its own address.
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", 0))
+
+
+def client_ip(request: Request, trusted_proxies: int = TRUSTED_PROXY_COUNT) -> str:
+    """Client address as seen by the outermost trusted proxy"""
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and trusted_proxies > 0:
+        # Entries left of the ones our proxies appended are client-controlled, so they are ignored
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            return hops[-min(trusted_proxies, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+class SlidingWindow:
+    """Per-key sliding window of attempt times kept in process memory"""
+
+    def __init__(self, limit: int, window: int, size: int = LOGIN_RATE_LIMIT_MAX_KEYS):
+        self.limit = limit
+        self.window = window
+        # Keys idle for a whole window cannot be limited any more, so they are allowed to expire
+        self._hits = TTLCache(maxsize=size, ttl=window)
+
+    def _live(self, key: str, now: float) -> deque:
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = deque()
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        return hits
+
+    def retry_after(self, key: str) -> float:
+        """Seconds until the key may make another attempt, 0 when it is under the limit"""
+        now = time.monotonic()
+        hits = self._live(key, now)
+        return hits[0] + self.window - now if len(hits) >= self.limit else 0
+
+    def hit(self, key: str) -> float:
+        """Record an attempt; returns 0 when allowed, else seconds until the next attempt is allowed"""
+        now = time.monotonic()
+        hits = self._live(key, now)
+        if len(hits) >= self.limit:
+            return hits[0] + self.window - now
+        hits.append(now)
+        self._hits[key] = hits
+        return 0
+
+    def reset(self, key: str):
+        self._hits.pop(key, None)
+
+    def __len__(self):
+        return len(self._hits)
+
+
+class SharedWindow:
+    """Sliding-window estimate over two fixed Mongo counters, shared by every worker"""
+
+    def __init__(self, limit: int, window: int):
+        self.limit = limit
+        self.window = window
+
+    def _bucket_ids(self, key: str, now: float):
+        bucket = int(now // self.window)
+        return f"{key}:{bucket}", f"{key}:{bucket - 1}"
+
+    async def _estimate(self, db, now: float, current_count: int, previous_id: str):
+        previous = await db.rate_limits.find_one({"_id": previous_id}, {"count": 1})
+        elapsed = (now % self.window) / self.window
+        estimated = current_count + (previous['count'] if previous else 0) * (1 - elapsed)
+        return estimated, self.window * (1 - elapsed)
+
+    async def hit(self, db, key: str) -> float:
+        """Count an attempt; returns 0 when allowed, else seconds to wait"""
+        now = time.time()
+        current_id, previous_id = self._bucket_ids(key, now)
+        current = await db.rate_limits.find_one_and_update(
+            {"_id": current_id},
+            {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": datetime.utcnow() + timedelta(seconds=2 * self.window)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        estimated, wait = await self._estimate(db, now, current['count'], previous_id)
+        return wait if estimated > self.limit else 0
+
+    async def retry_after(self, db, key: str) -> float:
+        """Like hit() without counting; 0 while the key is under the limit"""
+        now = time.time()
+        current_id, previous_id = self._bucket_ids(key, now)
+        current = await db.rate_limits.find_one({"_id": current_id}, {"count": 1})
+        estimated, wait = await self._estimate(db, now, current['count'] if current else 0, previous_id)
+        return wait if estimated >= self.limit else 0
+
+    async def reset(self, db, key: str):
+        await db.rate_limits.delete_many({"_id": {"$in": list(self._bucket_ids(key, time.time()))}})
+
+
+class LoginRateLimiter:
+    """Brute-force guard for password and PIN logins, checked before the user is looked up"""
+
+    def __init__(
+        self,
+        enabled: bool = LOGIN_RATE_LIMIT_ENABLED,
+        window: int = LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+        per_email: int = LOGIN_RATE_LIMIT_PER_EMAIL,
+        per_ip: int = LOGIN_RATE_LIMIT_PER_IP,
+        backend: str = LOGIN_RATE_LIMIT_BACKEND
+    ):
+        self.enabled = enabled
+        self.by_email = SlidingWindow(per_email, window)
+        self.by_ip = SlidingWindow(per_ip, window)
+        self.shared_by_email = SharedWindow(per_email, window) if backend == "mongo" else None
+        self.shared_by_ip = SharedWindow(per_ip, window) if backend == "mongo" else None
+        self.allowed = 0
+        self.rejected = 0
+
+    def _reject(self, retry_after: float):
+        self.rejected += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts, please try again later",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    async def check(self, db, request: Request, email: str):
+        """Count a login attempt, raising 429 once the email or client IP is over its limit"""
+        if not self.enabled:
+            return
+        ip_key = f"ip:{client_ip(request)}"
+        email_key = f"email:{normalize_email(email)}"
+
+        # Local windows first: an attack is turned away without any database round trip.
+        # Email attempts are counted up front (and cleared on success) so concurrent guesses cannot slip through;
+        # the IP window only counts failures, reported through failed().
+        retry_after = self.by_ip.retry_after(ip_key) or self.by_email.hit(email_key)
+        if retry_after:
+            self._reject(retry_after)
+
+        if self.shared_by_email is not None:
+            retry_after = await self.shared_by_ip.retry_after(db, ip_key) or await self.shared_by_email.hit(db, email_key)
+            if retry_after:
+                self._reject(retry_after)
+
+        self.allowed += 1
+
+    async def failed(self, db, request: Request):
+        """Count a failed login against the client IP"""
+        if not self.enabled:
+            return
+        ip_key = f"ip:{client_ip(request)}"
+        self.by_ip.hit(ip_key)
+        if self.shared_by_ip is not None:
+            await self.shared_by_ip.hit(db, ip_key)
+
+    async def succeeded(self, db, email: str):
+        """Clear the email's failed attempts after a successful login; the IP window keeps counting"""
+        if not self.enabled:
+            return
+        email_key = f"email:{normalize_email(email)}"
+        self.by_email.reset(email_key)
+        if self.shared_by_email is not None:
+            await self.shared_by_email.reset(db, email_key)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": "mongo" if self.shared_by_email is not None else "memory",
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "tracked_emails": len(self.by_email),
+            "tracked_ips": len(self.by_ip),
+        }
+
+
+login_rate_limiter = LoginRateLimiter()
+register("login_rate_limit", login_rate_limiter.stats)
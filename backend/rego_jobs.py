@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from rego_service import rego_service, RegoParseError
+
+logger = logging.getLogger(__name__)
+
+REGO_JOB_WORKERS = int(os.getenv("REGO_JOB_WORKERS", 4))
+REGO_JOB_TIMEOUT_SECONDS = int(os.getenv("REGO_JOB_TIMEOUT_SECONDS", 60))
+REGO_JOB_POLL_SECONDS = float(os.getenv("REGO_JOB_POLL_SECONDS", 1.0))
+REGO_JOB_MAX_ATTEMPTS = int(os.getenv("REGO_JOB_MAX_ATTEMPTS", 2))
+REGO_JOB_MAX_QUEUED = int(os.getenv("REGO_JOB_MAX_QUEUED", 500))
+REGO_JOB_RETENTION_SECONDS = int(os.getenv("REGO_JOB_RETENTION_SECONDS", 86400))
+
+# A running job whose lease has passed is assumed to belong to a dead worker
+LEASE_GRACE_SECONDS = 30
+
+
+async def enqueue(db, user_id: str, image_base64: str) -> dict:
+    """Add a rego scan to the shared job queue"""
+    if await db.rego_jobs.count_documents({"status": "queued"}, limit=REGO_JOB_MAX_QUEUED) >= REGO_JOB_MAX_QUEUED:
+        raise HTTPException(status_code=503, detail="Rego scan queue is full, please retry", headers={"Retry-After": "5"})
+
+    job = {
+        "user_id": user_id,
+        "image_base64": image_base64,
+        "status": "queued",
+        "attempts": 0,
+        "created_at": datetime.utcnow()
+    }
+    result = await db.rego_jobs.insert_one(job)
+    job['_id'] = result.inserted_id
+    return job
+
+
+async def get_job(db, job_id: str, user_id: str) -> Optional[dict]:
+    """Get a job owned by the user, without the uploaded image"""
+    if not ObjectId.is_valid(job_id):
+        return None
+    return await db.rego_jobs.find_one(
+        {"_id": ObjectId(job_id), "user_id": user_id},
+        {"image_base64": 0}
+    )
+
+
+class RegoJobWorkerPool:
+    """Background workers that claim rego scan jobs from Mongo"""
+
+    def __init__(self, workers: int = REGO_JOB_WORKERS, timeout: int = REGO_JOB_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.timeout = timeout
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self, db):
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.ensure_future(self._run(db)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, db):
+        while True:
+            try:
+                job = await self._claim(db)
+                if job is None:
+                    await self._fail_abandoned(db)
+                    await asyncio.sleep(REGO_JOB_POLL_SECONDS)
+                    continue
+                await self._process(db, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Rego job worker error: {str(e)}")
+                await asyncio.sleep(REGO_JOB_POLL_SECONDS)
+
+    async def _claim(self, db) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await db.rego_jobs.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "queued"},
+                    {"status": "running", "lease_expires_at": {"$lt": now}}
+                ],
+                "attempts": {"$lt": REGO_JOB_MAX_ATTEMPTS}
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "worker": self.worker_id,
+                    "started_at": now,
+                    "lease_expires_at": now + timedelta(seconds=self.timeout + LEASE_GRACE_SECONDS)
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _fail_abandoned(self, db):
+        now = datetime.utcnow()
+        await db.rego_jobs.update_many(
+            {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": REGO_JOB_MAX_ATTEMPTS}},
+            {"$set": self._finished("failed", error="Timed out processing image")}
+        )
+
+    def _finished(self, status: str, result: Optional[dict] = None, error: Optional[str] = None) -> dict:
+        now = datetime.utcnow()
+        return {
+            "status": status,
+            "result": result,
+            "error": error,
+            "finished_at": now,
+            "expires_at": now + timedelta(seconds=REGO_JOB_RETENTION_SECONDS)
+        }
+
+    async def _process(self, db, job: dict):
+        update = None
+        try:
+            result = await asyncio.wait_for(
+                rego_service.extract(db, job['image_base64'], job['user_id']),
+                timeout=self.timeout
+            )
+            update = {"$set": self._finished("done", result=result), "$unset": {"image_base64": ""}}
+        except asyncio.TimeoutError:
+            if job['attempts'] < REGO_JOB_MAX_ATTEMPTS:
+                update = {"$set": {"status": "queued"}}
+            else:
+                update = {"$set": self._finished("failed", error="Timed out processing image"), "$unset": {"image_base64": ""}}
+        except RegoParseError:
+            update = {"$set": self._finished("failed", error="Failed to parse AI response"), "$unset": {"image_base64": ""}}
+        except Exception as e:
+            logger.error(f"Error processing rego job {job['_id']}: {str(e)}")
+            update = {"$set": self._finished("failed", error=f"Error processing image: {str(e)}"), "$unset": {"image_base64": ""}}
+        finally:
+            if update is not None:
+                await db.rego_jobs.update_one({"_id": job['_id'], "worker": self.worker_id}, update)
+
+
+rego_job_pool = RegoJobWorkerPool()
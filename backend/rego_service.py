@@ -0,0 +1,185 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from cachetools import TTLCache
+from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
+
+from image_pipeline import rego_preprocessor
+from metrics import LatencyHistogram, register
+
+logger = logging.getLogger(__name__)
+
+REGO_LLM_PROVIDER = os.getenv("REGO_LLM_PROVIDER", "openai")  # set to "fake" to run without the model
+REGO_LLM_MODEL = os.getenv("REGO_LLM_MODEL", "gpt-4o")
+REGO_CACHE_TTL_SECONDS = int(os.getenv("REGO_CACHE_TTL_SECONDS", 86400))
+REGO_CACHE_SIZE = int(os.getenv("REGO_CACHE_SIZE", 1024))
+REGO_PREPROCESS = os.getenv("REGO_PREPROCESS", "true").lower() == "true"
+
+REGO_SYSTEM_MESSAGE = "You are an AI assistant that extracts vehicle information from registration documents. Return data in JSON format only."
+
+REGO_PROMPT = """Extract the following information from this vehicle registration document and return ONLY a JSON object with these exact keys:
+            {
+                "rego": "registration number",
+                "vin": "VIN number",
+                "make": "vehicle make",
+                "model": "vehicle model",
+                "year": year as integer,
+                "body_type": "body type",
+                "expiry_date": "expiry date in YYYY-MM-DD format"
+            }
+            If any field is not found, use null. Return only the JSON, no other text."""
+
+_DATA_URI_PREFIX_RE = re.compile(r"^data:[^,]*,")
+
+
+class RegoParseError(Exception):
+    """The model returned something that is not the expected JSON"""
+
+
+class FakeLlmChat:
+    """Offline stand-in for LlmChat used by tests and local development"""
+
+    response = {
+        "rego": "ABC123",
+        "vin": "1HGBH41JXMN109186",
+        "make": "Toyota",
+        "model": "Camry",
+        "year": 2022,
+        "body_type": "Sedan",
+        "expiry_date": "2025-03-15"
+    }
+
+    def __init__(self, api_key=None, session_id=None, system_message=None):
+        self.session_id = session_id
+        self.messages = []
+
+    def with_model(self, provider: str, model: str):
+        return self
+
+    async def send_message(self, message) -> str:
+        self.messages.append(message)
+        return f"```json\n{json.dumps(self.response)}\n```"
+
+
+def parse_model_response(response: str) -> dict:
+    """Parse the model's JSON answer, tolerating markdown code fences"""
+    cleaned = response.strip()
+    if cleaned.startswith("```json"):
+        cleaned = cleaned[7:]
+    if cleaned.startswith("```"):
+        cleaned = cleaned[3:]
+    if cleaned.endswith("```"):
+        cleaned = cleaned[:-3]
+    try:
+        return json.loads(cleaned.strip())
+    except json.JSONDecodeError:
+        raise RegoParseError(response)
+
+
+def normalized_image_hash(image_base64: str) -> str:
+    """SHA-256 of the decoded image bytes, ignoring data URI prefixes and whitespace"""
+    payload = "".join(_DATA_URI_PREFIX_RE.sub("", image_base64.strip()).split())
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        data = payload.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+class RegoExtractionService:
+    """Rego extraction with a TTL/LRU result cache, Mongo persistence and request coalescing"""
+
+    def __init__(self, chat_factory: Optional[Callable] = None):
+        self.chat_factory = chat_factory or (FakeLlmChat if REGO_LLM_PROVIDER == "fake" else LlmChat)
+        self._cache = TTLCache(maxsize=REGO_CACHE_SIZE, ttl=REGO_CACHE_TTL_SECONDS)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.model_latency = LatencyHistogram()
+
+    async def extract(self, db, image_base64: str, user_id: str) -> dict:
+        """Extract vehicle data from a registration document image"""
+        key = normalized_image_hash(image_base64)
+        if key in self._cache:
+            self.memory_hits += 1
+            return dict(self._cache[key])
+
+        doc = await db.rego_scan_cache.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        if doc:
+            self.mongo_hits += 1
+            self._cache[key] = doc['result']
+            return dict(doc['result'])
+
+        # Retries of the same image while the first call is still running share it
+        task = self._in_flight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._call_model(db, key, image_base64, user_id))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return dict(await asyncio.shield(task))
+
+    async def _call_model(self, db, key: str, image_base64: str, user_id: str) -> dict:
+        if REGO_PREPROCESS:
+            image_base64 = await rego_preprocessor.process(image_base64)
+
+        chat = self.chat_factory(
+            api_key=os.getenv("EMERGENT_LLM_KEY"),
+            session_id=f"rego_scan_{user_id}_{int(datetime.utcnow().timestamp())}",
+            system_message=REGO_SYSTEM_MESSAGE
+        ).with_model("openai", REGO_LLM_MODEL)
+
+        message = UserMessage(text=REGO_PROMPT, file_contents=[ImageContent(image_base64=image_base64)])
+        started = time.perf_counter()
+        try:
+            response = await chat.send_message(message)
+            result = parse_model_response(response)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.model_latency.observe(time.perf_counter() - started)
+
+        now = datetime.utcnow()
+        self._cache[key] = result
+        await db.rego_scan_cache.update_one(
+            {"_id": key},
+            {"$set": {
+                "result": result,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=REGO_CACHE_TTL_SECONDS)
+            }},
+            upsert=True
+        )
+        return result
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.mongo_hits + self.misses + self.coalesced
+        return {
+            "memory_hits": self.memory_hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_ratio": round((self.memory_hits + self.mongo_hits) / lookups, 4) if lookups else 0.0,
+            "in_flight": len(self._in_flight),
+            "model_latency": self.model_latency.snapshot(),
+        }
+
+
+rego_service = RegoExtractionService()
+register("rego_extraction", rego_service.stats)
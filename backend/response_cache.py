@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from cachetools import TLRUCache
+from fastapi import Request, Response
+from pymongo import ReturnDocument
+
+from metrics import register
+from serialization import FastJSONResponse
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 300))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))
+# How often each worker checks for invalidations made on other workers
+RESPONSE_CACHE_SYNC_SECONDS = float(os.getenv("RESPONSE_CACHE_SYNC_SECONDS", 5))
+
+logger = logging.getLogger(__name__)
+
+CACHE_STATUS_HEADER = "X-Cache"
+
+# Headers recomputed by Starlette for every response
+_SKIPPED_HEADERS = {"content-length"}
+
+
+class CachedResponse:
+    """Serialized response body and headers, replayed as-is on a cache hit"""
+
+    __slots__ = ("body", "status_code", "headers", "ttl")
+
+    def __init__(self, body: bytes, status_code: int, headers: List[Tuple[str, str]], ttl: float):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers
+        self.ttl = ttl
+
+    @classmethod
+    def from_response(cls, response: Response, ttl: float) -> "CachedResponse":
+        headers = [
+            (name.decode('latin-1'), value.decode('latin-1'))
+            for name, value in response.raw_headers
+            if name.decode('latin-1').lower() not in _SKIPPED_HEADERS
+        ]
+        body = bytes(response.body)
+        # Hashed once here so conditional requests on cache hits are free
+        if not any(name.lower() == "etag" for name, _ in headers):
+            headers.append(("etag", body_etag(body)))
+        return cls(body, response.status_code, headers, ttl)
+
+    def to_response(self, cache_status: str) -> Response:
+        response = Response(content=self.body, status_code=self.status_code)
+        response.raw_headers = [
+            (name.encode('latin-1'), value.encode('latin-1')) for name, value in self.headers
+        ] + [
+            (b"content-length", str(len(self.body)).encode('latin-1')),
+            (CACHE_STATUS_HEADER.lower().encode('latin-1'), cache_status.encode('latin-1')),
+        ]
+        return response
+
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag for a response body"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def request_key(request: Request) -> str:
+    """Cache key for a request: path plus query parameters in a stable order"""
+    params = sorted(request.query_params.multi_items())
+    return f"{request.url.path}?{urlencode(params)}" if params else request.url.path
+
+
+def as_response(result) -> Response:
+    """Render an endpoint result (response model, dict or Response) into a Response"""
+    if isinstance(result, Response):
+        return result
+    return FastJSONResponse(content=result)
+
+
+class _Namespace:
+    def __init__(self, ttl: float, size: int):
+        self.ttl = ttl
+        self.cache = TLRUCache(maxsize=size, ttu=lambda _key, entry, now: now + entry.ttl, timer=time.monotonic)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+
+class ResponseCache:
+    """Read-through cache of serialized responses for public, user-independent endpoints"""
+
+    def __init__(self, enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.enabled = enabled
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+        # Last invalidation generation seen per namespace, from the cache_generations collection
+        self._generations: Dict[str, int] = {}
+
+    def namespace(self, name: str, ttl: float = RESPONSE_CACHE_TTL_SECONDS, size: int = RESPONSE_CACHE_SIZE):
+        """Declare a namespace with its default TTL and size bound"""
+        self._namespaces[name] = _Namespace(ttl, size)
+
+    async def get_or_build(
+        self,
+        name: str,
+        key: str,
+        build: Callable[[], Awaitable],
+        ttl: Optional[float] = None
+    ) -> Response:
+        """Cached response for key, calling build() once on a miss; only 200 responses are stored"""
+        if not self.enabled:
+            return as_response(await build())
+
+        ns = self._namespaces[name]
+        entry = ns.cache.get(key)
+        if entry is not None:
+            ns.hits += 1
+            return entry.to_response("HIT")
+
+        # Concurrent misses for the same key wait on a single build
+        flight_key = (name, key)
+        task = self._in_flight.get(flight_key)
+        if task is None:
+            ns.misses += 1
+            task = asyncio.ensure_future(self._build(ns, key, build, ttl or ns.ttl))
+            self._in_flight[flight_key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(flight_key, None))
+        else:
+            ns.coalesced += 1
+        entry = await asyncio.shield(task)
+        return entry.to_response("MISS")
+
+    async def _build(self, ns: _Namespace, key: str, build: Callable[[], Awaitable], ttl: float) -> CachedResponse:
+        entry = CachedResponse.from_response(as_response(await build()), ttl)
+        if entry.status_code == 200:
+            ns.cache[key] = entry
+        return entry
+
+    def invalidate(self, name: Optional[str] = None, key: Optional[str] = None) -> int:
+        """Drop one key, one namespace or everything; returns the number of entries removed"""
+        namespaces = [self._namespaces[name]] if name else list(self._namespaces.values())
+        removed = 0
+        for ns in namespaces:
+            if key is not None:
+                removed += 1 if ns.cache.pop(key, None) is not None else 0
+            else:
+                removed += len(ns.cache)
+                ns.cache.clear()
+        return removed
+
+    async def broadcast_invalidation(self, db, name: Optional[str] = None, key: Optional[str] = None) -> int:
+        """Invalidate locally and bump the namespace generations so every other worker drops them on its next sync"""
+        removed = self.invalidate(name, key)
+        # Other workers clear the whole namespace; per-key generations would cost a document per key
+        for ns_name in [name] if name else list(self._namespaces):
+            doc = await db.cache_generations.find_one_and_update(
+                {"_id": ns_name},
+                {"$inc": {"generation": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            self._generations[ns_name] = doc['generation']
+        return removed
+
+    async def sync(self, db):
+        """Clear namespaces that another worker invalidated since the last sync"""
+        async for doc in db.cache_generations.find({"_id": {"$in": list(self._namespaces)}}):
+            if doc['generation'] != self._generations.get(doc['_id'], 0):
+                self.invalidate(doc['_id'])
+                self._generations[doc['_id']] = doc['generation']
+
+    def has_namespace(self, name: str) -> bool:
+        return name in self._namespaces
+
+    def stats(self) -> dict:
+        stats = {"enabled": self.enabled, "in_flight": len(self._in_flight)}
+        for name, ns in self._namespaces.items():
+            lookups = ns.hits + ns.misses + ns.coalesced
+            stats[name] = {
+                "hits": ns.hits,
+                "misses": ns.misses,
+                "coalesced": ns.coalesced,
+                "hit_ratio": round(ns.hits / lookups, 4) if lookups else 0.0,
+                "cached": len(ns.cache),
+                "ttl_seconds": ns.ttl,
+            }
+        return stats
+
+
+class ResponseCacheSync:
+    """Background task that applies invalidations broadcast by other workers"""
+
+    def __init__(self, cache: ResponseCache, interval: float = RESPONSE_CACHE_SYNC_SECONDS):
+        self.cache = cache
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, db):
+        await self.cache.sync(db)
+        self._task = asyncio.ensure_future(self._run(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, db):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.cache.sync(db)
+            except Exception as e:
+                logger.error(f"Failed to sync response cache invalidations: {e}")
+
+
+response_cache = ResponseCache()
+response_cache.namespace("dealers")
+response_cache.namespace("providers")
+# Promotion status depends on the current time, so keep these short
+response_cache.namespace("promotions", ttl=int(os.getenv("PROMOTIONS_CACHE_TTL_SECONDS", 60)))
+register("response_cache", response_cache.stats)
+response_cache_sync = ResponseCacheSync(response_cache)
@@ -0,0 +1,42 @@
+from functools import lru_cache
+from typing import Any, FrozenSet, Type, TypeVar
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def _default(value: Any):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """orjson encoding that also handles pydantic models and ObjectIds"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    """App-wide JSON response; accepts pydantic models directly, so no jsonable_encoder pass is needed"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=256)
+def _required_fields(model: Type[BaseModel]) -> FrozenSet[str]:
+    return frozenset(name for name, field in model.model_fields.items() if field.is_required())
+
+
+def trusted(model: Type[M], doc: dict) -> M:
+    """Build a response model from a DB document without re-validating it"""
+    # Documents missing a required field go through validation so they still fail loudly
+    if _required_fields(model) <= doc.keys():
+        return model.model_construct(**doc)
+    return model(**doc)
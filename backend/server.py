@@ -1,28 +1,56 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response
+import asyncio
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from contextlib import asynccontextmanager
 import logging
+import time
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
+from pydantic import ValidationError
 
 from models import *
 from auth_utils import *
-from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
+from credential_service import credential_service
+from metrics import collect as collect_metrics
+import stats_service
+import versioning
+import sync_service
+from user_cache import user_cache
+import user_repository
+from rate_limit import login_rate_limiter
+from enrichment import attach, attach_names
+from serialization import FastJSONResponse, trusted
+from batch import BatchRequest, BatchResponse, run_batch
+from versioning import ConditionalGetMiddleware
+from compression import CompressionMiddleware
+from database import create_client, get_database, warm_up
+from db_indexes import ensure_indexes, verify_index_usage, VERIFY_INDEX_USAGE
+from blob_store import blob_store, blob_url, resolve_blob_refs, parse_range, verify_blob_signature
+from image_pipeline import variant_service, variant_url, start_image_pool, shutdown_image_pool, VARIANTS
+from rego_service import rego_service, RegoParseError
+import rego_jobs
+from pagination import PageParams, paginate, validate_page, list_response, with_filters, NEXT_CURSOR_HEADER, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from fieldsets import select_fields, projection_for, slim_model, FieldsParam, HEAVY_FIELDS
+from marketplace_models import MarketplaceListingResponse
+from marketplace_search import ListingFilters, LISTING_SORTS, listing_from_vehicle, facet_cache
+from response_cache import response_cache, response_cache_sync, request_key, CACHE_STATUS_HEADER, RESPONSE_CACHE_SYNC_SECONDS
+from dealer_search import nearby_pipeline, DEALER_NEARBY_DEFAULT_RADIUS_KM, DEALER_NEARBY_MAX_RADIUS_KM
+from rego_jobs import rego_job_pool, REGO_JOB_TIMEOUT_SECONDS
+import token_service
+from token_service import revocation_refresher
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection, opened per worker process by the app lifespan
+client: Optional[AsyncIOMotorClient] = None
+db = None
 
-# Create the main app
-app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
 logging.basicConfig(level=logging.INFO)
@@ -35,9 +63,25 @@ def serialize_doc(doc):
     if doc:
         doc['id'] = str(doc['_id'])
         del doc['_id']
+        resolve_blob_refs(doc)
     return doc
 
 
+def fields_response(model, selected, doc: dict):
+    """Full response model, or a JSON body with just the requested fields"""
+    if selected == frozenset(model.model_fields):
+        return trusted(model, doc)
+    return FastJSONResponse(content=trusted(slim_model(model, selected), doc))
+
+
+async def load_user(request: Request, user_id: str) -> Optional[dict]:
+    """User record for the request, shared by every sub-request of a batch; may be up to USER_CACHE_TTL_SECONDS stale"""
+    user = getattr(request.state, "user_doc", None)
+    if user is None:
+        user = await user_cache.get(db, user_id)
+    return user
+
+
 def get_status(end_date: datetime) -> str:
     """Determine if something is active or expired"""
     return "Active" if end_date > datetime.utcnow() else "Expired"
@@ -49,14 +93,13 @@ def get_status(end_date: datetime) -> str:
 async def register(user_data: UserCreate):
     """Register a new user"""
     # Check if user exists
-    existing_user = await db.users.find_one({"email": user_data.email})
-    if existing_user:
+    if await user_repository.email_taken(db, user_data.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create user
     user_dict = {
-        "email": user_data.email,
-        "password": hash_password(user_data.password),
+        "email": user_repository.normalize_email(user_data.email),
+        "password": await credential_service.hash_password(user_data.password),
         "full_name": user_data.full_name,
         "phone": user_data.phone,
         "member_id": generate_member_id(),
@@ -65,80 +108,66 @@ async def register(user_data: UserCreate):
     }
     
     result = await db.users.insert_one(user_dict)
-    user_dict['id'] = str(result.inserted_id)
     
     # Create token
-    token = create_access_token({"user_id": user_dict['id'], "email": user_dict['email']})
-    
-    user_response = UserResponse(
-        id=user_dict['id'],
-        email=user_dict['email'],
-        full_name=user_dict['full_name'],
-        phone=user_dict['phone'],
-        member_id=user_dict['member_id'],
-        created_at=user_dict['created_at']
-    )
+    token, refresh_token = await token_service.issue_tokens(db, str(result.inserted_id), user_dict['email'])
     
-    return TokenResponse(access_token=token, user=user_response)
+    return TokenResponse(access_token=token, refresh_token=refresh_token, user=user_repository.to_response(user_dict))
 
 
 @api_router.post("/auth/login", response_model=TokenResponse)
-async def login(credentials: UserLogin):
+async def login(request: Request, credentials: UserLogin):
     """Login with email and password"""
-    user = await db.users.find_one({"email": credentials.email})
-    if not user or not verify_password(credentials.password, user['password']):
+    await login_rate_limiter.check(db, request, credentials.email)
+    user = await user_repository.find_by_email(db, credentials.email, user_repository.LOGIN_PROJECTION)
+    if not user or not await credential_service.verify_password(credentials.password, user['password']):
+        await login_rate_limiter.failed(db, request)
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    await login_rate_limiter.succeeded(db, credentials.email)
     
-    token = create_access_token({"user_id": str(user['_id']), "email": user['email']})
+    token, refresh_token = await token_service.issue_tokens(db, str(user['_id']), user['email'])
     
-    user_response = UserResponse(
-        id=str(user['_id']),
-        email=user['email'],
-        full_name=user['full_name'],
-        phone=user['phone'],
-        member_id=user['member_id'],
-        created_at=user['created_at']
-    )
-    
-    return TokenResponse(access_token=token, user=user_response)
+    return TokenResponse(access_token=token, refresh_token=refresh_token, user=user_repository.to_response(user))
 
 
 @api_router.post("/auth/pin-login", response_model=TokenResponse)
-async def pin_login(credentials: PinLogin):
+async def pin_login(request: Request, credentials: PinLogin):
     """Login with email and PIN"""
-    user = await db.users.find_one({"email": credentials.email.lower().strip()})
+    await login_rate_limiter.check(db, request, credentials.email)
+    user = await user_repository.find_by_email(db, credentials.email, user_repository.PIN_LOGIN_PROJECTION)
     if not user or user.get('pin') != credentials.pin:
+        await login_rate_limiter.failed(db, request)
         raise HTTPException(status_code=401, detail="Incorrect email or PIN")
+    await login_rate_limiter.succeeded(db, credentials.email)
     
-    token = create_access_token({"user_id": str(user['_id']), "email": user['email']})
-    
-    user_response = UserResponse(
-        id=str(user['_id']),
-        email=user['email'],
-        full_name=user['full_name'],
-        phone=user['phone'],
-        member_id=user['member_id'],
-        created_at=user['created_at']
-    )
+    token, refresh_token = await token_service.issue_tokens(db, str(user['_id']), user['email'])
     
-    return TokenResponse(access_token=token, user=user_response)
+    return TokenResponse(access_token=token, refresh_token=refresh_token, user=user_repository.to_response(user))
+
+
+@api_router.post("/auth/refresh", response_model=RefreshTokenResponse)
+async def refresh_access_token(body: RefreshTokenRequest):
+    """Exchange a refresh token for a new access token; the refresh token is single use"""
+    token, refresh_token, _ = await token_service.rotate(db, body.refresh_token)
+    return RefreshTokenResponse(access_token=token, refresh_token=refresh_token)
+
+
+@api_router.post("/auth/logout")
+async def logout(current_user: dict = Depends(get_current_user)):
+    """End the current session on every worker"""
+    if current_user.get('sid'):
+        await token_service.revoke_session(db, current_user['user_id'], current_user['sid'])
+    return {"message": "Logged out"}
 
 
 @api_router.get("/auth/me", response_model=UserResponse)
 async def get_me(current_user: dict = Depends(get_current_user)):
     """Get current user info"""
-    user = await db.users.find_one({"_id": ObjectId(current_user['user_id'])})
+    user = await user_repository.get_profile(db, current_user['user_id'])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return UserResponse(
-        id=str(user['_id']),
-        email=user['email'],
-        full_name=user['full_name'],
-        phone=user['phone'],
-        member_id=user['member_id'],
-        created_at=user['created_at']
-    )
+    return user
 
 
 @api_router.put("/auth/update-profile", response_model=UserResponse)
@@ -150,23 +179,18 @@ async def update_profile(update_data: UserUpdate, current_user: dict = Depends(g
     if update_data.phone:
         update_dict['phone'] = update_data.phone
     if update_data.password:
-        update_dict['password'] = hash_password(update_data.password)
+        update_dict['password'] = await credential_service.hash_password(update_data.password)
     
     if update_dict:
         await db.users.update_one(
             {"_id": ObjectId(current_user['user_id'])},
             {"$set": update_dict}
         )
+        user_repository.invalidate(current_user['user_id'])
+        if 'password' in update_dict:
+            await token_service.revoke_user_sessions(db, current_user['user_id'], current_user.get('sid'))
     
-    user = await db.users.find_one({"_id": ObjectId(current_user['user_id'])})
-    return UserResponse(
-        id=str(user['_id']),
-        email=user['email'],
-        full_name=user['full_name'],
-        phone=user['phone'],
-        member_id=user['member_id'],
-        created_at=user['created_at']
-    )
+    return await user_repository.get_profile(db, current_user['user_id'])
 
 
 # ===== DASHBOARD =====
@@ -174,31 +198,48 @@ async def update_profile(update_data: UserUpdate, current_user: dict = Depends(g
 @api_router.get("/dashboard/stats", response_model=DashboardStats)
 async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
     """Get dashboard statistics"""
-    user_id = current_user['user_id']
-    
-    total_vehicles = await db.vehicles.count_documents({"user_id": user_id})
-    
-    active_insurance = await db.insurance_policies.count_documents({
-        "user_id": user_id,
-        "end_date": {"$gt": datetime.utcnow()}
-    })
-    
-    active_finance = await db.finance_products.count_documents({
-        "user_id": user_id,
-        "end_date": {"$gt": datetime.utcnow()}
-    })
-    
-    active_roadside = await db.roadside_assistance.count_documents({
-        "user_id": user_id,
-        "end_date": {"$gt": datetime.utcnow()}
-    })
-    
-    return DashboardStats(
-        total_vehicles=total_vehicles,
-        active_insurance_policies=active_insurance,
-        active_finance_products=active_finance,
-        active_roadside_memberships=active_roadside
+    stats = await stats_service.get_stats(db, current_user['user_id'])
+    return DashboardStats(**stats)
+
+
+# ===== SYNC =====
+
+# Response model per synced collection; transfers are sent as stored
+SYNC_MODELS = {
+    "vehicles": VehicleResponse,
+    "insurance_policies": InsurancePolicyResponse,
+    "finance_products": FinanceProductResponse,
+    "roadside_assistance": RoadsideAssistanceResponse,
+    "service_bookings": ServiceBookingResponse,
+}
+
+
+@api_router.get("/sync", response_model=SyncResponse)
+async def sync(since: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Get everything created, updated or deleted since the last sync token, one page at a time"""
+    changes, deleted, full_sync, sync_token, has_more = await sync_service.collect_changes(
+        db, current_user['user_id'], since
     )
+    for collection in stats_service.PRODUCT_COUNTERS:
+        for p in changes[collection]:
+            p['status'] = get_status(p['end_date'])
+    for p in changes["finance_products"]:
+        p['outstanding_balance'] = p.get('outstanding_balance', p['loan_amount'])
+
+    rows = {
+        collection: [
+            trusted(SYNC_MODELS[collection], serialize_doc(d)) if collection in SYNC_MODELS else serialize_doc(d)
+            for d in docs
+        ]
+        for collection, docs in changes.items()
+    }
+    return FastJSONResponse(content=SyncResponse.model_construct(
+        sync_token=sync_token,
+        full_sync=full_sync,
+        has_more=has_more,
+        deleted=deleted,
+        **rows
+    ))
 
 
 # ===== VEHICLE ENDPOINTS =====
@@ -207,63 +248,76 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
 async def extract_rego_data(scan_data: RegoScanRequest, current_user: dict = Depends(get_current_user)):
     """Extract vehicle data from registration paper using AI"""
     try:
-        # Initialize LLM with Emergent key
-        chat = LlmChat(
-            api_key=os.getenv("EMERGENT_LLM_KEY"),
-            session_id=f"rego_scan_{current_user['user_id']}_{int(datetime.utcnow().timestamp())}",
-            system_message="You are an AI assistant that extracts vehicle information from registration documents. Return data in JSON format only."
-        ).with_model("openai", "gpt-4o")
-        
-        # Create image content
-        image_content = ImageContent(image_base64=scan_data.image_base64)
-        
-        # Send message with image
-        message = UserMessage(
-            text="""Extract the following information from this vehicle registration document and return ONLY a JSON object with these exact keys:
-            {
-                "rego": "registration number",
-                "vin": "VIN number",
-                "make": "vehicle make",
-                "model": "vehicle model",
-                "year": year as integer,
-                "body_type": "body type",
-                "expiry_date": "expiry date in YYYY-MM-DD format"
-            }
-            If any field is not found, use null. Return only the JSON, no other text.""",
-            file_contents=[image_content]
+        return await asyncio.wait_for(
+            rego_service.extract(db, scan_data.image_base64, current_user['user_id']),
+            timeout=REGO_JOB_TIMEOUT_SECONDS
         )
-        
-        response = await chat.send_message(message)
-        
-        # Parse the response
-        import json
-        try:
-            # Clean response (remove markdown if present)
-            cleaned = response.strip()
-            if cleaned.startswith("```json"):
-                cleaned = cleaned[7:]
-            if cleaned.startswith("```"):
-                cleaned = cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
-            
-            extracted_data = json.loads(cleaned)
-            return extracted_data
-        except json.JSONDecodeError:
-            logger.error(f"Failed to parse AI response: {response}")
-            raise HTTPException(status_code=500, detail="Failed to parse AI response")
-        
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out processing image, try the scan jobs endpoint")
+    except RegoParseError as e:
+        logger.error(f"Failed to parse AI response: {str(e)}")
+        raise HTTPException(status_code=502, detail="Failed to parse AI response")
     except Exception as e:
         logger.error(f"Error extracting rego data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
 
+def rego_job_response(job: dict) -> RegoScanJobResponse:
+    return RegoScanJobResponse(
+        job_id=str(job['_id']),
+        status=job['status'],
+        result=job.get('result'),
+        error=job.get('error'),
+        created_at=job['created_at'],
+        finished_at=job.get('finished_at')
+    )
+
+
+@api_router.post("/vehicles/extract-rego-data/jobs", response_model=RegoScanJobResponse, status_code=202)
+async def create_rego_scan_job(scan_data: RegoScanRequest, current_user: dict = Depends(get_current_user)):
+    """Queue a registration paper scan and return immediately"""
+    job = await rego_jobs.enqueue(db, current_user['user_id'], scan_data.image_base64)
+    return rego_job_response(job)
+
+
+@api_router.get("/vehicles/extract-rego-data/jobs/{job_id}", response_model=RegoScanJobResponse)
+async def get_rego_scan_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Get the status and result of a queued scan"""
+    job = await rego_jobs.get_job(db, job_id, current_user['user_id'])
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    
+    return rego_job_response(job)
+
+
 @api_router.get("/vehicles", response_model=List[VehicleResponse])
-async def get_vehicles(current_user: dict = Depends(get_current_user)):
-    """Get all user vehicles"""
-    vehicles = await db.vehicles.find({"user_id": current_user['user_id']}).to_list(100)
-    return [VehicleResponse(**serialize_doc(v)) for v in vehicles]
+async def get_vehicles(
+    request: Request,
+    make: Optional[str] = None,
+    model: Optional[str] = None,
+    year: Optional[int] = None,
+    fields: Optional[str] = FieldsParam,
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get user vehicles, one page at a time"""
+    selected = select_fields(fields, VehicleResponse)
+    validate_page(page, ["created_at"])
+    etag = await versioning.list_etag(db, request, "vehicles", current_user['user_id'])
+    if cached := versioning.not_modified(request, etag):
+        return cached
+
+    response_model = slim_model(VehicleResponse, selected)
+    query = with_filters({"user_id": current_user['user_id']}, make=make, model=model, year=year)
+    vehicles, next_cursor = await paginate(
+        db.vehicles, query, page, allowed_sorts=["created_at"], projection=projection_for(selected)
+    )
+    for v in vehicles:
+        if 'image' in v:
+            v['image'] = variant_url(v['image'], "medium")
+    return versioning.with_etag(
+        list_response([trusted(response_model, serialize_doc(v)) for v in vehicles], next_cursor), etag
+    )
 
 
 @api_router.post("/vehicles", response_model=VehicleResponse)
@@ -272,21 +326,38 @@ async def create_vehicle(vehicle_data: VehicleCreate, current_user: dict = Depen
     vehicle_dict = vehicle_data.dict()
     vehicle_dict['user_id'] = current_user['user_id']
     vehicle_dict['created_at'] = datetime.utcnow()
+    vehicle_dict['updated_at'] = vehicle_dict['created_at']
+    vehicle_dict['version'] = 1
+    await blob_store.externalize_fields(db, "vehicles", vehicle_dict)
     
     result = await db.vehicles.insert_one(vehicle_dict)
     vehicle_dict['id'] = str(result.inserted_id)
+    await stats_service.vehicle_added(db, current_user['user_id'])
+    await versioning.bump(db, "vehicles", current_user['user_id'])
     
-    return VehicleResponse(**vehicle_dict)
+    return VehicleResponse(**resolve_blob_refs(vehicle_dict))
 
 
 @api_router.get("/vehicles/{vehicle_id}", response_model=VehicleResponse)
-async def get_vehicle(vehicle_id: str, current_user: dict = Depends(get_current_user)):
+async def get_vehicle(
+    request: Request,
+    vehicle_id: str,
+    fields: Optional[str] = FieldsParam,
+    current_user: dict = Depends(get_current_user)
+):
     """Get specific vehicle"""
-    vehicle = await db.vehicles.find_one({"_id": ObjectId(vehicle_id), "user_id": current_user['user_id']})
+    selected = select_fields(fields, VehicleResponse)
+    vehicle = await db.vehicles.find_one(
+        {"_id": ObjectId(vehicle_id), "user_id": current_user['user_id']},
+        projection_for(selected, depends_on=["version"])
+    )
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
-    return VehicleResponse(**serialize_doc(vehicle))
+    etag = versioning.doc_etag(request, "vehicles", vehicle)
+    if cached := versioning.not_modified(request, etag):
+        return cached
+    return versioning.with_etag(fields_response(VehicleResponse, selected, serialize_doc(vehicle)), etag)
 
 
 @api_router.put("/vehicles/{vehicle_id}", response_model=VehicleResponse)
@@ -295,10 +366,14 @@ async def update_vehicle(vehicle_id: str, update_data: VehicleUpdate, current_us
     update_dict = {k: v for k, v in update_data.dict(exclude_unset=True).items() if v is not None}
     
     if update_dict:
-        await db.vehicles.update_one(
+        await blob_store.externalize_fields(db, "vehicles", update_dict)
+        update_dict['updated_at'] = datetime.utcnow()
+        result = await db.vehicles.update_one(
             {"_id": ObjectId(vehicle_id), "user_id": current_user['user_id']},
-            {"$set": update_dict}
+            {"$set": update_dict, "$inc": {"version": 1}}
         )
+        if result.matched_count:
+            await versioning.bump(db, "vehicles", current_user['user_id'])
     
     vehicle = await db.vehicles.find_one({"_id": ObjectId(vehicle_id)})
     if not vehicle:
@@ -314,21 +389,45 @@ async def delete_vehicle(vehicle_id: str, current_user: dict = Depends(get_curre
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
+    await stats_service.vehicle_removed(db, current_user['user_id'])
+    await versioning.bump(db, "vehicles", current_user['user_id'])
+    await sync_service.record_deletion(db, "vehicles", current_user['user_id'], vehicle_id)
     return {"message": "Vehicle deleted successfully"}
 
 
 # ===== INSURANCE ENDPOINTS =====
 
 @api_router.get("/insurance-policies", response_model=List[InsurancePolicyResponse])
-async def get_insurance_policies(current_user: dict = Depends(get_current_user)):
-    """Get all insurance policies"""
-    policies = await db.insurance_policies.find({"user_id": current_user['user_id']}).to_list(100)
+async def get_insurance_policies(
+    request: Request,
+    vehicle_id: Optional[str] = None,
+    policy_type: Optional[str] = None,
+    fields: Optional[str] = FieldsParam,
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get insurance policies, one page at a time"""
+    selected = select_fields(fields, InsurancePolicyResponse, HEAVY_FIELDS["insurance_policies"])
+    validate_page(page, ["end_date"])
+    embeds = ["providers"] if "provider_name" in selected else []
+    etag = await versioning.list_etag(db, request, "insurance_policies", current_user['user_id'], embeds)
+    if cached := versioning.not_modified(request, etag):
+        return cached
+
+    response_model = slim_model(InsurancePolicyResponse, selected)
+    query = with_filters({"user_id": current_user['user_id']}, vehicle_id=vehicle_id, policy_type=policy_type)
+    policies, next_cursor = await paginate(
+        db.insurance_policies, query, page, allowed_sorts=["end_date"],
+        projection=projection_for(selected, depends_on=["end_date", "provider_id"])
+    )
+    if "provider_name" in selected:
+        await attach_names(db, policies, "provider_id", "providers", "provider_name")
     result = []
     for p in policies:
         p = serialize_doc(p)
         p['status'] = get_status(p['end_date'])
-        result.append(InsurancePolicyResponse(**p))
-    return result
+        result.append(trusted(response_model, p))
+    return versioning.with_etag(list_response(result, next_cursor), etag)
 
 
 @api_router.post("/insurance-policies", response_model=InsurancePolicyResponse)
@@ -337,24 +436,46 @@ async def create_insurance_policy(policy_data: InsurancePolicyCreate, current_us
     policy_dict = policy_data.dict()
     policy_dict['user_id'] = current_user['user_id']
     policy_dict['created_at'] = datetime.utcnow()
+    policy_dict['updated_at'] = policy_dict['created_at']
+    policy_dict['version'] = 1
     policy_dict['status'] = get_status(policy_data.end_date)
+    await blob_store.externalize_fields(db, "insurance_policies", policy_dict)
     
     result = await db.insurance_policies.insert_one(policy_dict)
     policy_dict['id'] = str(result.inserted_id)
+    await stats_service.product_added(db, "insurance_policies", current_user['user_id'], policy_data.end_date)
+    await versioning.bump(db, "insurance_policies", current_user['user_id'])
     
-    return InsurancePolicyResponse(**policy_dict)
+    return InsurancePolicyResponse(**resolve_blob_refs(policy_dict))
 
 
 @api_router.get("/insurance-policies/{policy_id}", response_model=InsurancePolicyResponse)
-async def get_insurance_policy(policy_id: str, current_user: dict = Depends(get_current_user)):
+async def get_insurance_policy(
+    request: Request,
+    policy_id: str,
+    fields: Optional[str] = FieldsParam,
+    current_user: dict = Depends(get_current_user)
+):
     """Get specific policy"""
-    policy = await db.insurance_policies.find_one({"_id": ObjectId(policy_id), "user_id": current_user['user_id']})
+    selected = select_fields(fields, InsurancePolicyResponse)
+    policy = await db.insurance_policies.find_one(
+        {"_id": ObjectId(policy_id), "user_id": current_user['user_id']},
+        projection_for(selected, depends_on=["end_date", "version", "provider_id"])
+    )
     if not policy:
         raise HTTPException(status_code=404, detail="Policy not found")
     
+    status = get_status(policy['end_date'])
+    embeds = await versioning.shared_versions(db, "providers") if "provider_name" in selected else []
+    etag = versioning.doc_etag(request, "insurance_policies", policy, status, *embeds)
+    if cached := versioning.not_modified(request, etag):
+        return cached
+
+    if "provider_name" in selected:
+        await attach_names(db, [policy], "provider_id", "providers", "provider_name")
     policy = serialize_doc(policy)
-    policy['status'] = get_status(policy['end_date'])
-    return InsurancePolicyResponse(**policy)
+    policy['status'] = status
+    return versioning.with_etag(fields_response(InsurancePolicyResponse, selected, policy), etag)
 
 
 @api_router.put("/insurance-policies/{policy_id}", response_model=InsurancePolicyResponse)
@@ -363,10 +484,16 @@ async def update_insurance_policy(policy_id: str, update_data: InsurancePolicyUp
     update_dict = {k: v for k, v in update_data.dict(exclude_unset=True).items() if v is not None}
     
     if update_dict:
-        await db.insurance_policies.update_one(
+        await blob_store.externalize_fields(db, "insurance_policies", update_dict)
+        update_dict['updated_at'] = datetime.utcnow()
+        result = await db.insurance_policies.update_one(
             {"_id": ObjectId(policy_id), "user_id": current_user['user_id']},
-            {"$set": update_dict}
+            {"$set": update_dict, "$inc": {"version": 1}}
         )
+        if 'end_date' in update_dict:
+            await stats_service.invalidate(db, current_user['user_id'])
+        if result.matched_count:
+            await versioning.bump(db, "insurance_policies", current_user['user_id'])
     
     policy = await db.insurance_policies.find_one({"_id": ObjectId(policy_id)})
     if not policy:
@@ -380,26 +507,49 @@ async def update_insurance_policy(policy_id: str, update_data: InsurancePolicyUp
 @api_router.delete("/insurance-policies/{policy_id}")
 async def delete_insurance_policy(policy_id: str, current_user: dict = Depends(get_current_user)):
     """Delete policy"""
-    result = await db.insurance_policies.delete_one({"_id": ObjectId(policy_id), "user_id": current_user['user_id']})
-    if result.deleted_count == 0:
+    policy = await db.insurance_policies.find_one_and_delete(
+        {"_id": ObjectId(policy_id), "user_id": current_user['user_id']},
+        projection={"end_date": 1}
+    )
+    if not policy:
         raise HTTPException(status_code=404, detail="Policy not found")
     
+    await stats_service.product_removed(db, "insurance_policies", current_user['user_id'], policy['end_date'])
+    await versioning.bump(db, "insurance_policies", current_user['user_id'])
+    await sync_service.record_deletion(db, "insurance_policies", current_user['user_id'], policy_id)
     return {"message": "Policy deleted successfully"}
 
 
 # ===== FINANCE ENDPOINTS =====
 
 @api_router.get("/finance-products", response_model=List[FinanceProductResponse])
-async def get_finance_products(current_user: dict = Depends(get_current_user)):
-    """Get all finance products"""
-    products = await db.finance_products.find({"user_id": current_user['user_id']}).to_list(100)
+async def get_finance_products(
+    request: Request,
+    vehicle_id: Optional[str] = None,
+    fields: Optional[str] = FieldsParam,
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get finance products, one page at a time"""
+    selected = select_fields(fields, FinanceProductResponse, HEAVY_FIELDS["finance_products"])
+    validate_page(page, ["end_date"])
+    etag = await versioning.list_etag(db, request, "finance_products", current_user['user_id'])
+    if cached := versioning.not_modified(request, etag):
+        return cached
+
+    response_model = slim_model(FinanceProductResponse, selected)
+    query = with_filters({"user_id": current_user['user_id']}, vehicle_id=vehicle_id)
+    products, next_cursor = await paginate(
+        db.finance_products, query, page, allowed_sorts=["end_date"],
+        projection=projection_for(selected, depends_on=["end_date", "loan_amount"])
+    )
     result = []
     for p in products:
         p = serialize_doc(p)
         p['status'] = get_status(p['end_date'])
         p['outstanding_balance'] = p.get('outstanding_balance', p['loan_amount'])
-        result.append(FinanceProductResponse(**p))
-    return result
+        result.append(trusted(response_model, p))
+    return versioning.with_etag(list_response(result, next_cursor), etag)
 
 
 @api_router.post("/finance-products", response_model=FinanceProductResponse)
@@ -408,27 +558,49 @@ async def create_finance_product(product_data: FinanceProductCreate, current_use
     product_dict = product_data.dict()
     product_dict['user_id'] = current_user['user_id']
     product_dict['created_at'] = datetime.utcnow()
+    product_dict['updated_at'] = product_dict['created_at']
+    product_dict['version'] = 1
     product_dict['status'] = get_status(product_data.end_date)
     product_dict['outstanding_balance'] = product_data.loan_amount
+    await blob_store.externalize_fields(db, "finance_products", product_dict)
     
     result = await db.finance_products.insert_one(product_dict)
     product_dict['id'] = str(result.inserted_id)
+    await stats_service.product_added(db, "finance_products", current_user['user_id'], product_data.end_date)
+    await versioning.bump(db, "finance_products", current_user['user_id'])
     
-    return FinanceProductResponse(**product_dict)
+    return FinanceProductResponse(**resolve_blob_refs(product_dict))
 
 
 # ===== ROADSIDE ASSISTANCE ENDPOINTS =====
 
 @api_router.get("/roadside-assistance", response_model=List[RoadsideAssistanceResponse])
-async def get_roadside_assistance(current_user: dict = Depends(get_current_user)):
-    """Get all roadside memberships"""
-    memberships = await db.roadside_assistance.find({"user_id": current_user['user_id']}).to_list(100)
+async def get_roadside_assistance(
+    request: Request,
+    vehicle_id: Optional[str] = None,
+    fields: Optional[str] = FieldsParam,
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get roadside memberships, one page at a time"""
+    selected = select_fields(fields, RoadsideAssistanceResponse, HEAVY_FIELDS["roadside_assistance"])
+    validate_page(page, ["end_date"])
+    etag = await versioning.list_etag(db, request, "roadside_assistance", current_user['user_id'])
+    if cached := versioning.not_modified(request, etag):
+        return cached
+
+    response_model = slim_model(RoadsideAssistanceResponse, selected)
+    query = with_filters({"user_id": current_user['user_id']}, vehicle_id=vehicle_id)
+    memberships, next_cursor = await paginate(
+        db.roadside_assistance, query, page, allowed_sorts=["end_date"],
+        projection=projection_for(selected, depends_on=["end_date"])
+    )
     result = []
     for m in memberships:
         m = serialize_doc(m)
         m['status'] = get_status(m['end_date'])
-        result.append(RoadsideAssistanceResponse(**m))
-    return result
+        result.append(trusted(response_model, m))
+    return versioning.with_etag(list_response(result, next_cursor), etag)
 
 
 @api_router.post("/roadside-assistance", response_model=RoadsideAssistanceResponse)
@@ -437,87 +609,166 @@ async def create_roadside_assistance(membership_data: RoadsideAssistanceCreate,
     membership_dict = membership_data.dict()
     membership_dict['user_id'] = current_user['user_id']
     membership_dict['created_at'] = datetime.utcnow()
+    membership_dict['updated_at'] = membership_dict['created_at']
+    membership_dict['version'] = 1
     membership_dict['status'] = get_status(membership_data.end_date)
+    await blob_store.externalize_fields(db, "roadside_assistance", membership_dict)
     
     result = await db.roadside_assistance.insert_one(membership_dict)
     membership_dict['id'] = str(result.inserted_id)
+    await stats_service.product_added(db, "roadside_assistance", current_user['user_id'], membership_data.end_date)
+    await versioning.bump(db, "roadside_assistance", current_user['user_id'])
     
-    return RoadsideAssistanceResponse(**membership_dict)
+    return RoadsideAssistanceResponse(**resolve_blob_refs(membership_dict))
 
 
 # ===== DEALERS ENDPOINTS =====
 
 @api_router.get("/dealers", response_model=List[DealerResponse])
-async def get_dealers(is_approved: bool = True):
-    """Get all approved dealers"""
-    dealers = await db.dealers.find({"is_approved": is_approved}).to_list(100)
-    return [DealerResponse(**serialize_doc(d)) for d in dealers]
+async def get_dealers(
+    request: Request,
+    is_approved: bool = True,
+    dealer_type: Optional[str] = None,
+    fields: Optional[str] = FieldsParam,
+    page: PageParams = Depends()
+):
+    """Get approved dealers, one page at a time"""
+    async def build():
+        selected = select_fields(fields, DealerResponse)
+        response_model = slim_model(DealerResponse, selected)
+        query = with_filters({"is_approved": is_approved}, dealer_type=dealer_type)
+        dealers, next_cursor = await paginate(
+            db.dealers, query, page, allowed_sorts=["name"], projection=projection_for(selected)
+        )
+        return list_response([trusted(response_model, serialize_doc(d)) for d in dealers], next_cursor)
+
+    return await response_cache.get_or_build("dealers", request_key(request), build)
+
+
+@api_router.get("/dealers/nearby", response_model=List[DealerNearbyResponse])
+async def get_nearby_dealers(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(DEALER_NEARBY_DEFAULT_RADIUS_KM, gt=0, le=DEALER_NEARBY_MAX_RADIUS_KM, description="Radius in km"),
+    service: Optional[str] = None,
+    dealer_type: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = FieldsParam
+):
+    """Get approved dealers near a point, nearest first"""
+    selected = select_fields(fields, DealerNearbyResponse) | {"distance_km"}
+    response_model = slim_model(DealerNearbyResponse, selected)
+    pipeline = nearby_pipeline(
+        lat, lng, radius, limit,
+        service=service, dealer_type=dealer_type, projection=projection_for(selected)
+    )
+    dealers = await db.dealers.aggregate(pipeline).to_list(limit)
+    return list_response([trusted(response_model, serialize_doc(d)) for d in dealers], None)
 
 
 @api_router.get("/dealers/{dealer_id}", response_model=DealerResponse)
-async def get_dealer(dealer_id: str):
+async def get_dealer(request: Request, dealer_id: str, fields: Optional[str] = FieldsParam):
     """Get specific dealer"""
-    dealer = await db.dealers.find_one({"_id": ObjectId(dealer_id)})
-    if not dealer:
-        raise HTTPException(status_code=404, detail="Dealer not found")
-    
-    return DealerResponse(**serialize_doc(dealer))
+    async def build():
+        selected = select_fields(fields, DealerResponse)
+        dealer = await db.dealers.find_one({"_id": ObjectId(dealer_id)}, projection_for(selected))
+        if not dealer:
+            raise HTTPException(status_code=404, detail="Dealer not found")
+
+        return fields_response(DealerResponse, selected, serialize_doc(dealer))
+
+    return await response_cache.get_or_build("dealers", request_key(request), build)
 
 
 # ===== PROMOTIONS ENDPOINTS =====
 
 @api_router.get("/promotions", response_model=List[PromotionResponse])
-async def get_promotions(status: str = "active"):
-    """Get promotions"""
-    query = {}
-    if status == "active":
-        query = {
-            "start_date": {"$lte": datetime.utcnow()},
-            "end_date": {"$gte": datetime.utcnow()}
-        }
-    
-    promotions = await db.promotions.find(query).to_list(100)
-    result = []
-    for p in promotions:
-        p = serialize_doc(p)
-        # Determine status
-        now = datetime.utcnow()
-        if now < p['start_date']:
-            p['status'] = "Upcoming"
-        elif now > p['end_date']:
-            p['status'] = "Expired"
-        else:
-            p['status'] = "Active"
-        result.append(PromotionResponse(**p))
-    return result
+async def get_promotions(
+    request: Request,
+    status: str = "active",
+    category: Optional[str] = None,
+    page: PageParams = Depends()
+):
+    """Get promotions, one page at a time"""
+    async def build():
+        query = {}
+        if status == "active":
+            query = {
+                "start_date": {"$lte": datetime.utcnow()},
+                "end_date": {"$gte": datetime.utcnow()}
+            }
+        with_filters(query, category=category)
+
+        promotions, next_cursor = await paginate(db.promotions, query, page, allowed_sorts=["end_date"])
+        result = []
+        for p in promotions:
+            p = serialize_doc(p)
+            # Determine status
+            now = datetime.utcnow()
+            if now < p['start_date']:
+                p['status'] = "Upcoming"
+            elif now > p['end_date']:
+                p['status'] = "Expired"
+            else:
+                p['status'] = "Active"
+            result.append(trusted(PromotionResponse, p))
+        return list_response(result, next_cursor)
+
+    return await response_cache.get_or_build("promotions", request_key(request), build)
 
 
 @api_router.get("/promotions/{promotion_id}", response_model=PromotionResponse)
-async def get_promotion(promotion_id: str):
+async def get_promotion(request: Request, promotion_id: str):
     """Get specific promotion"""
-    promotion = await db.promotions.find_one({"_id": ObjectId(promotion_id)})
-    if not promotion:
-        raise HTTPException(status_code=404, detail="Promotion not found")
-    
-    promotion = serialize_doc(promotion)
-    now = datetime.utcnow()
-    if now < promotion['start_date']:
-        promotion['status'] = "Upcoming"
-    elif now > promotion['end_date']:
-        promotion['status'] = "Expired"
-    else:
-        promotion['status'] = "Active"
-    
-    return PromotionResponse(**promotion)
+    async def build():
+        promotion = await db.promotions.find_one({"_id": ObjectId(promotion_id)})
+        if not promotion:
+            raise HTTPException(status_code=404, detail="Promotion not found")
+
+        promotion = serialize_doc(promotion)
+        now = datetime.utcnow()
+        if now < promotion['start_date']:
+            promotion['status'] = "Upcoming"
+        elif now > promotion['end_date']:
+            promotion['status'] = "Expired"
+        else:
+            promotion['status'] = "Active"
+
+        return PromotionResponse(**promotion)
+
+    return await response_cache.get_or_build("promotions", request_key(request), build)
 
 
 # ===== SERVICE BOOKING ENDPOINTS =====
 
 @api_router.get("/service-bookings", response_model=List[ServiceBookingResponse])
-async def get_service_bookings(current_user: dict = Depends(get_current_user)):
-    """Get all service bookings"""
-    bookings = await db.service_bookings.find({"user_id": current_user['user_id']}).to_list(100)
-    return [ServiceBookingResponse(**serialize_doc(b)) for b in bookings]
+async def get_service_bookings(
+    request: Request,
+    vehicle_id: Optional[str] = None,
+    status: Optional[str] = None,
+    fields: Optional[str] = FieldsParam,
+    page: PageParams = Depends(),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get service bookings, one page at a time"""
+    selected = select_fields(fields, ServiceBookingResponse, HEAVY_FIELDS["service_bookings"])
+    validate_page(page, ["booking_date"])
+    embeds = ["dealers"] if "dealer_name" in selected else []
+    etag = await versioning.list_etag(db, request, "service_bookings", current_user['user_id'], embeds)
+    if cached := versioning.not_modified(request, etag):
+        return cached
+
+    response_model = slim_model(ServiceBookingResponse, selected)
+    query = with_filters({"user_id": current_user['user_id']}, vehicle_id=vehicle_id, status=status)
+    bookings, next_cursor = await paginate(
+        db.service_bookings, query, page, allowed_sorts=["booking_date"],
+        projection=projection_for(selected, depends_on=["dealer_id"])
+    )
+    if "dealer_name" in selected:
+        await attach_names(db, bookings, "dealer_id", "dealers", "dealer_name")
+    return versioning.with_etag(
+        list_response([trusted(response_model, serialize_doc(b)) for b in bookings], next_cursor), etag
+    )
 
 
 @api_router.post("/service-bookings", response_model=ServiceBookingResponse)
@@ -526,103 +777,93 @@ async def create_service_booking(booking_data: ServiceBookingCreate, current_use
     booking_dict = booking_data.dict()
     booking_dict['user_id'] = current_user['user_id']
     booking_dict['created_at'] = datetime.utcnow()
+    booking_dict['updated_at'] = booking_dict['created_at']
+    booking_dict['version'] = 1
     booking_dict['status'] = "Pending"
+    await blob_store.externalize_fields(db, "service_bookings", booking_dict)
     
     result = await db.service_bookings.insert_one(booking_dict)
     booking_dict['id'] = str(result.inserted_id)
+    await versioning.bump(db, "service_bookings", current_user['user_id'])
     
-    return ServiceBookingResponse(**booking_dict)
+    return ServiceBookingResponse(**resolve_blob_refs(booking_dict))
 
 
 # ===== PROVIDERS ENDPOINTS =====
 
 @api_router.get("/providers", response_model=List[ProviderResponse])
-async def get_providers(provider_type: Optional[str] = None):
-    """Get providers"""
-    query = {}
-    if provider_type:
-        query['provider_type'] = provider_type
-    
-    providers = await db.providers.find(query).to_list(100)
-    return [ProviderResponse(**serialize_doc(p)) for p in providers]
+async def get_providers(
+    request: Request,
+    provider_type: Optional[str] = None,
+    fields: Optional[str] = FieldsParam,
+    page: PageParams = Depends()
+):
+    """Get providers, one page at a time"""
+    async def build():
+        selected = select_fields(fields, ProviderResponse)
+        response_model = slim_model(ProviderResponse, selected)
+        query = {}
+        if provider_type:
+            query['provider_type'] = provider_type
+
+        providers, next_cursor = await paginate(
+            db.providers, query, page, allowed_sorts=["name"], projection=projection_for(selected)
+        )
+        return list_response([trusted(response_model, serialize_doc(p)) for p in providers], next_cursor)
+
+    return await response_cache.get_or_build("providers", request_key(request), build)
 
 
 # ===== MARKETPLACE ENDPOINTS =====
 
-@api_router.get("/marketplace-listings")
-async def get_marketplace_listings():
-    """Get all marketplace listings"""
+def listing_response(listing: dict, image_variant: Optional[str] = None) -> MarketplaceListingResponse:
+    listing = serialize_doc(listing)
+    listing['images'] = [variant_url(i, image_variant) if image_variant else blob_url(i) for i in listing.get('images', [])]
+    return trusted(MarketplaceListingResponse, listing)
+
+
+def listing_rows(listings: List[dict]) -> List[MarketplaceListingResponse]:
+    """Search result rows; a malformed listing is logged and left out rather than failing the page"""
+    rows = []
+    for listing in listings:
+        listing_id = listing.get('_id')
+        try:
+            rows.append(listing_response(listing, image_variant="thumbnail"))
+        except ValidationError as e:
+            logger.error(f"Skipping invalid marketplace listing {listing_id}: {e.error_count()} validation errors")
+    return rows
+
+
+@api_router.get("/marketplace-listings", response_model=List[MarketplaceListingResponse])
+async def get_marketplace_listings(filters: ListingFilters = Depends(), page: PageParams = Depends()):
+    """Search marketplace listings, one page at a time"""
     try:
-        # Get vehicles that are listed for sale
-        vehicles = await db.vehicles.find().to_list(100)
-        listings = []
-        
-        for v in vehicles:
-            listing = {
-                "id": str(v['_id']),
-                "user_id": v.get('user_id', ''),
-                "vehicle_id": str(v['_id']),
-                "dealer_id": v.get('dealer_id'),
-                "title": f"{v['make']} {v['model']} {v['year']}",
-                "make": v['make'],
-                "model": v['model'],
-                "year": v['year'],
-                "price": v.get('purchase_price', 25000),  # Default price
-                "odometer": v.get('odometer'),
-                "condition": "Used",
-                "description": f"{v['year']} {v['make']} {v['model']} in excellent condition",
-                "images": [v['image']] if v.get('image') else [],
-                "contact_name": "Dealer Sales",
-                "contact_phone": "1800 123 456",
-                "contact_email": "sales@dealer.com",
-                "listed_date": v.get('created_at', datetime.utcnow()),
-                "status": "Active"
-            }
-            listings.append(listing)
-        
-        return listings
+        listings, next_cursor = await paginate(db.marketplace_listings, filters.query(), page, allowed_sorts=LISTING_SORTS)
+        return list_response(listing_rows(listings), next_cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching marketplace listings: {str(e)}")
-        return []
+        raise HTTPException(status_code=500, detail="Failed to fetch listings")
+
+
+@api_router.get("/marketplace-listings/facets")
+async def get_marketplace_facets(filters: ListingFilters = Depends()):
+    """Get listing counts per make, model, year band and price band for the active filters"""
+    return await facet_cache.get(db, filters)
 
 
-@api_router.get("/marketplace-listings/{listing_id}")
+@api_router.get("/marketplace-listings/{listing_id}", response_model=MarketplaceListingResponse)
 async def get_marketplace_listing(listing_id: str):
     """Get specific marketplace listing"""
     try:
-        vehicle = await db.vehicles.find_one({"_id": ObjectId(listing_id)})
-        if not vehicle:
+        listing = await db.marketplace_listings.find_one({"_id": ObjectId(listing_id)})
+        if not listing:
             raise HTTPException(status_code=404, detail="Listing not found")
         
-        listing = {
-            "id": str(vehicle['_id']),
-            "user_id": vehicle.get('user_id', ''),
-            "vehicle_id": str(vehicle['_id']),
-            "dealer_id": vehicle.get('dealer_id'),
-            "title": f"{vehicle['make']} {vehicle['model']} {vehicle['year']}",
-            "make": vehicle['make'],
-            "model": vehicle['model'],
-            "year": vehicle['year'],
-            "price": vehicle.get('purchase_price', 25000),
-            "odometer": vehicle.get('odometer'),
-            "condition": "Used",
-            "description": f"{vehicle['year']} {vehicle['make']} {vehicle['model']} in excellent condition. Well maintained with full service history.",
-            "images": [vehicle['image']] if vehicle.get('image') else [],
-            "contact_name": "Dealer Sales",
-            "contact_phone": "1800 123 456",
-            "contact_email": "sales@dealer.com",
-            "listed_date": vehicle.get('created_at', datetime.utcnow()),
-            "status": "Active",
-            "features": [
-                "Air Conditioning",
-                "Power Windows",
-                "Bluetooth",
-                "Backup Camera",
-                "Cruise Control"
-            ]
-        }
-        
-        return listing
+        return listing_response(listing)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching marketplace listing: {str(e)}")
         raise HTTPException(status_code=404, detail="Listing not found")
@@ -646,7 +887,7 @@ async def create_marketplace_listing(listing_data: dict, current_user: dict = De
             "user_id": current_user['user_id'],
             "vehicle_id": listing_data['vehicle_id'],
             "title": listing_data.get('title', f"{vehicle['make']} {vehicle['model']} {vehicle['year']}"),
-            "price": listing_data['price'],
+            "price": float(listing_data['price']),
             "condition": listing_data['condition'],
             "description": listing_data['description'],
             "contact_name": listing_data['contact_name'],
@@ -654,11 +895,13 @@ async def create_marketplace_listing(listing_data: dict, current_user: dict = De
             "contact_email": listing_data.get('contact_email'),
             "status": "Active",
             "listed_date": datetime.utcnow(),
-            "created_at": datetime.utcnow()
+            "created_at": datetime.utcnow(),
+            **listing_from_vehicle(vehicle)
         }
         
         result = await db.marketplace_listings.insert_one(listing)
         listing['id'] = str(result.inserted_id)
+        facet_cache.invalidate()
         
         return {"message": "Listing created successfully", "listing_id": str(result.inserted_id)}
     except HTTPException:
@@ -683,10 +926,9 @@ async def update_user_profile(profile_data: ProfileUpdate, current_user: dict =
         update_dict['last_name'] = profile_data.last_name
     if profile_data.email is not None:
         # Check if email already exists
-        existing = await db.users.find_one({"email": profile_data.email, "_id": {"$ne": ObjectId(user_id)}})
-        if existing:
+        if await user_repository.email_taken(db, profile_data.email, exclude_user_id=user_id):
             raise HTTPException(status_code=400, detail="Email already in use")
-        update_dict['email'] = profile_data.email
+        update_dict['email'] = user_repository.normalize_email(profile_data.email)
     if profile_data.mobile is not None:
         update_dict['mobile'] = profile_data.mobile
     
@@ -695,6 +937,7 @@ async def update_user_profile(profile_data: ProfileUpdate, current_user: dict =
             {"_id": ObjectId(user_id)},
             {"$set": update_dict}
         )
+        user_repository.invalidate(user_id)
     
     return {"message": "Profile updated successfully"}
 
@@ -705,32 +948,35 @@ async def change_password(password_data: PasswordChange, current_user: dict = De
     """Change user password"""
     user_id = current_user['user_id']
     
-    # Get user from database
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
-    if not user:
+    # Always read the stored hash directly rather than from the user cache
+    password_hash = await user_repository.get_password_hash(db, user_id)
+    if not password_hash:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Verify current password
-    if not verify_password(password_data.current_password, user['password']):
+    if not await credential_service.verify_password(password_data.current_password, password_hash):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Update password
-    new_hashed_password = hash_password(password_data.new_password)
+    new_hashed_password = await credential_service.hash_password(password_data.new_password)
     await db.users.update_one(
         {"_id": ObjectId(user_id)},
         {"$set": {"password": new_hashed_password}}
     )
+    user_repository.invalidate(user_id)
+    # Sign out every other device; this one keeps its session
+    await token_service.revoke_user_sessions(db, user_id, current_user.get('sid'))
     
     return {"message": "Password updated successfully"}
 
 
 # Notifications
 @api_router.get("/user/notification-preferences")
-async def get_notification_preferences(current_user: dict = Depends(get_current_user)):
+async def get_notification_preferences(request: Request, current_user: dict = Depends(get_current_user)):
     """Get user notification preferences"""
     user_id = current_user['user_id']
     
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await load_user(request, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -758,6 +1004,7 @@ async def update_notification_preferences(prefs: NotificationPreferences, curren
         {"_id": ObjectId(user_id)},
         {"$set": {"notification_preferences": preferences_dict}}
     )
+    user_repository.invalidate(user_id)
     
     return {
         "message": "Notification preferences updated successfully",
@@ -782,6 +1029,7 @@ async def upgrade_subscription(upgrade: SubscriptionUpgrade, current_user: dict
             "subscription_status": "active"
         }}
     )
+    user_repository.invalidate(user_id)
     
     return {
         "message": f"Successfully upgraded to {upgrade.subscription_tier}",
@@ -803,6 +1051,7 @@ async def request_cancellation(request: CancellationRequest, current_user: dict
             "cancellation_date": datetime.utcnow()
         }}
     )
+    user_repository.invalidate(user_id)
     
     return {
         "message": "Your account has been suspended. Your data will be retained for a grace period before permanent deletion."
@@ -813,7 +1062,7 @@ async def request_cancellation(request: CancellationRequest, current_user: dict
 @api_router.get("/users/lookup/{member_number}")
 async def lookup_member(member_number: str, current_user: dict = Depends(get_current_user)):
     """Lookup a member by member number"""
-    user = await db.users.find_one({"member_id": member_number})
+    user = await user_repository.find_by_member_id(db, member_number)
     if not user:
         raise HTTPException(status_code=404, detail="Member not found")
     
@@ -834,8 +1083,10 @@ async def initiate_transfer(transfer: TransferInitiate, current_user: dict = Dep
     """Initiate a vehicle transfer"""
     user_id = current_user['user_id']
     
-    # Verify user has premium subscription
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    # Verify user has premium subscription; read fresh, since an upgrade on another worker is not in this worker's cache
+    user = await user_repository.get_subscription(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     subscription_tier = user.get('subscription_tier', 'basic')
     if subscription_tier not in ['premium_monthly', 'premium_annual']:
         raise HTTPException(status_code=403, detail="Premium subscription required")
@@ -859,6 +1110,7 @@ async def initiate_transfer(transfer: TransferInitiate, current_user: dict = Dep
         "status": "pending",
         "created_at": datetime.utcnow()
     }
+    transfer_record['updated_at'] = transfer_record['created_at']
     
     result = await db.transfers.insert_one(transfer_record)
     
@@ -868,19 +1120,21 @@ async def initiate_transfer(transfer: TransferInitiate, current_user: dict = Dep
 
 
 @api_router.get("/transfers/pending")
-async def get_pending_transfers(current_user: dict = Depends(get_current_user)):
+async def get_pending_transfers(response: Response, page: PageParams = Depends(), current_user: dict = Depends(get_current_user)):
     """Get user's pending transfers"""
     user_id = current_user['user_id']
     
-    transfers = await db.transfers.find({
+    transfers, next_cursor = await paginate(db.transfers, {
         "from_user_id": user_id,
         "status": "pending"
-    }).to_list(100)
+    }, page, allowed_sorts=["created_at"])
     
-    # Enrich with vehicle data
+    # Enrich with vehicle data in one batched lookup
+    await attach(db, transfers, "vehicle_id", "vehicles", "vehicle",
+                 projection={"year": 1, "make": 1, "model": 1, "rego": 1})
     result_transfers = []
     for transfer in transfers:
-        vehicle = await db.vehicles.find_one({"_id": ObjectId(transfer['vehicle_id'])})
+        vehicle = transfer['vehicle']
         if vehicle:
             result_transfers.append({
                 "id": str(transfer['_id']),
@@ -896,19 +1150,22 @@ async def get_pending_transfers(current_user: dict = Depends(get_current_user)):
                 "created_at": transfer['created_at'].isoformat()
             })
     
-    return {"data": {"transfers": result_transfers}}
+    # The envelope keeps next_cursor for existing clients; the header is what every paged endpoint sends
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return {"data": {"transfers": result_transfers, "next_cursor": next_cursor}}
 
 
 @api_router.get("/transfers/quarantined")
-async def get_quarantined_vehicles(current_user: dict = Depends(get_current_user)):
+async def get_quarantined_vehicles(response: Response, page: PageParams = Depends(), current_user: dict = Depends(get_current_user)):
     """Get user's quarantined vehicles"""
     user_id = current_user['user_id']
     
     # Get vehicles that are marked for deletion (transferred but in grace period)
-    vehicles = await db.vehicles.find({
+    vehicles, next_cursor = await paginate(db.vehicles, {
         "user_id": user_id,
         "status": "quarantined"
-    }).to_list(100)
+    }, page)
     
     result_vehicles = []
     for vehicle in vehicles:
@@ -921,7 +1178,9 @@ async def get_quarantined_vehicles(current_user: dict = Depends(get_current_user
             "quarantine_end_date": vehicle.get('quarantine_end_date', datetime.utcnow()).isoformat()
         })
     
-    return {"data": {"vehicles": result_vehicles}}
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return {"data": {"vehicles": result_vehicles, "next_cursor": next_cursor}}
 
 
 @api_router.post("/transfers/{transfer_id}/reject")
@@ -942,24 +1201,168 @@ async def cancel_transfer(transfer_id: str, current_user: dict = Depends(get_cur
     # Update transfer status
     await db.transfers.update_one(
         {"_id": ObjectId(transfer_id)},
-        {"$set": {"status": "cancelled"}}
+        {"$set": {"status": "cancelled", "updated_at": datetime.utcnow()}}
     )
     
     return {"message": "Transfer cancelled successfully"}
 
 
-# Include router
-app.include_router(api_router)
+# ===== BLOBS =====
+
+PUBLIC_BLOB_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def blob_cache_control(meta: dict, expires: Optional[int], signature: Optional[str]) -> str:
+    """Cache-Control for a readable blob; private blobs need a valid signed URL"""
+    if meta.get('public'):
+        return PUBLIC_BLOB_CACHE_CONTROL
+    if not verify_blob_signature(meta['_id'], expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired blob URL")
+    # Shared caches must not keep personal documents, and the browser copy must not outlive the URL
+    return f"private, max-age={max(0, expires - int(time.time()))}"
+
+
+async def blob_response(meta: dict, request: Request, cache_control: str):
+    """Stream a blob with ETag and Range handling"""
+    blob_hash = meta['_id']
+    etag = f'"{blob_hash}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes"
+    }
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    
+    size = meta['size']
+    start, end, status_code = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        byte_range = parse_range(range_header, size)
+        if byte_range is None:
+            raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        status_code = 206
+        headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+    headers['Content-Length'] = str(end - start + 1)
+    
+    return StreamingResponse(
+        blob_store.stream(db, blob_hash, start, end),
+        status_code=status_code,
+        media_type=meta['content_type'],
+        headers=headers
+    )
+
+
+@api_router.get("/blobs/{blob_hash}")
+async def get_blob(blob_hash: str, request: Request, expires: Optional[int] = None, signature: Optional[str] = None):
+    """Stream a stored image or document by content hash; documents need the signed URL from their record"""
+    meta = await blob_store.get_meta(db, blob_hash)
+    if not meta:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return await blob_response(meta, request, blob_cache_control(meta, expires, signature))
+
+
+@api_router.get("/blobs/{blob_hash}/{variant}")
+async def get_blob_variant(blob_hash: str, variant: str, request: Request, expires: Optional[int] = None, signature: Optional[str] = None):
+    """Stream a resized variant of a stored image, generating it on first request"""
+    if variant not in VARIANTS:
+        raise HTTPException(status_code=404, detail="Unknown image variant")
+    meta = await blob_store.get_meta(db, blob_hash)
+    if not meta:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    # Access follows the original: a variant of a private document is as private as the document
+    cache_control = blob_cache_control(meta, expires, signature)
+    
+    variant_hash = await variant_service.get_variant(db, blob_hash, variant)
+    # Non-image blobs have no variants; serve the original
+    variant_meta = await blob_store.get_meta(db, variant_hash) if variant_hash else None
+    return await blob_response(variant_meta or meta, request, cache_control)
+
+
+# ===== BATCH =====
+
+@api_router.post("/batch", response_model=BatchResponse)
+async def batch(batch_request: BatchRequest, request: Request, current_user: dict = Depends(get_current_user)):
+    """Run several GET requests in one round trip"""
+    state = {
+        "auth_payload": current_user,
+        "user_doc": await user_cache.get(db, current_user['user_id']),
+    }
+    body = await run_batch(request.app, request.scope, state, batch_request.requests)
+    return Response(content=body, media_type="application/json")
+
+
+# ===== METRICS =====
+
+@api_router.get("/metrics", dependencies=[Depends(require_admin)])
+async def get_metrics():
+    """Get internal service metrics"""
+    return collect_metrics()
+
+
+# ===== ADMIN ENDPOINTS =====
+
+@api_router.delete("/admin/cache", dependencies=[Depends(require_admin)])
+async def invalidate_response_cache(namespace: Optional[str] = None, key: Optional[str] = None):
+    """Drop cached public responses on every worker after dealers, providers or promotions change, and expire ETags that embed their names"""
+    if namespace and not response_cache.has_namespace(namespace):
+        raise HTTPException(status_code=404, detail="Unknown cache namespace")
+    # Policies and bookings embed provider/dealer names, so their ETags must change too
+    for shared in ("dealers", "providers"):
+        if namespace in (None, shared):
+            await versioning.bump_shared(db, shared)
+    removed = await response_cache.broadcast_invalidation(db, namespace, key)
+    return {
+        "removed": removed,  # entries dropped on the worker that served this request
+        "other_workers_within_seconds": RESPONSE_CACHE_SYNC_SECONDS
+    }
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup and shutdown; nothing that holds sockets or threads is created before this runs"""
+    global client, db
+    credential_service.start()
+    start_image_pool()
+    client = create_client()
+    db = get_database(client)
+    await warm_up(db)
+    await ensure_indexes(db)
+    if VERIFY_INDEX_USAGE:
+        await verify_index_usage(db)
+    rego_job_pool.start(db)
+    await revocation_refresher.start(db)
+    await response_cache_sync.start(db)
+    try:
+        yield
+    finally:
+        await response_cache_sync.stop()
+        await revocation_refresher.stop()
+        await rego_job_pool.stop()
+        credential_service.shutdown()
+        shutdown_image_pool()
+        client.close()
+
+
+def create_app() -> FastAPI:
+    """Build the ASGI app; each worker process calls this once when it imports the module"""
+    app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
+    app.include_router(api_router)
+
+    app.add_middleware(ConditionalGetMiddleware)
+    app.add_middleware(CompressionMiddleware)
+
+    # CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, CACHE_STATUS_HEADER, "ETag", "Retry-After"],
+    )
+    return app
 
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+app = create_app()
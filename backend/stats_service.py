@@ -0,0 +1,127 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+DASHBOARD_STATS_MODE = os.getenv("DASHBOARD_STATS_MODE", "materialized")  # materialized or concurrent
+DASHBOARD_STATS_MAX_AGE_SECONDS = int(os.getenv("DASHBOARD_STATS_MAX_AGE_SECONDS", 3600))
+# Recounts retried when write hooks keep landing while counting
+DASHBOARD_STATS_REFRESH_ATTEMPTS = 3
+
+# Product collection -> counter field in the user_stats document
+PRODUCT_COUNTERS = {
+    "insurance_policies": "active_insurance_policies",
+    "finance_products": "active_finance_products",
+    "roadside_assistance": "active_roadside_memberships",
+}
+
+STAT_FIELDS = ["total_vehicles", *PRODUCT_COUNTERS.values()]
+
+# Stored instead of null so $min keeps working when nothing is active
+NO_EXPIRY = datetime(9999, 12, 31)
+
+
+async def count_stats(db, user_id: str, now: datetime) -> dict:
+    """Run all dashboard counts concurrently against a single point in time"""
+    results = await asyncio.gather(
+        db.vehicles.count_documents({"user_id": user_id}),
+        *[
+            db[collection].count_documents({"user_id": user_id, "end_date": {"$gt": now}})
+            for collection in PRODUCT_COUNTERS
+        ]
+    )
+    return dict(zip(STAT_FIELDS, results))
+
+
+async def _next_expiry(db, user_id: str, now: datetime) -> datetime:
+    """Earliest end_date among the user's currently active products"""
+    docs = await asyncio.gather(*[
+        db[collection].find_one(
+            {"user_id": user_id, "end_date": {"$gt": now}},
+            {"end_date": 1},
+            sort=[("end_date", 1)]
+        )
+        for collection in PRODUCT_COUNTERS
+    ])
+    return min([d['end_date'] for d in docs if d] or [NO_EXPIRY])
+
+
+async def refresh_stats(db, user_id: str, now: datetime) -> dict:
+    """Recompute and store the user's materialized stats document"""
+    for _ in range(DASHBOARD_STATS_REFRESH_ATTEMPTS):
+        # Every write hook bumps `writes`; the recount is only stored if none ran while counting.
+        # The upsert makes sure a hook arriving mid-count has a document to bump.
+        before = await db.user_stats.find_one_and_update(
+            {"_id": user_id},
+            {"$setOnInsert": {"writes": 0}},
+            projection={"writes": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        writes = before.get('writes')
+        stats, next_expiry = await asyncio.gather(
+            count_stats(db, user_id, now),
+            _next_expiry(db, user_id, now)
+        )
+        doc = {**stats, "next_expiry": next_expiry, "refreshed_at": now, "writes": writes or 0}
+        # Documents from before the counter existed have no `writes` field, which {"writes": None} matches
+        result = await db.user_stats.replace_one({"_id": user_id, "writes": writes}, doc)
+        if result.matched_count:
+            return doc
+        now = datetime.utcnow()
+    # Still racing with writers: serve the fresh counts and let a later read store them
+    return doc
+
+
+async def get_stats(db, user_id: str) -> dict:
+    """Get dashboard counters for a user"""
+    now = datetime.utcnow()
+    if DASHBOARD_STATS_MODE == "concurrent":
+        return await count_stats(db, user_id, now)
+
+    doc = await db.user_stats.find_one({"_id": user_id})
+    # Expiries are applied lazily: once the earliest stored end_date has
+    # passed, or the document is old enough to distrust, recount everything.
+    if (
+        doc is None
+        or 'refreshed_at' not in doc
+        or doc['next_expiry'] <= now
+        or doc['refreshed_at'] <= now - timedelta(seconds=DASHBOARD_STATS_MAX_AGE_SECONDS)
+    ):
+        doc = await refresh_stats(db, user_id, now)
+
+    return {field: doc[field] for field in STAT_FIELDS}
+
+
+# Write-path hooks. They run after the write, so a recount may already have
+# counted the new row; adjusting the stored counters could count it twice.
+# Instead they mark the stored stats stale (and bump `writes`, so a recount
+# that started before the write is not stored) and the next read recounts.
+
+async def _mark_stale(db, user_id: str):
+    await db.user_stats.update_one({"_id": user_id}, {"$inc": {"writes": 1}, "$unset": {"refreshed_at": ""}})
+
+
+async def vehicle_added(db, user_id: str):
+    await _mark_stale(db, user_id)
+
+
+async def vehicle_removed(db, user_id: str):
+    await _mark_stale(db, user_id)
+
+
+async def product_added(db, collection: str, user_id: str, end_date: datetime):
+    # Products that already expired are not counted, so the stats are unchanged
+    if end_date > datetime.utcnow():
+        await _mark_stale(db, user_id)
+
+
+async def product_removed(db, collection: str, user_id: str, end_date: datetime):
+    if end_date > datetime.utcnow():
+        await _mark_stale(db, user_id)
+
+
+async def invalidate(db, user_id: str):
+    """Make the next read recompute the stats"""
+    await _mark_stale(db, user_id)
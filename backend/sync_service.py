@@ -0,0 +1,165 @@
+import base64
+import binascii
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from bson import json_util
+from fastapi import HTTPException
+
+from versioning import EXPIRING_COLLECTIONS
+
+SYNC_OVERLAP_SECONDS = int(os.getenv("SYNC_OVERLAP_SECONDS", 5))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", 30))
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", 500))  # documents per response, across all collections
+
+# Synced collection -> field holding the owning user's id
+SYNC_COLLECTIONS = {
+    "vehicles": "user_id",
+    "insurance_policies": "user_id",
+    "finance_products": "user_id",
+    "roadside_assistance": "user_id",
+    "service_bookings": "user_id",
+    "transfers": "from_user_id",
+}
+
+
+def _encode(payload: dict) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode('utf-8')).decode('ascii').rstrip("=")
+
+
+def _decode(token: str) -> dict:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded).decode('utf-8'))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    return payload
+
+
+def _naive(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    return value.replace(tzinfo=None)
+
+
+def encode_sync_token(synced_at: datetime) -> str:
+    return _encode({"t": synced_at})
+
+
+def decode_sync_token(token: str) -> datetime:
+    payload = _decode(token)
+    if "t" not in payload:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    return _naive(payload["t"])
+
+
+class SyncPosition:
+    """Where a paged sync run stands: the change window, when the run started and the last id sent"""
+
+    def __init__(self, window_start: Optional[datetime], started_at: datetime,
+                 collection: str = None, after_id=None):
+        self.window_start = window_start
+        self.started_at = started_at
+        self.collection = collection or next(iter(SYNC_COLLECTIONS))
+        self.after_id = after_id
+
+    def encode(self) -> str:
+        return _encode({"w": self.window_start, "s": self.started_at, "c": self.collection, "a": self.after_id})
+
+    @classmethod
+    def decode(cls, payload: dict) -> "SyncPosition":
+        if payload.get("c") not in SYNC_COLLECTIONS:
+            raise HTTPException(status_code=400, detail="Invalid sync token")
+        return cls(_naive(payload.get("w")), _naive(payload["s"]), payload["c"], payload.get("a"))
+
+
+async def record_deletion(db, collection: str, user_id: str, doc_id):
+    """Leave a tombstone so clients that already hold the document learn it is gone"""
+    await db.tombstones.insert_one({
+        "collection": collection,
+        "doc_id": str(doc_id),
+        "user_id": user_id,
+        "deleted_at": datetime.utcnow()
+    })
+
+
+async def _changed(db, collection: str, user_id: str, since: Optional[datetime], started_at: datetime,
+                   after_id, limit: int) -> List[dict]:
+    # Keyset on _id within the run, so every page costs the same however large the account is
+    query = {SYNC_COLLECTIONS[collection]: user_id}
+    if since is not None:
+        query["updated_at"] = {"$gte": since}
+        if collection in EXPIRING_COLLECTIONS:
+            # A product that expired in the window changed status without being written
+            query["$or"] = [
+                {"updated_at": query.pop("updated_at")},
+                {"end_date": {"$gt": since, "$lte": started_at}}
+            ]
+    if after_id is not None:
+        query["_id"] = {"$gt": after_id}
+    return await db[collection].find(query).sort("_id", 1).limit(limit).to_list(limit)
+
+
+async def _deleted(db, user_id: str, since: datetime) -> Dict[str, List[str]]:
+    deleted = {collection: [] for collection in SYNC_COLLECTIONS}
+    async for tombstone in db.tombstones.find(
+        {"user_id": user_id, "deleted_at": {"$gte": since}},
+        {"collection": 1, "doc_id": 1}
+    ):
+        deleted.setdefault(tombstone['collection'], []).append(tombstone['doc_id'])
+    return deleted
+
+
+def _start(token: Optional[str]) -> Tuple[SyncPosition, bool]:
+    now = datetime.utcnow()
+    if token is None:
+        return SyncPosition(None, now), True
+    payload = _decode(token)
+    if "s" in payload:
+        position = SyncPosition.decode(payload)
+        return position, False
+    since = decode_sync_token(token)
+    # Tombstones older than the retention window are gone, so an old token needs a full resync
+    if since < now - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS):
+        return SyncPosition(None, now), True
+    # Re-read a short window before the token to cover writes that were in flight when it was issued
+    return SyncPosition(since - timedelta(seconds=SYNC_OVERLAP_SECONDS), now), True
+
+
+async def collect_changes(
+    db, user_id: str, token: Optional[str], limit: Optional[int] = None
+) -> Tuple[dict, Dict[str, List[str]], bool, str, bool]:
+    """One page of documents changed and ids deleted since the token.
+
+    Returns (changes, deleted, full_sync, next_token, has_more). While has_more is set, next_token
+    continues the same run; the last page's token is the baseline for the next sync.
+    """
+    limit = limit or SYNC_PAGE_SIZE
+    position, first_page = _start(token)
+    full_sync = position.window_start is None
+
+    deleted = {}
+    if first_page and not full_sync:
+        deleted = await _deleted(db, user_id, position.window_start)
+
+    changes = {collection: [] for collection in SYNC_COLLECTIONS}
+    collections = list(SYNC_COLLECTIONS)
+    remaining = limit
+    for collection in collections[collections.index(position.collection):]:
+        after_id = position.after_id if collection == position.collection else None
+        docs = await _changed(db, collection, user_id, position.window_start, position.started_at, after_id, remaining + 1)
+        if len(docs) > remaining:
+            # The page is full; stop right after the last document sent
+            changes[collection] = docs[:remaining]
+            last_id = docs[remaining - 1]['_id'] if remaining else after_id
+            next_position = SyncPosition(position.window_start, position.started_at, collection, last_id)
+            return changes, deleted, full_sync, next_position.encode(), True
+        changes[collection] = docs
+        remaining -= len(docs)
+
+    return changes, deleted, full_sync, encode_sync_token(position.started_at), False
@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from auth_utils import create_access_token, revoked_sessions, JWT_EXPIRATION_MINUTES
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", 30))
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", 10))
+# A client that lost the refresh response (or raced two refreshes) may present the old token once within this window
+REFRESH_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_REUSE_GRACE_SECONDS", 30))
+
+
+def _digest(refresh_token: str) -> str:
+    # Only the hash is stored, so a database leak does not hand out live refresh tokens
+    return hashlib.sha256(refresh_token.encode('utf-8')).hexdigest()
+
+
+async def issue_tokens(db, user_id: str, email: str, family: Optional[str] = None) -> Tuple[str, str]:
+    """Create an access token and a refresh token for a session; family is the session id shared by rotations"""
+    family = family or secrets.token_hex(16)
+    refresh_token = secrets.token_urlsafe(48)
+    now = datetime.utcnow()
+    await db.refresh_tokens.insert_one({
+        "_id": _digest(refresh_token),
+        "user_id": user_id,
+        "email": email,
+        "family": family,
+        "created_at": now,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_DAYS),
+        "used_at": None,
+        "revoked": False
+    })
+    access_token = create_access_token({"user_id": user_id, "email": email, "sid": family, "jti": secrets.token_hex(8)})
+    return access_token, refresh_token
+
+
+async def rotate(db, refresh_token: str) -> Tuple[str, str, str]:
+    """Exchange a refresh token for a new token pair; returns (access_token, refresh_token, user_id)"""
+    now = datetime.utcnow()
+    key = _digest(refresh_token)
+    record = await db.refresh_tokens.find_one_and_update(
+        {"_id": key, "used_at": None, "revoked": False, "expires_at": {"$gt": now}},
+        {"$set": {"used_at": now}},
+        return_document=ReturnDocument.AFTER
+    )
+    if record is None:
+        # Retry of a rotation that just happened: hand out one more pair in the same session
+        record = await db.refresh_tokens.find_one_and_update(
+            {
+                "_id": key,
+                "used_at": {"$gte": now - timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS)},
+                "grace_used": {"$ne": True},
+                "revoked": False,
+                "expires_at": {"$gt": now}
+            },
+            {"$set": {"grace_used": True}},
+            return_document=ReturnDocument.AFTER
+        )
+    if record is None:
+        stale = await db.refresh_tokens.find_one({"_id": key}, {"user_id": 1, "family": 1, "used_at": 1, "revoked": 1})
+        if (
+            stale and not stale.get('revoked') and stale.get('used_at') is not None
+            and stale['used_at'] < now - timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS)
+        ):
+            # A long-rotated token came back: assume it was stolen and end the whole session
+            logger.error(f"Refresh token reuse detected for user {stale['user_id']}, revoking session")
+            await revoke_session(db, stale['user_id'], stale['family'])
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+    access_token, new_refresh_token = await issue_tokens(db, record['user_id'], record['email'], record['family'])
+    return access_token, new_refresh_token, record['user_id']
+
+
+def _epoch(value: datetime) -> float:
+    # Stored datetimes are naive UTC
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _access_token_horizon() -> datetime:
+    # Revocation only needs to outlive the longest access token still in circulation
+    return datetime.utcnow() + timedelta(minutes=JWT_EXPIRATION_MINUTES)
+
+
+async def revoke_session(db, user_id: str, family: str):
+    """Revoke one session: its refresh tokens stop working and its access tokens are rejected"""
+    expires_at = _access_token_horizon()
+    await db.refresh_tokens.update_many({"user_id": user_id, "family": family}, {"$set": {"revoked": True}})
+    await db.revoked_sessions.update_one(
+        {"_id": family},
+        {"$set": {"user_id": user_id, "expires_at": expires_at}},
+        upsert=True
+    )
+    revoked_sessions.add(family, _epoch(expires_at))
+
+
+async def revoke_user_sessions(db, user_id: str, except_family: Optional[str] = None):
+    """Revoke every live session of a user, optionally keeping the caller's own"""
+    query = {"user_id": user_id, "revoked": False, "expires_at": {"$gt": datetime.utcnow()}}
+    if except_family:
+        query["family"] = {"$ne": except_family}
+    for family in await db.refresh_tokens.distinct("family", query):
+        await revoke_session(db, user_id, family)
+
+
+async def load_revocations(db):
+    """Replace the in-memory revocation set with the sessions revoked on any worker"""
+    now = datetime.utcnow()
+    docs = await db.revoked_sessions.find({"expires_at": {"$gt": now}}, {"expires_at": 1}).to_list(None)
+    revoked_sessions.replace({doc['_id']: _epoch(doc['expires_at']) for doc in docs})
+
+
+class RevocationRefresher:
+    """Background task that periodically reloads revoked sessions so request auth never touches Mongo"""
+
+    def __init__(self, interval: float = REVOCATION_REFRESH_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, db):
+        await load_revocations(db)
+        self._task = asyncio.ensure_future(self._run(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, db):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await load_revocations(db)
+            except Exception as e:
+                logger.error(f"Failed to refresh revoked sessions: {e}")
+
+
+revocation_refresher = RevocationRefresher()
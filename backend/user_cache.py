@@ -0,0 +1,69 @@
+import os
+from typing import Callable, Optional
+
+from bson import ObjectId
+from cachetools import TTLCache
+
+from metrics import register
+
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", 30))  # 0 disables the cache
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+
+
+class UserCache:
+    """Short-lived cache of user records and built profiles by id; writers must call invalidate().
+
+    Invalidation only reaches the local worker, so entries can be stale for up to the TTL
+    after a write on another worker. Permission and subscription checks must not use it.
+    """
+
+    def __init__(self, ttl: int = USER_CACHE_TTL_SECONDS, size: int = USER_CACHE_SIZE):
+        self._cache = TTLCache(maxsize=size, ttl=ttl) if ttl > 0 else None
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db, user_id: str) -> Optional[dict]:
+        if self._cache is not None and user_id in self._cache:
+            self.hits += 1
+            return dict(self._cache[user_id])
+
+        self.misses += 1
+        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        if user is not None and self._cache is not None:
+            self._cache[user_id] = user
+        return dict(user) if user is not None else None
+
+    async def get_profile(self, db, user_id: str, projection: dict, build: Callable[[dict], object]):
+        """Response model built from a projected read, cached next to the full record"""
+        key = (user_id, "profile")
+        if self._cache is not None and key in self._cache:
+            self.hits += 1
+            return self._cache[key]
+
+        self.misses += 1
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, projection)
+        if user is None:
+            return None
+        profile = build(user)
+        if self._cache is not None:
+            self._cache[key] = profile
+        return profile
+
+    def invalidate(self, user_id: str):
+        if self._cache is not None:
+            self._cache.pop(user_id, None)
+            self._cache.pop((user_id, "profile"), None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self._cache is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "cached": len(self._cache) if self._cache is not None else 0,
+        }
+
+
+user_cache = UserCache()
+register("user_cache", user_cache.stats)
@@ -0,0 +1,76 @@
+from typing import Optional
+
+from bson import ObjectId
+
+from models import UserResponse
+from user_cache import user_cache
+
+# Only what each caller needs; notification preferences, subscription and cancellation fields stay on the server
+PROFILE_PROJECTION = {"email": 1, "full_name": 1, "phone": 1, "member_id": 1, "created_at": 1}
+LOGIN_PROJECTION = {**PROFILE_PROJECTION, "password": 1}
+PIN_LOGIN_PROJECTION = {**PROFILE_PROJECTION, "pin": 1}
+SUBSCRIPTION_PROJECTION = {"subscription_tier": 1, "subscription_status": 1}
+LOOKUP_PROJECTION = {"first_name": 1, "last_name": 1, "email": 1, "mobile": 1, "phone": 1, "member_id": 1}
+
+
+def normalize_email(email: str) -> str:
+    """Emails are stored lower-cased so every lookup is an exact match on the unique email index"""
+    return email.strip().lower()
+
+
+def to_response(user: dict) -> UserResponse:
+    """Build the public user model from a (projected) user document"""
+    return UserResponse(
+        id=str(user['_id']),
+        email=user['email'],
+        full_name=user['full_name'],
+        phone=user['phone'],
+        member_id=user['member_id'],
+        created_at=user['created_at']
+    )
+
+
+def _email_variants(email: str) -> list:
+    # Accounts created before the user_emails migration may still be stored with their original case
+    normalized = normalize_email(email)
+    raw = email.strip()
+    return [normalized] if raw == normalized else [normalized, raw]
+
+
+async def find_by_email(db, email: str, projection: Optional[dict] = None) -> Optional[dict]:
+    for variant in _email_variants(email):
+        user = await db.users.find_one({"email": variant}, projection)
+        if user is not None:
+            return user
+    return None
+
+
+async def find_by_member_id(db, member_id: str) -> Optional[dict]:
+    return await db.users.find_one({"member_id": member_id}, LOOKUP_PROJECTION)
+
+
+async def get_password_hash(db, user_id: str) -> Optional[str]:
+    """Stored password hash, always read from the database"""
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, {"password": 1})
+    return user['password'] if user else None
+
+
+async def get_subscription(db, user_id: str) -> Optional[dict]:
+    """Subscription fields, always read from the database since they gate features"""
+    return await db.users.find_one({"_id": ObjectId(user_id)}, SUBSCRIPTION_PROJECTION)
+
+
+async def email_taken(db, email: str, exclude_user_id: Optional[str] = None) -> bool:
+    query = {"email": {"$in": _email_variants(email)}}
+    if exclude_user_id:
+        query["_id"] = {"$ne": ObjectId(exclude_user_id)}
+    return await db.users.find_one(query, {"_id": 1}) is not None
+
+
+async def get_profile(db, user_id: str) -> Optional[UserResponse]:
+    return await user_cache.get_profile(db, user_id, PROFILE_PROJECTION, to_response)
+
+
+def invalidate(user_id: str):
+    """Drop every cached view of a user after it changes"""
+    user_cache.invalidate(user_id)
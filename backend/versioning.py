@@ -0,0 +1,199 @@
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Request, Response
+from pymongo import ReturnDocument
+
+from blob_store import PRIVATE_BLOB_COLLECTIONS, url_window
+from compression import COMPRESSION_ENABLED, is_compressible, with_vary
+from response_cache import as_response, body_etag, request_key
+from stats_service import NO_EXPIRY, PRODUCT_COUNTERS
+
+# Collections whose responses carry a status derived from end_date, so their
+# representation also changes when the earliest active end_date passes
+EXPIRING_COLLECTIONS = set(PRODUCT_COUNTERS)
+
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+# Validation is ETag-only. Last-Modified has one-second resolution and would have to cover
+# embedded shared data, expiries and blob URL signing windows, which the ETag already folds in;
+# a write in the same second as the previous one would be answered with a stale 304.
+
+# Owner id for shared reference data (dealers, providers) whose names are embedded in user responses
+SHARED_OWNER = "shared"
+
+# Headers a 304 must repeat from the 200 it stands in for
+_NOT_MODIFIED_HEADERS = {b"etag", b"cache-control", b"vary", b"expires", b"content-location"}
+
+
+def _version_id(collection: str, user_id: str) -> str:
+    return f"{collection}:{user_id}"
+
+
+async def _next_expiry(db, collection: str, user_id: str, now: datetime) -> datetime:
+    doc = await db[collection].find_one(
+        {"user_id": user_id, "end_date": {"$gt": now}},
+        {"end_date": 1},
+        sort=[("end_date", 1)]
+    )
+    return doc['end_date'] if doc else NO_EXPIRY
+
+
+async def bump(db, collection: str, user_id: str):
+    """Record that one of the user's documents in collection was created, changed or deleted"""
+    now = datetime.utcnow()
+    update = {"$inc": {"version": 1}, "$set": {"updated_at": now}}
+    if collection in EXPIRING_COLLECTIONS:
+        update["$set"]["next_expiry"] = await _next_expiry(db, collection, user_id, now)
+    await db.resource_versions.update_one({"_id": _version_id(collection, user_id)}, update, upsert=True)
+
+
+async def bump_shared(db, collection: str):
+    """Record that shared reference data changed, so responses embedding it get new ETags"""
+    await bump(db, collection, SHARED_OWNER)
+
+
+async def collection_version(db, collection: str, user_id: str) -> str:
+    """Version token covering every document the user has in collection"""
+    now = datetime.utcnow()
+    doc = await db.resource_versions.find_one({"_id": _version_id(collection, user_id)})
+    if collection not in EXPIRING_COLLECTIONS:
+        return str(doc['version']) if doc else "0"
+
+    if doc is None or doc.get('next_expiry', now) <= now:
+        doc = await db.resource_versions.find_one_and_update(
+            {"_id": _version_id(collection, user_id)},
+            {
+                "$set": {"next_expiry": await _next_expiry(db, collection, user_id, now)},
+                "$setOnInsert": {"version": 0, "updated_at": now}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    return f"{doc['version']}:{doc['next_expiry'].isoformat()}"
+
+
+def _signing_parts(collection: str) -> list:
+    # Responses carrying signed blob URLs change each signing window, so their ETags must too
+    return [url_window()] if collection in PRIVATE_BLOB_COLLECTIONS else []
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag derived from the given parts"""
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+async def shared_versions(db, *collections: str) -> list:
+    """Versions of the shared collections a response embeds data from"""
+    return [f"{c}:{await collection_version(db, c, SHARED_OWNER)}" for c in collections]
+
+
+async def list_etag(db, request: Request, collection: str, user_id: str, embeds=()) -> str:
+    """ETag for one page of a user's collection, without reading the documents; embeds names shared collections it joins"""
+    version = await collection_version(db, collection, user_id)
+    return make_etag(collection, user_id, version, *await shared_versions(db, *embeds), *_signing_parts(collection), request_key(request))
+
+
+def doc_etag(request: Request, collection: str, doc: dict, *derived) -> str:
+    """ETag for a single raw document; derived covers values computed at read time (e.g. status)"""
+    return make_etag(collection, doc['_id'], doc.get('version', 0), *derived, *_signing_parts(collection), request_key(request))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak comparison, as RFC 9110 requires for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 response if the client already holds etag, otherwise None"""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        headers = {"ETag": etag, "Cache-Control": PRIVATE_CACHE_CONTROL}
+        if COMPRESSION_ENABLED:
+            # The JSON 200 this stands in for varies by Accept-Encoding, and a 304 must repeat its Vary
+            headers["Vary"] = "Accept-Encoding"
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+def with_etag(result, etag: str) -> Response:
+    """Attach the ETag to a private, revalidate-every-time response"""
+    response = as_response(result)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = PRIVATE_CACHE_CONTROL
+    return response
+
+
+class ConditionalGetMiddleware:
+    """Answer If-None-Match with 304 on GET; JSON responses without an ETag get one from their body"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = None
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value.decode('latin-1')
+
+        start = None
+        body = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                content_type = headers.get(b"content-type", b"")
+                if message["status"] != 200 or (b"etag" not in headers and not content_type.startswith(b"application/json")):
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                if b"etag" in headers and not etag_matches(if_none_match, headers[b"etag"].decode('latin-1')):
+                    passthrough = True
+                    await send(message)
+                return
+
+            # Body of a response that either matched or still needs an ETag
+            body.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            headers = list(start.get("headers", []))
+            etag = dict(headers).get(b"etag")
+            if etag is None:
+                etag = body_etag(b"".join(body)).encode('latin-1')
+                headers.append((b"etag", etag))
+
+            if etag_matches(if_none_match, etag.decode('latin-1')):
+                not_modified_headers = [(n, v) for n, v in headers if n in _NOT_MODIFIED_HEADERS]
+                if COMPRESSION_ENABLED and is_compressible(dict(headers)):
+                    # Compression adds this Vary to the full response further out; the 304 must carry it too
+                    not_modified_headers = with_vary(not_modified_headers)
+                await send({
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": not_modified_headers,
+                })
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": b"".join(body)})
+
+        await self.app(scope, receive, send_wrapper)
@@ -3,7 +3,7 @@ import { View, Text, StyleSheet, ScrollView, TouchableOpacity, RefreshControl, I
 import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import { useAuth } from '../../contexts/AuthContext';
-import api from '../../services/api';
+import api, { getAllPages } from '../../services/api';
 import { fetchLogosWithCache } from '../../services/logoService';
 import HamburgerMenu from '../../components/HamburgerMenu';
 import { useFonts, Poppins_400Regular, Poppins_500Medium, Poppins_600SemiBold, Poppins_700Bold } from '@expo-google-fonts/poppins';
@@ -54,9 +54,9 @@ export default function Dashboard() {
   const fetchStats = async () => {
     try {
       const [vehiclesResponse, insuranceResponse, roadsideResponse, financeResponse] = await Promise.allSettled([
-        api.get('/vehicles'),
-        api.get('/insurance-policies'),
-        api.get('/roadside-assistance'),
+        getAllPages('/vehicles'),
+        getAllPages('/insurance-policies'),
+        getAllPages('/roadside-assistance'),
         api.get('/finance-loans')
       ]);
 
@@ -4,6 +4,7 @@ import { useRouter, useFocusEffect } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import { useVehicles } from '../../hooks/useVehicles';
 import AppHeader from '../../components/AppHeader';
+import { resolveAssetUrl } from '../../services/api';
 
 export default function Vehicles() {
   const router = useRouter();
@@ -46,7 +47,7 @@ export default function Vehicles() {
       <View style={styles.vehicleImageContainer}>
         {vehicle.image ? (
           <Image 
-            source={{ uri: vehicle.image }} 
+            source={{ uri: resolveAssetUrl(vehicle.image) }} 
             style={styles.vehicleImage}
             resizeMode="cover"
             defaultSource={require('../../assets/images/icon.png')}
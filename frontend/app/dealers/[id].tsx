@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { View, Text, StyleSheet, ScrollView, TouchableOpacity, Alert, Linking, Image } from 'react-native';
 import { useRouter, useLocalSearchParams } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import api from '../../services/api';
+import api, { resolveAssetUrl } from '../../services/api';
 
 interface DealerDetail {
   id: string;
@@ -97,7 +97,7 @@ export default function DealerDetail() {
         {/* Dealer Header */}
         <View style={styles.dealerHeader}>
           {dealer.logo ? (
-            <Image source={{ uri: dealer.logo }} style={styles.dealerLogo} />
+            <Image source={{ uri: resolveAssetUrl(dealer.logo) }} style={styles.dealerLogo} />
           ) : (
             <View style={styles.logoPlaceholder}>
               <Ionicons name="business" size={48} color="#5856D6" />
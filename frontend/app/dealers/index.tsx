@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { View, Text, StyleSheet, FlatList, TouchableOpacity, RefreshControl, Alert, Linking } from 'react-native';
 import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import api from '../../services/api';
+import { getAllPages } from '../../services/api';
 
 interface Dealer {
   id: string;
@@ -25,7 +25,7 @@ export default function Dealers() {
   const fetchDealers = async () => {
     setLoading(true);
     try {
-      const response = await api.get('/dealers');
+      const response = await getAllPages('/dealers');
       setDealers(response.data);
     } catch (error: any) {
       Alert.alert('Error', 'Failed to load dealers');
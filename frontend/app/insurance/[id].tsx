@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { View, Text, StyleSheet, TouchableOpacity, ScrollView, Linking, Alert, ActivityIndicator } from 'react-native';
 import { useRouter, useLocalSearchParams } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import api from '../../services/api';
+import api, { getAllPages } from '../../services/api';
 import AppHeader from '../../components/AppHeader';
 import { format } from 'date-fns';
 
@@ -48,7 +48,7 @@ export default function InsuranceDetail() {
     try {
       setLoading(true);
       // Fetch all policies and find the one we need
-      const response = await api.get('/insurance-policies');
+      const response = await getAllPages('/insurance-policies');
       const policies = response.data?.data?.policies || [];
       const foundPolicy = policies.find((p: InsurancePolicy) => p.id === id);
       
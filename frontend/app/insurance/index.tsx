@@ -3,7 +3,7 @@ import AppHeader from '../../components/AppHeader';
 import { View, Text, StyleSheet, ScrollView, TouchableOpacity, RefreshControl, Alert, Linking, ActivityIndicator, Platform } from 'react-native';
 import { useRouter, useFocusEffect } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import api from '../../services/api';
+import api, { getAllPages } from '../../services/api';
 import { format } from 'date-fns';
 
 interface InsurancePolicy {
@@ -48,7 +48,7 @@ export default function Insurance() {
   const fetchPolicies = async () => {
     setLoading(true);
     try {
-      const response = await api.get('/insurance-policies');
+      const response = await getAllPages('/insurance-policies');
       console.log('Insurance API response:', response.data);
       
       const policiesData = response.data?.data?.policies || [];
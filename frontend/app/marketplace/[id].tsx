@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { View, Text, StyleSheet, ScrollView, Image, TouchableOpacity, Alert, Linking, Dimensions } from 'react-native';
 import { useRouter, useLocalSearchParams } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import api from '../../services/api';
+import api, { resolveAssetUrl } from '../../services/api';
 import { format } from 'date-fns';
 
 const { width } = Dimensions.get('window');
@@ -156,7 +156,7 @@ export default function MarketplaceDetail() {
         <View style={styles.imageGallery}>
           {listing.images && listing.images.length > 0 ? (
             <>
-              <Image source={{ uri: listing.images[currentImageIndex] }} style={styles.mainImage} />
+              <Image source={{ uri: resolveAssetUrl(listing.images[currentImageIndex]) }} style={styles.mainImage} />
               {listing.images.length > 1 && (
                 <View style={styles.imageIndicators}>
                   {listing.images.map((_, index) => (
@@ -3,7 +3,7 @@ import AppHeader from '../../components/AppHeader';
 import { View, Text, StyleSheet, FlatList, TouchableOpacity, RefreshControl, Alert, Image, TextInput } from 'react-native';
 import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import api from '../../services/api';
+import api, { resolveAssetUrl } from '../../services/api';
 
 interface MarketplaceListing {
   id: string;
@@ -131,7 +131,7 @@ export default function Marketplace() {
         
         <View style={styles.imageContainer}>
           {listing.images && listing.images.length > 0 ? (
-            <Image source={{ uri: listing.images[0] }} style={styles.vehicleImage} />
+            <Image source={{ uri: resolveAssetUrl(listing.images[0]) }} style={styles.vehicleImage} />
           ) : (
             <View style={styles.imagePlaceholder}>
               <Ionicons name="car" size={48} color="#C7C7CC" />
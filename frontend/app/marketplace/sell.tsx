@@ -3,7 +3,7 @@ import { View, Text, TextInput, TouchableOpacity, StyleSheet, ScrollView, Keyboa
 import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import { useVehicles } from '../../hooks/useVehicles';
-import api from '../../services/api';
+import api, { resolveAssetUrl } from '../../services/api';
 
 export default function SellVehicle() {
   const router = useRouter();
@@ -95,7 +95,7 @@ export default function SellVehicle() {
                 >
                   <View style={styles.vehicleImageContainer}>
                     {vehicle.image ? (
-                      <Image source={{ uri: vehicle.image }} style={styles.vehicleImage} />
+                      <Image source={{ uri: resolveAssetUrl(vehicle.image) }} style={styles.vehicleImage} />
                     ) : (
                       <View style={styles.vehiclePlaceholder}>
                         <Ionicons name="car" size={24} color="#C7C7CC" />
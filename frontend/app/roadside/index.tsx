@@ -3,7 +3,7 @@ import AppHeader from '../../components/AppHeader';
 import { View, Text, StyleSheet, ScrollView, TouchableOpacity, RefreshControl, Alert, Linking, ActivityIndicator } from 'react-native';
 import { useRouter, useFocusEffect } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import api from '../../services/api';
+import api, { getAllPages } from '../../services/api';
 import { format } from 'date-fns';
 
 interface RoadsideMembership {
@@ -42,7 +42,7 @@ export default function Roadside() {
   const fetchMemberships = async () => {
     setLoading(true);
     try {
-      const response = await api.get('/roadside-assistance');
+      const response = await getAllPages('/roadside-assistance');
       console.log('Roadside API response:', response.data);
       
       const assistanceData = response.data?.data?.policies || [];
@@ -13,7 +13,7 @@ import {
 } from 'react-native';
 import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import api from '../../services/api';
+import api, { getAllPages } from '../../services/api';
 import { Picker } from '@react-native-picker/picker';
 import DateTimePicker from '@react-native-community/datetimepicker';
 
@@ -125,7 +125,7 @@ export default function AddServiceBooking() {
 
   const fetchVehicles = async () => {
     try {
-      const response = await api.get('/vehicles');
+      const response = await getAllPages('/vehicles');
       const vehiclesData = response.data?.data?.vehicles || [];
       setVehicles(vehiclesData);
     } catch (error) {
@@ -14,7 +14,7 @@ import {
 import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import { useAuth } from '../../contexts/AuthContext';
-import api from '../../services/api';
+import api, { getAllPages } from '../../services/api';
 import AppHeader from '../../components/AppHeader';
 import { Picker } from '@react-native-picker/picker';
 
@@ -101,7 +101,7 @@ export default function SettingsScreen() {
   // Load transfer data
   const loadTransferData = async () => {
     try {
-      const vehiclesRes = await api.get('/vehicles');
+      const vehiclesRes = await getAllPages('/vehicles');
       setVehicles(vehiclesRes.data?.data?.vehicles || []);
       
       const pendingRes = await api.get('/transfers/pending');
@@ -4,7 +4,7 @@ import { useRouter, useLocalSearchParams } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import * as ImagePicker from 'expo-image-picker';
 import * as ImageManipulator from 'expo-image-manipulator';
-import api from '../../services/api';
+import api, { getAllPages } from '../../services/api';
 import { format } from 'date-fns';
 
 const { width } = Dimensions.get('window');
@@ -74,7 +74,7 @@ export default function VehicleDetail() {
       }
       
       // Fallback: Get from vehicles list
-      const vehiclesResponse = await api.get('/vehicles');
+      const vehiclesResponse = await getAllPages('/vehicles');
       console.log('Vehicles list response:', vehiclesResponse.data);
       
       // Parse the response structure
@@ -2,7 +2,7 @@ import React, { createContext, useState, useEffect, useContext } from 'react';
 import * as SecureStore from 'expo-secure-store';
 import axios from 'axios';
 import { Platform } from 'react-native';
-import { API_URL } from '../services/api';
+import { API_URL, refreshAccessToken } from '../services/api';
 
 console.log('🔧 AuthContext API_URL:', API_URL);
 
@@ -75,15 +75,27 @@ export const AuthProvider = ({ children }: { children: React.ReactNode }) => {
         setToken(storedToken);
         setUser(JSON.parse(storedUser));
         
-        // Verify token is still valid
+        // Verify token is still valid, renewing it once if it has expired
+        const fetchMe = (accessToken: string) => axios.get(`${API_URL}/api/auth/me`, {
+          headers: { Authorization: `Bearer ${accessToken}` }
+        });
         try {
-          const response = await axios.get(`${API_URL}/api/auth/me`, {
-            headers: { Authorization: `Bearer ${storedToken}` }
-          });
+          let response;
+          try {
+            response = await fetchMe(storedToken);
+          } catch (error: any) {
+            const renewedToken = error.response?.status === 401 ? await refreshAccessToken() : null;
+            if (!renewedToken) {
+              throw error;
+            }
+            setToken(renewedToken);
+            response = await fetchMe(renewedToken);
+          }
           setUser(response.data);
         } catch (error) {
           // Token invalid, clear storage
           await deleteStorageItem('auth_token');
+          await deleteStorageItem('refresh_token');
           await deleteStorageItem('user_data');
           setToken(null);
           setUser(null);
@@ -103,9 +115,12 @@ export const AuthProvider = ({ children }: { children: React.ReactNode }) => {
         password
       });
       
-      const { access_token, user: userData } = response.data;
+      const { access_token, refresh_token, user: userData } = response.data;
       
       await setStorageItem('auth_token', access_token);
+      if (refresh_token) {
+        await setStorageItem('refresh_token', refresh_token);
+      }
       await setStorageItem('user_data', JSON.stringify(userData));
       
       setToken(access_token);
@@ -130,13 +145,16 @@ export const AuthProvider = ({ children }: { children: React.ReactNode }) => {
       
       console.log('Success! Response:', response.data);
       
-      const { access_token, user: userData } = response.data;
+      const { access_token, refresh_token, user: userData } = response.data;
       
       if (!access_token) {
         throw new Error('No access token received from server');
       }
       
       await setStorageItem('auth_token', access_token);
+      if (refresh_token) {
+        await setStorageItem('refresh_token', refresh_token);
+      }
       await setStorageItem('user_data', JSON.stringify(userData));
       
       setToken(access_token);
@@ -180,9 +198,12 @@ export const AuthProvider = ({ children }: { children: React.ReactNode }) => {
         phone
       });
       
-      const { access_token, user: userData } = response.data;
+      const { access_token, refresh_token, user: userData } = response.data;
       
       await setStorageItem('auth_token', access_token);
+      if (refresh_token) {
+        await setStorageItem('refresh_token', refresh_token);
+      }
       await setStorageItem('user_data', JSON.stringify(userData));
       
       setToken(access_token);
@@ -193,7 +214,14 @@ export const AuthProvider = ({ children }: { children: React.ReactNode }) => {
   };
 
   const logout = async () => {
+    if (token) {
+      // Revoke the session server-side; clearing local storage is enough if this fails
+      axios.post(`${API_URL}/api/auth/logout`, {}, {
+        headers: { Authorization: `Bearer ${token}` }
+      }).catch(() => {});
+    }
     await deleteStorageItem('auth_token');
+    await deleteStorageItem('refresh_token');
     await deleteStorageItem('user_data');
     setToken(null);
     setUser(null);
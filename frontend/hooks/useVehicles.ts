@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 
 export interface Vehicle {
   id: string;
@@ -28,7 +28,7 @@ export const useVehicles = () => {
     setLoading(true);
     setError(null);
     try {
-      const response = await api.get('/vehicles');
+      const response = await getAllPages('/vehicles');
       console.log('Vehicles API response:', response.data);
       
       // Handle different response structures from live backend
@@ -1,4 +1,4 @@
-import axios from 'axios';
+import axios, { AxiosRequestConfig } from 'axios';
 import * as SecureStore from 'expo-secure-store';
 import AsyncStorage from '@react-native-async-storage/async-storage'; // DEV ONLY
 import { Platform } from 'react-native';
@@ -121,18 +121,90 @@ api.interceptors.request.use(
   }
 );
 
+const setStorageItem = async (key: string, value: string) => {
+  if (Platform.OS === 'web') {
+    localStorage.setItem(key, value);
+  } else {
+    await SecureStore.setItemAsync(key, value);
+  }
+};
+
+// Access tokens are short-lived; every caller shares a single in-flight refresh call
+let refreshPromise: Promise<string | null> | null = null;
+
+const requestNewAccessToken = async (): Promise<string | null> => {
+  const refreshToken = await getStorageItem('refresh_token');
+  if (!refreshToken) {
+    return null;
+  }
+  try {
+    const currentApiUrl = await getCurrentApiUrl();
+    const response = await axios.post(`${currentApiUrl}/api/auth/refresh`, {
+      refresh_token: refreshToken,
+    });
+    await setStorageItem('auth_token', response.data.access_token);
+    await setStorageItem('refresh_token', response.data.refresh_token);
+    return response.data.access_token;
+  } catch (error) {
+    return null;
+  }
+};
+
+export const refreshAccessToken = (): Promise<string | null> => {
+  refreshPromise = refreshPromise || requestNewAccessToken().finally(() => {
+    refreshPromise = null;
+  });
+  return refreshPromise;
+};
+
 // Response interceptor for error handling
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const original = error.config;
+    if (error.response?.status === 401 && original && !original._retried) {
+      original._retried = true;
+      const newToken = await refreshAccessToken();
+      if (newToken) {
+        original.headers.Authorization = `Bearer ${newToken}`;
+        return api(original);
+      }
+    }
     if (error.response?.status === 401) {
       // Token expired or invalid
       deleteStorageItem('auth_token');
+      deleteStorageItem('refresh_token');
       deleteStorageItem('user_data');
     }
     return Promise.reject(error);
   }
 );
 
+// List endpoints return one page (100 items by default) and put the next page's cursor in X-Next-Cursor.
+// Screens that show a whole collection follow it until the last page.
+const NEXT_CURSOR_HEADER = 'x-next-cursor';
+const MAX_PAGE_SIZE = 500;
+
+export const getAllPages = async (url: string, config: AxiosRequestConfig = {}) => {
+  const params = { limit: MAX_PAGE_SIZE, ...config.params };
+  let response = await api.get(url, { ...config, params });
+  if (!Array.isArray(response.data)) {
+    return response;
+  }
+  const items = [...response.data];
+  let cursor = response.headers[NEXT_CURSOR_HEADER];
+  while (cursor) {
+    response = await api.get(url, { ...config, params: { ...params, cursor } });
+    items.push(...response.data);
+    cursor = response.headers[NEXT_CURSOR_HEADER];
+  }
+  return { ...response, data: items };
+};
+
+// Blob URLs are server-relative (/api/blobs/...) unless the backend sets BLOB_PUBLIC_BASE_URL;
+// <Image> needs an absolute URI, so resolve them against the API host
+export const resolveAssetUrl = (uri?: string | null) =>
+  uri && uri.startsWith('/') ? `${API_URL}${uri}` : uri ?? undefined;
+
 export { API_URL };
 export default api;
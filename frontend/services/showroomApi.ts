@@ -1,5 +1,5 @@
 import axios from 'axios';
-import api from './api';
+import api, { getAllPages } from './api';
 
 const API_URL = 'https://app-bridge-api.preview.emergentagent.com';
 
@@ -246,7 +246,7 @@ export const getAllShowroomVehicles = async (): Promise<ShowroomVehicle[]> => {
     
     // Fetch from BOTH endpoints like web app does
     const [vehiclesResponse, marketplaceResponse] = await Promise.all([
-      api.get(`/vehicles`).catch(err => {
+      getAllPages(`/vehicles`).catch(err => {
         console.log('⚠️ Error fetching regular vehicles:', err);
         return { data: [] };
       }),
@@ -0,0 +1,70 @@
+"""
+Helpers for the benchmark tests, which are marked with @pytest.mark.benchmark and skipped unless
+RUN_BENCHMARKS=1. Benchmarks that need a real server also need BENCHMARK_MONGO_URL to point at a
+disposable MongoDB, e.g.
+RUN_BENCHMARKS=1 BENCHMARK_MONGO_URL=mongodb://localhost:27017 pytest -s -m benchmark tests
+"""
+import math
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+BENCHMARK_MONGO_URL = os.getenv("BENCHMARK_MONGO_URL")
+
+requires_mongo = pytest.mark.skipif(not BENCHMARK_MONGO_URL, reason="BENCHMARK_MONGO_URL is not set")
+
+
+@asynccontextmanager
+async def mongo_database(prefix: str):
+    """Throwaway database on the benchmark server, dropped afterwards"""
+    client = AsyncIOMotorClient(BENCHMARK_MONGO_URL)
+    db = client[f"{prefix}_{uuid.uuid4().hex[:8]}"]
+    try:
+        yield db
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+def app_client(app) -> httpx.AsyncClient:
+    """In-process async client, so concurrent requests share the app's event loop"""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def percentile(samples, p: float) -> float:
+    """Nearest-rank percentile of the samples"""
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def best_of(fn, runs: int = 5) -> float:
+    """Fastest of several timed calls, so a cold cache or a scheduler hiccup does not decide the result"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+async def best_of_async(fn, runs: int = 5) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def report(title: str, **values):
+    """One line of benchmark output; run pytest with -s to see it"""
+    print(f"\n{title}: " + ", ".join(f"{name} {value}" for name, value in values.items()))
+
+
+def ms(seconds: float) -> str:
+    return f"{seconds * 1000:.2f} ms"
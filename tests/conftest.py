@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Settings are read when the backend modules are imported, so they have to be in place first
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+os.environ.setdefault("BLOB_STORAGE_PATH", tempfile.mkdtemp(prefix="blobs-"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: timing benchmark, runs only when RUN_BENCHMARKS is set")
+
+
+def pytest_collection_modifyitems(config, items):
+    # Benchmarks are slow and depend on the machine, so the default run only checks behaviour
+    if os.getenv("RUN_BENCHMARKS"):
+        return
+    skip = pytest.mark.skip(reason="RUN_BENCHMARKS is not set")
+    for item in items:
+        if item.get_closest_marker("benchmark"):
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def db():
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()[os.environ["DB_NAME"]]
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """API client on an in-memory database; the lifespan (pool warm-up, background workers) is not run"""
+    from fastapi.testclient import TestClient
+
+    import server
+    import user_repository
+    from rate_limit import LoginRateLimiter
+    from user_cache import UserCache
+
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "login_rate_limiter", LoginRateLimiter())
+    cache = UserCache(ttl=30)
+    monkeypatch.setattr(server, "user_cache", cache)
+    monkeypatch.setattr(user_repository, "user_cache", cache)
+    return TestClient(server.app)
+
+
+@pytest.fixture
+def register(client):
+    """Create a user and return the Authorization header for them"""
+    count = 0
+
+    def _register(email=None, password="secret-password"):
+        nonlocal count
+        count += 1
+        response = client.post("/api/auth/register", json={
+            "email": email or f"user{count}@example.com",
+            "password": password,
+            "full_name": "Test User",
+            "phone": "0400000000"
+        })
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return _register
@@ -0,0 +1,170 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import auth_utils
+import token_service
+from auth_utils import RevocationList
+
+PASSWORD = "secret-password"
+
+
+@pytest.fixture(autouse=True)
+def revocations(monkeypatch):
+    revoked = RevocationList()
+    monkeypatch.setattr(auth_utils, "revoked_sessions", revoked)
+    monkeypatch.setattr(token_service, "revoked_sessions", revoked)
+    return revoked
+
+
+@pytest.fixture
+def session(client):
+    """Register a user; returns a function that logs them in again (a new session) as (access, refresh)"""
+    response = client.post("/api/auth/register", json={
+        "email": "driver@example.com", "password": PASSWORD, "full_name": "Driver", "phone": "0400000000"
+    })
+    assert response.status_code == 200, response.text
+
+    def login():
+        response = client.post("/api/auth/login", json={"email": "driver@example.com", "password": PASSWORD})
+        assert response.status_code == 200, response.text
+        return response.json()["access_token"], response.json()["refresh_token"]
+
+    return login
+
+
+def me(client, access_token):
+    return client.get("/api/auth/me", headers={"Authorization": f"Bearer {access_token}"}).status_code
+
+
+def refresh(client, refresh_token):
+    return client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+
+
+def age_used_token(db, refresh_token, seconds):
+    """Pretend the token was rotated the given number of seconds ago"""
+    used_at = datetime.utcnow() - timedelta(seconds=seconds)
+    asyncio.run(db.refresh_tokens.update_one({"_id": token_service._digest(refresh_token)}, {"$set": {"used_at": used_at}}))
+
+
+def test_refresh_rotates_the_token_pair(client, session):
+    access, old_refresh = session()
+
+    response = refresh(client, old_refresh)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["refresh_token"] != old_refresh
+    assert me(client, body["access_token"]) == 200
+    assert refresh(client, body["refresh_token"]).status_code == 200
+
+
+def test_refresh_tokens_are_stored_hashed(client, session, db):
+    _, refresh_token = session()
+
+    stored = asyncio.run(db.refresh_tokens.find({}).to_list(None))
+
+    assert refresh_token not in [doc["_id"] for doc in stored]
+    assert token_service._digest(refresh_token) in [doc["_id"] for doc in stored]
+
+
+def test_retry_within_grace_window_is_allowed_once(client, session):
+    _, old_refresh = session()
+    rotated = refresh(client, old_refresh).json()
+
+    retry = refresh(client, old_refresh)
+    assert retry.status_code == 200
+    assert refresh(client, old_refresh).status_code == 401
+
+    # A lost response is not theft: the session stays alive
+    assert me(client, rotated["access_token"]) == 200
+    assert refresh(client, retry.json()["refresh_token"]).status_code == 200
+
+
+def test_replay_after_grace_window_revokes_the_session(client, session, db):
+    _, old_refresh = session()
+    rotated = refresh(client, old_refresh).json()
+    age_used_token(db, old_refresh, token_service.REFRESH_REUSE_GRACE_SECONDS + 1)
+
+    assert refresh(client, old_refresh).status_code == 401
+
+    # Every token of the family is dead, including the legitimate latest pair
+    assert refresh(client, rotated["refresh_token"]).status_code == 401
+    assert me(client, rotated["access_token"]) == 401
+
+
+def test_replay_only_revokes_its_own_session(client, session, db):
+    _, stolen = session()
+    other_access, other_refresh = session()
+    refresh(client, stolen)
+    age_used_token(db, stolen, token_service.REFRESH_REUSE_GRACE_SECONDS + 1)
+
+    assert refresh(client, stolen).status_code == 401
+
+    assert me(client, other_access) == 200
+    assert refresh(client, other_refresh).status_code == 200
+
+
+def test_unknown_and_expired_refresh_tokens_are_rejected(client, session, db):
+    _, refresh_token = session()
+    asyncio.run(db.refresh_tokens.update_many({}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}))
+
+    assert refresh(client, "not-a-token").status_code == 401
+    assert refresh(client, refresh_token).status_code == 401
+
+
+def test_logout_revokes_access_and_refresh_tokens(client, session):
+    access, refresh_token = session()
+    other_access, _ = session()
+
+    assert client.post("/api/auth/logout", headers={"Authorization": f"Bearer {access}"}).status_code == 200
+
+    assert me(client, access) == 401
+    assert refresh(client, refresh_token).status_code == 401
+    assert me(client, other_access) == 200
+
+
+def test_password_change_signs_out_other_sessions(client, session):
+    access, refresh_token = session()
+    other_access, other_refresh = session()
+
+    response = client.post(
+        "/api/user/change-password",
+        headers={"Authorization": f"Bearer {access}"},
+        json={"current_password": PASSWORD, "new_password": "new-password"}
+    )
+
+    assert response.status_code == 200
+    assert me(client, other_access) == 401
+    assert refresh(client, other_refresh).status_code == 401
+    assert me(client, access) == 200
+    assert refresh(client, refresh_token).status_code == 200
+
+
+def test_revocation_from_another_worker_applies_after_reload(client, session, db, monkeypatch):
+    access, _ = session()
+    other_worker = RevocationList()
+    monkeypatch.setattr(token_service, "revoked_sessions", other_worker)
+    sid = auth_utils.decode_token(access)["sid"]
+
+    asyncio.run(token_service.revoke_session(db, auth_utils.decode_token(access)["user_id"], sid))
+    # This worker has not reloaded yet
+    assert me(client, access) == 200
+
+    monkeypatch.setattr(token_service, "revoked_sessions", auth_utils.revoked_sessions)
+    asyncio.run(token_service.load_revocations(db))
+    assert me(client, access) == 401
+
+
+def test_revocation_list_keeps_local_entries_across_reloads(revocations):
+    revocations.add("local", time.time() + 60)
+    revocations.add("ended", 0)
+
+    revocations.replace({"remote": time.time() + 60})
+
+    assert "local" in revocations
+    assert "remote" in revocations
+    assert "ended" not in revocations
+    assert None not in revocations
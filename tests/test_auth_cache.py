@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth_utils
+import server
+from auth_utils import VerifiedTokenCache, create_access_token, get_current_user
+from tests.benchmarks import best_of, report
+
+REQUESTS = 10000
+
+
+def token(**claims):
+    return create_access_token({"user_id": "u1", "email": "driver@example.com", "sid": "s1", **claims})
+
+
+def test_verified_tokens_are_served_from_the_cache():
+    cache = VerifiedTokenCache(size=10)
+    access = token()
+
+    first, second = cache.verify(access), cache.verify(access)
+
+    assert first == second and first["user_id"] == "u1"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_invalid_tokens_are_rejected_and_not_cached():
+    cache = VerifiedTokenCache(size=10)
+    tampered = token()[:-2] + "xx"
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            cache.verify(tampered)
+        assert error.value.status_code == 401
+    assert cache.stats()["cached"] == 0 and cache.misses == 2
+
+
+def test_cache_is_bounded_and_can_be_disabled():
+    bounded, disabled = VerifiedTokenCache(size=2), VerifiedTokenCache(size=0)
+
+    for i in range(5):
+        bounded.verify(token(jti=str(i)))
+        disabled.verify(token(jti=str(i)))
+
+    assert bounded.stats()["cached"] == 2
+    assert disabled.stats() == {"enabled": False, "hits": 0, "misses": 0, "hit_ratio": 0.0, "cached": 0}
+
+
+def test_profile_is_cached_until_the_user_updates_it(client, register):
+    headers = register(email="cached@example.com")
+    cache = server.user_cache
+
+    client.get("/api/auth/me", headers=headers)
+    client.get("/api/auth/me", headers=headers)
+    assert cache.hits == 1
+
+    client.put("/api/auth/update-profile", headers=headers, json={"full_name": "Renamed"})
+    assert client.get("/api/auth/me", headers=headers).json()["full_name"] == "Renamed"
+
+    client.put("/api/user/profile", headers=headers, json={"email": "moved@example.com"})
+    assert client.get("/api/auth/me", headers=headers).json()["email"] == "moved@example.com"
+
+
+@pytest.mark.benchmark
+def test_per_request_auth_overhead(monkeypatch):
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token())
+
+    def authenticate():
+        for _ in range(REQUESTS):
+            get_current_user(SimpleNamespace(state=SimpleNamespace()), credentials)
+
+    results = {}
+    for name, size in (("full decode", 0), ("verified-token cache", 10000)):
+        monkeypatch.setattr(auth_utils, "token_cache", VerifiedTokenCache(size=size))
+        results[name] = best_of(authenticate) / REQUESTS
+
+    report("auth overhead per request", **{name: f"{seconds * 1e6:.1f} us" for name, seconds in results.items()})
+    assert results["verified-token cache"] * 2 < results["full decode"]
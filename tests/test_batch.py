@@ -0,0 +1,52 @@
+from pagination import NEXT_CURSOR_HEADER
+
+
+def test_batch_runs_each_request_as_the_caller(client, register):
+    headers = register()
+    for i in range(2):
+        client.post("/api/vehicles", headers=headers, json={
+            "rego": f"REG{i}", "vin": f"VIN{i}", "make": "Ford", "model": "Ranger", "year": 2021
+        })
+
+    response = client.post("/api/batch", headers=headers, json={"requests": [
+        {"id": "me", "path": "/api/auth/me"},
+        {"id": "vehicles", "path": "/api/vehicles?limit=1"},
+    ]})
+
+    assert response.status_code == 200, response.text
+    me, vehicles = response.json()["responses"]
+    assert me["id"] == "me" and me["status"] == 200
+    assert me["body"]["email"] == "user1@example.com"
+    assert vehicles["status"] == 200
+    assert len(vehicles["body"]) == 1
+    assert NEXT_CURSOR_HEADER.lower() in vehicles["headers"]
+    assert "etag" in vehicles["headers"]
+
+
+def test_batch_reports_sub_request_errors_without_failing(client, register):
+    headers = register()
+
+    response = client.post("/api/batch", headers=headers, json={"requests": [
+        {"id": "missing", "path": "/api/vehicles/000000000000000000000000"},
+        {"id": "write", "method": "POST", "path": "/api/vehicles"},
+        {"id": "nested", "path": "/api/batch"},
+        {"id": "outside", "path": "/docs"},
+    ]})
+
+    assert response.status_code == 200
+    statuses = {r["id"]: r["status"] for r in response.json()["responses"]}
+    assert statuses == {"missing": 404, "write": 405, "nested": 400, "outside": 400}
+
+
+def test_batch_requires_authentication(client):
+    response = client.post("/api/batch", json={"requests": [{"path": "/api/vehicles"}]})
+
+    assert response.status_code in (401, 403)
+
+
+def test_batch_size_is_limited(client, register):
+    headers = register()
+
+    too_many = [{"path": "/api/vehicles"}] * 21
+    assert client.post("/api/batch", headers=headers, json={"requests": too_many}).status_code == 422
+    assert client.post("/api/batch", headers=headers, json={"requests": []}).status_code == 422
@@ -0,0 +1,84 @@
+"""Home screen load as seven requests against one POST /api/batch, over a simulated mobile round trip"""
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+import server
+from rate_limit import LoginRateLimiter
+from tests.benchmarks import ms, report
+
+pytestmark = pytest.mark.benchmark
+
+RTT_SECONDS = float(os.getenv("BENCHMARK_RTT_MS", 80)) / 1000
+RUNS = 5
+
+HOME_SCREEN = ["/api/auth/me", "/api/dashboard/stats", "/api/vehicles", "/api/insurance-policies",
+               "/api/finance-products", "/api/roadside-assistance", "/api/promotions"]
+
+
+class MobileTransport(httpx.AsyncBaseTransport):
+    """Adds one network round trip to every request before it reaches the app"""
+
+    def __init__(self, app, rtt: float):
+        self.inner = httpx.ASGITransport(app=app)
+        self.rtt = rtt
+        self.requests = 0
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.rtt)
+        return await self.inner.handle_async_request(request)
+
+
+def test_batch_saves_round_trips(db, monkeypatch):
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "login_rate_limiter", LoginRateLimiter(enabled=False))
+
+    async def run():
+        transport = MobileTransport(server.app, RTT_SECONDS)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            registered = await client.post("/api/auth/register", json={
+                "email": "batch@example.com", "password": "secret-password", "full_name": "Batch", "phone": "0400000000"
+            })
+            headers = {"Authorization": f"Bearer {registered.json()['access_token']}"}
+            for i in range(5):
+                await client.post("/api/vehicles", headers=headers, json={
+                    "rego": f"BAT{i}", "vin": f"VIN-BAT{i}", "make": "Ford", "model": "Ranger", "year": 2021
+                })
+
+            async def sequential():
+                return [await client.get(path, headers=headers) for path in HOME_SCREEN]
+
+            async def parallel():
+                return await asyncio.gather(*[client.get(path, headers=headers) for path in HOME_SCREEN])
+
+            async def batched():
+                response = await client.post("/api/batch", headers=headers, json={
+                    "requests": [{"id": path, "path": path} for path in HOME_SCREEN]
+                })
+                return response.json()["responses"]
+
+            results = {}
+            for name, load in (("sequential", sequential), ("parallel", parallel), ("batch", batched)):
+                timings = []
+                for _ in range(RUNS):
+                    transport.requests = 0
+                    started = time.perf_counter()
+                    responses = await load()
+                    timings.append(time.perf_counter() - started)
+                results[name] = (min(timings), transport.requests, responses)
+            return results
+
+    results = asyncio.run(run())
+    report(f"home screen at {ms(RTT_SECONDS)} RTT",
+           **{name: f"{requests} requests in {ms(seconds)}" for name, (seconds, requests, _) in results.items()})
+
+    individual = [r.json() for r in results["sequential"][2]]
+    batched = results["batch"][2]
+    assert [r["status"] for r in batched] == [200] * len(HOME_SCREEN)
+    assert [r["body"] for r in batched] == individual
+    assert results["batch"][1] == 1
+    assert results["batch"][0] < results["sequential"][0] / 3
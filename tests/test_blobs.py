@@ -0,0 +1,85 @@
+import base64
+import io
+
+from PIL import Image
+
+import blob_store
+
+PDF = base64.b64encode(b"%PDF-1.4 " + b"x" * 300).decode()
+
+
+def jpeg():
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 40), "blue").save(buffer, "JPEG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def add_vehicle(client, headers, image=None):
+    response = client.post("/api/vehicles", headers=headers, json={
+        "rego": "BLOB01", "vin": "VIN-BLOB01", "make": "Kia", "model": "Rio", "year": 2018, "image": image
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def add_policy(client, headers, vehicle_id):
+    response = client.post("/api/insurance-policies", headers=headers, json={
+        "vehicle_id": vehicle_id, "policy_type": "CTP", "provider_id": "p1", "policy_number": "P-1",
+        "premium": 500, "start_date": "2024-01-01T00:00:00", "end_date": "2030-01-01T00:00:00", "documents": [PDF]
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_vehicle_images_are_public_and_immutable(client, register):
+    headers = register()
+    url = add_vehicle(client, headers, jpeg())["image"]
+
+    response = client.get(url)
+
+    assert url.startswith("/api/blobs/")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+
+
+def test_documents_need_a_valid_signed_url(client, register):
+    headers = register()
+    url = add_policy(client, headers, add_vehicle(client, headers)["id"])["documents"][0]
+    path, query = url.split("?")
+
+    signed = client.get(url)
+    assert signed.status_code == 200
+    assert signed.headers["Cache-Control"].startswith("private, max-age=")
+    assert signed.content.startswith(b"%PDF")
+
+    assert client.get(path).status_code == 403
+    assert client.get(url[:-1] + ("0" if url[-1] != "0" else "1")).status_code == 403
+    # Variants are as private as the original
+    assert client.get(f"{path}/thumbnail").status_code == 403
+    assert client.get(f"{path}/thumbnail?{query}").status_code == 200
+
+
+def test_expired_signed_url_is_rejected(client, register, monkeypatch):
+    headers = register()
+    url = add_policy(client, headers, add_vehicle(client, headers)["id"])["documents"][0]
+    expires = int(url.split("expires=")[1].split("&")[0])
+
+    monkeypatch.setattr(blob_store.time, "time", lambda: expires + 1)
+
+    assert client.get(url).status_code == 403
+
+
+def test_same_bytes_uploaded_as_a_public_image_become_public(client, register):
+    headers = register()
+    image = jpeg()
+    vehicle_id = add_vehicle(client, headers)["id"]
+    response = client.post("/api/insurance-policies", headers=headers, json={
+        "vehicle_id": vehicle_id, "policy_type": "CTP", "provider_id": "p1", "policy_number": "P-2",
+        "premium": 500, "start_date": "2024-01-01T00:00:00", "end_date": "2030-01-01T00:00:00", "documents": [image]
+    })
+    path = response.json()["documents"][0].split("?")[0]
+    assert client.get(path).status_code == 403
+
+    add_vehicle(client, headers, image)
+
+    assert client.get(path).status_code == 200
@@ -0,0 +1,53 @@
+"""Size and latency of GET /api/vehicles with inline base64 images, before and after migrate_inline_blobs"""
+import asyncio
+import base64
+import io
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+import migrations
+from tests.benchmarks import best_of, ms, report
+
+pytestmark = pytest.mark.benchmark
+
+VEHICLES = 50
+
+
+def photo() -> str:
+    """A phone-sized JPEG; noise keeps it from compressing to nothing"""
+    buffer = io.BytesIO()
+    Image.effect_noise((1024, 768), 64).convert("RGB").save(buffer, "JPEG", quality=85)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def test_blob_references_shrink_the_vehicle_list(client, register, db):
+    headers = {**register(), "Accept-Encoding": "identity"}
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    image = photo()
+    asyncio.run(db.vehicles.insert_many([
+        {"user_id": user_id, "rego": f"B{i}", "vin": f"VIN-B{i}", "make": "Kia", "model": "Rio", "year": 2018,
+         "image": image, "created_at": datetime.utcnow()}
+        for i in range(VEHICLES)
+    ]))
+
+    def fetch():
+        response = client.get("/api/vehicles", headers=headers)
+        assert response.status_code == 200
+        return response
+
+    inline_bytes = len(fetch().content)
+    inline_time = best_of(fetch)
+    asyncio.run(migrations.migrate_inline_blobs(db))
+    body = fetch()
+    blob_bytes = len(body.content)
+    blob_time = best_of(fetch)
+
+    report("GET /api/vehicles", vehicles=VEHICLES, inline=f"{inline_bytes} bytes in {ms(inline_time)}",
+           blob_refs=f"{blob_bytes} bytes in {ms(blob_time)}")
+    assert all(v["image"].startswith("/api/blobs/") for v in body.json())
+    # Identical photos are stored once
+    assert asyncio.run(db.blobs.count_documents({})) == 1
+    assert blob_bytes * 100 < inline_bytes
+    assert blob_time < inline_time
@@ -0,0 +1,124 @@
+import gzip
+
+import brotli
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+import compression
+from compression import CompressionMiddleware, compression_stats, negotiate_encoding
+
+LISTINGS = [{"id": f"l{i}", "title": "Toyota Camry 2020", "description": "Well kept, full service history"}
+            for i in range(100)]
+ETAG = '"listings-v1"'
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/listings")
+    async def listings(request: Request):
+        if request.headers.get("if-none-match") == ETAG:
+            return Response(status_code=304, headers={"ETag": ETAG})
+        return JSONResponse(LISTINGS, headers={"ETag": ETAG})
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/photo")
+    async def photo():
+        return Response(b"\xff\xd8\xff" + bytes(4096), media_type="image/jpeg")
+
+    @app.get("/export")
+    async def export():
+        async def rows():
+            for i in range(50):
+                yield f"{i},Toyota,Camry,2020\n".encode() * 20
+        return StreamingResponse(rows(), media_type="text/csv")
+
+    app.add_middleware(CompressionMiddleware, enabled=True)
+    return TestClient(app)
+
+
+def test_negotiation_prefers_brotli_and_honours_q_zero():
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0") == "gzip"
+    assert negotiate_encoding("*") == "br"
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip;q=0, br;q=0") is None
+    assert negotiate_encoding("") is None
+
+
+def test_gzip_is_used_when_brotli_is_unavailable(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+    assert negotiate_encoding("gzip, deflate, br") == "gzip"
+
+
+@pytest.mark.parametrize("encoding, decompress", [("gzip", gzip.decompress), ("br", brotli.decompress)])
+def test_large_json_is_compressed_with_the_negotiated_encoding(client, encoding, decompress):
+    with client.stream("GET", "/listings", headers={"Accept-Encoding": encoding}) as response:
+        body = b"".join(response.iter_raw())
+
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == f'"listings-v1-{encoding}"'
+    assert int(response.headers["content-length"]) == len(body)
+    assert decompress(body) == JSONResponse(LISTINGS).body
+    assert len(body) * 5 < len(JSONResponse(LISTINGS).body)
+
+
+def test_identity_is_not_compressed_but_still_varies(client):
+    response = client.get("/listings", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == LISTINGS
+
+
+def test_small_and_binary_bodies_are_left_alone(client):
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    photo = client.get("/photo", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in small.headers and small.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in photo.headers and "vary" not in photo.headers
+    assert len(photo.content) == 4099
+
+
+def test_range_requests_are_not_compressed(client):
+    response = client.get("/listings", headers={"Accept-Encoding": "gzip", "Range": "bytes=0-99"})
+
+    assert "content-encoding" not in response.headers
+
+
+def test_streamed_body_is_compressed_without_a_length(client):
+    with client.stream("GET", "/export", headers={"Accept-Encoding": "gzip"}) as response:
+        body = b"".join(response.iter_raw())
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(body) == b"".join(f"{i},Toyota,Camry,2020\n".encode() * 20 for i in range(50))
+
+
+def test_conditional_request_with_an_encoded_etag_gets_304(client):
+    response = client.get("/listings", headers={"Accept-Encoding": "gzip", "If-None-Match": '"listings-v1-gzip"'})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"listings-v1-gzip"'
+
+
+def test_bytes_saved_and_cpu_are_recorded_per_route(client):
+    before = compression_stats()["routes"].get("GET /listings", {"responses": 0, "compressed": 0, "bytes_saved": 0})
+
+    client.get("/listings", headers={"Accept-Encoding": "gzip"})
+    client.get("/small", headers={"Accept-Encoding": "gzip"})
+    after = compression_stats()["routes"]["GET /listings"]
+
+    assert after["responses"] == before["responses"] + 1
+    assert after["compressed"] == before["compressed"] + 1
+    assert after["bytes_saved"] > before["bytes_saved"]
+    assert after["cpu_ms"] >= 0
+    assert "GET /small" in compression_stats()["routes"]
@@ -0,0 +1,93 @@
+"""Latency of a non-auth endpoint while logins saturate bcrypt, with the worker pool and with inline bcrypt"""
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+import auth_utils
+import server
+from credential_service import CredentialService
+from rate_limit import LoginRateLimiter
+from tests.benchmarks import app_client, ms, percentile, report
+
+pytestmark = pytest.mark.benchmark
+
+LOGIN_CONCURRENCY = 8
+PROBE_SECONDS = 3
+
+
+class InlineCredentials(CredentialService):
+    """bcrypt on the event loop, as the handlers did before the pool"""
+
+    async def verify_password(self, plain_password, hashed_password):
+        return auth_utils.verify_password(plain_password, hashed_password)
+
+
+@pytest.fixture
+def app(db, monkeypatch):
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "login_rate_limiter", LoginRateLimiter(enabled=False))
+
+    async def seed():
+        await db.users.insert_one({
+            "email": "load@example.com", "password": auth_utils.hash_password("secret-password"),
+            "full_name": "Load Test", "phone": "0400000000", "member_id": "MV-0000001", "pin": "1234",
+            "created_at": datetime.utcnow()
+        })
+
+    asyncio.run(seed())
+    return server.app
+
+
+async def probe_latencies(client, logins: int) -> list:
+    """Latencies of GET /api/promotions while `logins` clients log in back to back"""
+    stop = asyncio.Event()
+
+    async def log_in_repeatedly():
+        while not stop.is_set():
+            response = await client.post("/api/auth/login", json={"email": "load@example.com", "password": "secret-password"})
+            assert response.status_code == 200
+            # The in-memory database never suspends, so yield as a real client round trip would
+            await asyncio.sleep(0)
+
+    loaders = [asyncio.ensure_future(log_in_repeatedly()) for _ in range(logins)]
+    await asyncio.sleep(0.5 if logins else 0)
+    latencies = []
+    deadline = time.perf_counter() + PROBE_SECONDS
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get("/api/promotions")
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+        await asyncio.sleep(0.005)
+    stop.set()
+    await asyncio.gather(*loaders)
+    return latencies
+
+
+def run(app, credentials) -> list:
+    async def measure():
+        async with app_client(app) as client:
+            return await probe_latencies(client, LOGIN_CONCURRENCY if credentials else 0)
+
+    if credentials is None:
+        return asyncio.run(measure())
+    original = server.credential_service
+    server.credential_service = credentials
+    try:
+        return asyncio.run(measure())
+    finally:
+        server.credential_service = original
+        credentials.shutdown()
+
+
+def test_non_auth_p99_stays_flat_while_logins_are_saturated(app):
+    idle = percentile(run(app, None), 99)
+    pooled = percentile(run(app, CredentialService(mode="thread", workers=4, queue_limit=LOGIN_CONCURRENCY)), 99)
+    inline = percentile(run(app, InlineCredentials()), 99)
+    report("GET /api/promotions p99", idle=ms(idle), logins_on_pool=ms(pooled), logins_inline=ms(inline))
+
+    assert pooled < max(3 * idle, idle + 0.05)
+    # Inline bcrypt holds the loop for a whole hash, so probes queue behind it
+    assert inline > 2 * pooled
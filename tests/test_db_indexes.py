@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import db_indexes
+from db_indexes import INDEXES, ensure_indexes, verify_index_usage
+from tests.benchmarks import mongo_database, requires_mongo
+
+
+def test_ensure_indexes_is_idempotent_and_creates_every_declared_index(db):
+    async def run():
+        await ensure_indexes(db)
+        await ensure_indexes(db)
+        return {collection: set(await db[collection].index_information()) for collection in INDEXES}
+
+    created = asyncio.run(run())
+    for collection, indexes in INDEXES.items():
+        assert {index.document["name"] for index in indexes} <= created[collection]
+
+
+def test_email_and_member_id_are_unique(db):
+    async def run():
+        await ensure_indexes(db)
+        await db.users.insert_one({"email": "a@example.com", "member_id": "MV-1"})
+        with pytest.raises(DuplicateKeyError):
+            await db.users.insert_one({"email": "a@example.com", "member_id": "MV-2"})
+        with pytest.raises(DuplicateKeyError):
+            await db.users.insert_one({"email": "b@example.com", "member_id": "MV-1"})
+
+    asyncio.run(run())
+
+
+def test_every_query_shape_targets_a_declared_collection():
+    assert {collection for collection, _ in db_indexes.query_shapes()} <= set(INDEXES)
+
+
+def test_collscan_is_found_anywhere_in_the_plan():
+    indexed = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "user_id_id"}}
+    assert not db_indexes._has_collscan(indexed)
+    assert db_indexes._has_collscan({"stage": "SUBPLAN", "inputStage": {"stage": "OR", "inputStages": [
+        indexed, {"stage": "COLLSCAN"}
+    ]}})
+
+
+@requires_mongo
+def test_no_registered_query_shape_scans_a_collection():
+    async def run():
+        async with mongo_database("index_usage") as db:
+            await ensure_indexes(db)
+            await verify_index_usage(db)
+
+    asyncio.run(run())
+
+
+@requires_mongo
+def test_verification_fails_without_indexes():
+    async def run():
+        async with mongo_database("index_usage") as db:
+            # A missing collection explains as EOF rather than COLLSCAN
+            await db.users.insert_one({"email": "a@example.com"})
+            with pytest.raises(RuntimeError, match="users"):
+                await verify_index_usage(db)
+
+    asyncio.run(run())
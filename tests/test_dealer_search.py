@@ -0,0 +1,103 @@
+import asyncio
+
+import orjson
+
+import migrations
+import server
+from db_indexes import INDEXES
+from dealer_search import geo_point, nearby_pipeline
+from tests.benchmarks import mongo_database, requires_mongo
+
+# Sydney CBD and points roughly 6, 20 and 115 km away
+SYDNEY = (-33.8688, 151.2093)
+PLACES = {
+    "Mascot": (-33.9258, 151.1920),
+    "Parramatta": (-33.8150, 151.0011),
+    "Newcastle": (-32.9283, 151.7817),
+}
+
+
+def dealer(name, lat, lng, dealer_type="Service Center", services=("Servicing",), approved=True):
+    return {
+        "name": name, "address": f"1 {name} St", "phone": "0200000000", "email": f"{name.lower()}@example.com",
+        "dealer_type": dealer_type, "services_offered": list(services), "latitude": lat, "longitude": lng,
+        "is_approved": approved
+    }
+
+
+def test_geo_point_is_longitude_first_and_rejects_bad_coordinates():
+    assert geo_point(-33.87, 151.21) == {"type": "Point", "coordinates": [151.21, -33.87]}
+    assert geo_point("-33.87", "151.21") == {"type": "Point", "coordinates": [151.21, -33.87]}
+    assert geo_point(None, 151.21) is None
+    assert geo_point(95, 151.21) is None
+    assert geo_point("north", 151.21) is None
+
+
+def test_pipeline_filters_inside_geo_near_and_keeps_the_distance():
+    pipeline = nearby_pipeline(*SYDNEY, radius_km=25, limit=10, service="Tyres", dealer_type="Dealership",
+                               projection={"name": 1})
+    geo_near = pipeline[0]["$geoNear"]
+
+    assert geo_near["near"]["coordinates"] == [SYDNEY[1], SYDNEY[0]]
+    assert geo_near["maxDistance"] == 25000 and geo_near["distanceMultiplier"] == 0.001
+    assert geo_near["query"] == {"is_approved": True, "dealer_type": "Dealership", "services_offered": "Tyres"}
+    assert pipeline[1:] == [{"$limit": 10}, {"$project": {"name": 1, "distance_km": 1}}]
+
+
+def test_backfill_adds_locations_only_for_valid_coordinates(db):
+    async def run():
+        await db.dealers.insert_many([
+            dealer("Valid", -33.9, 151.2),
+            dealer("Invalid", 123.0, 151.2),
+            {**dealer("Missing", None, None)},
+        ])
+        await migrations.backfill_dealer_locations(db)
+        await migrations.backfill_dealer_locations(db)
+        return {d['name']: d.get('location') async for d in db.dealers.find()}
+
+    locations = asyncio.run(run())
+
+    assert locations == {"Valid": {"type": "Point", "coordinates": [151.2, -33.9]}, "Invalid": None, "Missing": None}
+
+
+def test_out_of_range_parameters_are_rejected(client):
+    assert client.get("/api/dealers/nearby", params={"lat": -95, "lng": 151}).status_code == 422
+    assert client.get("/api/dealers/nearby", params={"lat": -33, "lng": 151, "radius": 0}).status_code == 422
+    assert client.get("/api/dealers/nearby", params={"lat": -33, "lng": 151, "radius": 10000}).status_code == 422
+    assert client.get("/api/dealers/nearby", params={"lng": 151}).status_code == 422
+
+
+@requires_mongo
+def test_nearest_first_within_radius_with_filters(monkeypatch):
+    async def nearby(**params):
+        args = dict(lat=SYDNEY[0], lng=SYDNEY[1], radius=50, service=None, dealer_type=None, limit=20, fields=None)
+        response = await server.get_nearby_dealers(**{**args, **params})
+        return orjson.loads(response.body)
+
+    async def run():
+        async with mongo_database("dealer_search") as db:
+            monkeypatch.setattr(server, "db", db)
+            await db.dealers.create_indexes(INDEXES["dealers"])
+            await db.dealers.insert_many([
+                dealer("Parramatta", *PLACES["Parramatta"], dealer_type="Dealership", services=("Servicing", "Tyres")),
+                dealer("Mascot", *PLACES["Mascot"]),
+                dealer("Newcastle", *PLACES["Newcastle"]),
+                dealer("Unapproved", *SYDNEY, approved=False),
+            ])
+            await migrations.backfill_dealer_locations(db)
+            return (
+                await nearby(),
+                await nearby(radius=150),
+                await nearby(service="Tyres"),
+                await nearby(dealer_type="Service Center"),
+                await nearby(fields="name"),
+            )
+
+    within_50, within_150, tyres, service_centres, names_only = asyncio.run(run())
+
+    assert [d["name"] for d in within_50] == ["Mascot", "Parramatta"]
+    assert 5 < within_50[0]["distance_km"] < 8 and 18 < within_50[1]["distance_km"] < 24
+    assert [d["name"] for d in within_150] == ["Mascot", "Parramatta", "Newcastle"]
+    assert [d["name"] for d in tyres] == ["Parramatta"]
+    assert [d["name"] for d in service_centres] == ["Mascot"]
+    assert set(names_only[0]) == {"id", "name", "distance_km"}
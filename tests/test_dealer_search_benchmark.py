@@ -0,0 +1,76 @@
+"""Nearby dealer search over 50k dealers clustered around Australian cities"""
+import asyncio
+import os
+import random
+import time
+
+import pytest
+
+import migrations
+from db_indexes import INDEXES
+from dealer_search import nearby_pipeline
+from tests.benchmarks import mongo_database, ms, percentile, report, requires_mongo
+
+pytestmark = [pytest.mark.benchmark, requires_mongo]
+
+DEALERS = int(os.getenv("DEALER_BENCHMARK_DEALERS", 50000))
+RUNS = 20
+TARGET_SECONDS = 0.05
+
+CITIES = {
+    "Sydney": (-33.87, 151.21), "Melbourne": (-37.81, 144.96), "Brisbane": (-27.47, 153.03),
+    "Perth": (-31.95, 115.86), "Adelaide": (-34.93, 138.60), "Hobart": (-42.88, 147.33),
+}
+SERVICES = ["Servicing", "Tyres", "Brakes", "Auto Electrical", "Detailing", "Panel Beating"]
+DEALER_TYPES = ["Service Center", "Dealership", "Both"]
+
+SEARCHES = {
+    "10 km": dict(radius_km=10),
+    "25 km": dict(radius_km=25),
+    "100 km": dict(radius_km=100),
+    "25 km tyres": dict(radius_km=25, service="Tyres"),
+    "50 km dealerships with brakes": dict(radius_km=50, service="Brakes", dealer_type="Dealership"),
+}
+
+
+async def seed(db):
+    rng = random.Random(13)
+    cities = list(CITIES.values())
+    dealers = []
+    for i in range(DEALERS):
+        lat, lng = rng.choice(cities)
+        dealers.append({
+            "name": f"Dealer {i}", "address": f"{i} Main Rd", "phone": "0200000000", "email": f"d{i}@example.com",
+            "dealer_type": rng.choice(DEALER_TYPES), "services_offered": rng.sample(SERVICES, 2),
+            "latitude": lat + rng.gauss(0, 0.3), "longitude": lng + rng.gauss(0, 0.3),
+            "is_approved": rng.random() < 0.9
+        })
+    await db.dealers.insert_many(dealers)
+    await db.dealers.create_indexes(INDEXES["dealers"])
+
+
+def test_nearby_search_over_50k_dealers():
+    async def run():
+        async with mongo_database("dealer_benchmark") as db:
+            await seed(db)
+            started = time.perf_counter()
+            await migrations.backfill_dealer_locations(db)
+            backfill = time.perf_counter() - started
+
+            results = {}
+            for name, params in SEARCHES.items():
+                timings = []
+                for i in range(RUNS):
+                    lat, lng = list(CITIES.values())[i % len(CITIES)]
+                    started = time.perf_counter()
+                    dealers = await db.dealers.aggregate(nearby_pipeline(lat, lng, limit=20, **params)).to_list(20)
+                    timings.append(time.perf_counter() - started)
+                    distances = [d['distance_km'] for d in dealers]
+                    assert distances == sorted(distances) and all(d <= params['radius_km'] for d in distances)
+                results[name] = timings
+            return backfill, results
+
+    backfill, results = asyncio.run(run())
+    report(f"nearby dealers over {DEALERS} dealers, p50/p95", backfill=ms(backfill),
+           **{name: f"{ms(percentile(t, 50))}/{ms(percentile(t, 95))}" for name, t in results.items()})
+    assert all(percentile(t, 95) < TARGET_SECONDS for t in results.values())
@@ -0,0 +1,140 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import Response
+
+import server
+from enrichment import attach, attach_names
+from pagination import PageParams
+from tests.benchmarks import best_of_async, mongo_database, ms, report, requires_mongo
+
+PENDING_TRANSFERS = int(os.getenv("TRANSFER_BENCHMARK_TRANSFERS", 500))
+PROJECTION = {"year": 1, "make": 1, "model": 1, "rego": 1}
+
+
+def transfer(user_id, vehicle_id, i):
+    return {
+        "vehicle_id": vehicle_id, "from_user_id": user_id, "new_owner_member_number": f"M{i:06}",
+        "new_owner_name": f"Buyer {i}", "new_owner_email": f"buyer{i}@example.com", "status": "pending",
+        "created_at": datetime(2024, 1, 1) + timedelta(minutes=i)
+    }
+
+
+class CountingDb:
+    """Database wrapper that records every find issued through db[collection]"""
+
+    def __init__(self, db):
+        self.db = db
+        self.finds = []
+
+    def __getitem__(self, name):
+        collection = self.db[name]
+        finds = self.finds
+
+        class Counting:
+            def find(self, *args, **kwargs):
+                finds.append(name)
+                return collection.find(*args, **kwargs)
+
+        return Counting()
+
+
+def test_attach_loads_every_reference_in_one_query(db):
+    async def run():
+        ids = (await db.vehicles.insert_many([{"rego": f"ENR{i}"} for i in range(3)])).inserted_ids
+        docs = [{"vehicle_id": str(ids[0])}, {"vehicle_id": str(ids[1])}, {"vehicle_id": str(ids[0])},
+                {"vehicle_id": str(ObjectId())}, {"vehicle_id": "not-an-id"}, {}]
+        counting = CountingDb(db)
+        await attach(counting, docs, "vehicle_id", "vehicles", "vehicle", projection={"rego": 1})
+        return docs, counting.finds
+
+    docs, finds = asyncio.run(run())
+
+    assert finds == ["vehicles"]
+    assert [d["vehicle"]["rego"] if d["vehicle"] else None for d in docs] == ["ENR0", "ENR1", "ENR0", None, None, None]
+    assert set(docs[0]["vehicle"]) == {"_id", "rego"}
+
+
+def test_attach_names_sets_the_name_or_none(db):
+    async def run():
+        dealer_id = (await db.dealers.insert_one({"name": "City Motors", "phone": "0200000000"})).inserted_id
+        bookings = [{"dealer_id": str(dealer_id)}, {"dealer_id": str(ObjectId())}]
+        await attach_names(db, bookings, "dealer_id", "dealers", "dealer_name")
+        return bookings
+
+    bookings = asyncio.run(run())
+
+    assert [b["dealer_name"] for b in bookings] == ["City Motors", None]
+
+
+def test_attach_skips_the_query_when_nothing_is_referenced(db):
+    counting = CountingDb(db)
+
+    assert asyncio.run(attach(counting, [{"vehicle_id": None}], "vehicle_id", "vehicles", "vehicle")) == {}
+    assert counting.finds == []
+
+
+def test_pending_transfers_carry_their_vehicle(client, register, db):
+    headers = register()
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    vehicle_id = client.post("/api/vehicles", headers=headers, json={
+        "rego": "XFER02", "vin": "VIN-XFER02", "make": "Honda", "model": "Jazz", "year": 2015
+    }).json()["id"]
+    asyncio.run(db.transfers.insert_many([
+        transfer(user_id, vehicle_id, 0),
+        # The vehicle has since been deleted, so the transfer is left out
+        transfer(user_id, str(ObjectId()), 1),
+    ]))
+
+    body = client.get("/api/transfers/pending", headers=headers).json()["data"]
+
+    assert [t["vehicle"] for t in body["transfers"]] == [
+        {"id": vehicle_id, "year": 2015, "make": "Honda", "model": "Jazz", "rego": "XFER02"}
+    ]
+
+
+@pytest.mark.benchmark
+@requires_mongo
+def test_batched_enrichment_against_a_query_per_transfer(monkeypatch):
+    async def per_transfer(db, transfers):
+        # What get_pending_transfers did before: one find_one per transfer
+        for t in transfers:
+            t["vehicle"] = await db.vehicles.find_one({"_id": ObjectId(t["vehicle_id"])}, PROJECTION)
+
+    async def run():
+        async with mongo_database("enrichment_benchmark") as db:
+            monkeypatch.setattr(server, "db", db)
+            vehicle_ids = (await db.vehicles.insert_many([
+                {"user_id": "seller", "rego": f"XF{i:04}", "make": "Honda", "model": "Jazz", "year": 2015}
+                for i in range(PENDING_TRANSFERS)
+            ])).inserted_ids
+            await db.transfers.insert_many([transfer("seller", str(v), i) for i, v in enumerate(vehicle_ids)])
+            transfers = await db.transfers.find({"from_user_id": "seller", "status": "pending"}).to_list(None)
+
+            async def walk_endpoint():
+                cursor, count = None, 0
+                while True:
+                    body = await server.get_pending_transfers(
+                        Response(), PageParams(cursor=cursor, limit=100, sort=None), {"user_id": "seller"}
+                    )
+                    count += len(body["data"]["transfers"])
+                    cursor = body["data"]["next_cursor"]
+                    if not cursor:
+                        return count
+
+            assert await walk_endpoint() == PENDING_TRANSFERS
+            return (
+                await best_of_async(lambda: per_transfer(db, transfers)),
+                await best_of_async(lambda: attach(db, transfers, "vehicle_id", "vehicles", "vehicle", PROJECTION)),
+                await best_of_async(walk_endpoint),
+            )
+
+    n_plus_one, batched, endpoint = asyncio.run(run())
+    report(f"enriching {PENDING_TRANSFERS} pending transfers",
+           find_one_per_transfer=f"{PENDING_TRANSFERS} queries in {ms(n_plus_one)}",
+           batched_in=f"1 query in {ms(batched)}",
+           endpoint_all_pages=ms(endpoint))
+    assert batched * 5 < n_plus_one
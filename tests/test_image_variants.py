@@ -0,0 +1,91 @@
+import asyncio
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+import image_pipeline
+import server
+from blob_store import blob_store
+from image_pipeline import VariantService
+
+
+@pytest.fixture
+def variants(monkeypatch):
+    service = VariantService()
+    monkeypatch.setattr(server, "variant_service", service)
+    yield service
+    image_pipeline.shutdown_image_pool()
+
+
+def jpeg_bytes(size=(2000, 1000)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def store(db, data, content_type="image/jpeg"):
+    return asyncio.run(blob_store.put(db, data, content_type, public=True))
+
+
+def test_vehicle_list_links_the_medium_variant(client, register, variants):
+    headers = register()
+    image = base64.b64encode(jpeg_bytes()).decode()
+    client.post("/api/vehicles", headers=headers, json={
+        "rego": "IMG01", "vin": "VIN-IMG01", "make": "Kia", "model": "Rio", "year": 2018, "image": image
+    })
+
+    url = client.get("/api/vehicles", headers=headers).json()[0]["image"]
+    first = client.get(url)
+    second = client.get(url)
+
+    assert url.endswith("/medium")
+    assert first.status_code == 200 and first.headers["Content-Type"] == "image/jpeg"
+    with Image.open(io.BytesIO(first.content)) as img:
+        assert img.size == (1024, 512)
+    assert second.content == first.content
+    assert (variants.misses, variants.hits) == (1, 1)
+
+
+def test_concurrent_requests_share_one_render(db, variants):
+    blob_hash = store(db, jpeg_bytes())
+
+    async def run():
+        return await asyncio.gather(*[variants.get_variant(db, blob_hash, "thumbnail") for _ in range(5)])
+
+    results = asyncio.run(run())
+
+    assert len(set(results)) == 1
+    assert (variants.misses, variants.coalesced) == (1, 4)
+    assert asyncio.run(db.blob_variants.count_documents({})) == 1
+
+
+def test_stored_variants_are_reused_by_other_workers(db, variants):
+    blob_hash = store(db, jpeg_bytes())
+    rendered = asyncio.run(variants.get_variant(db, blob_hash, "thumbnail"))
+
+    other_worker = VariantService()
+
+    assert asyncio.run(other_worker.get_variant(db, blob_hash, "thumbnail")) == rendered
+    assert (other_worker.hits, other_worker.misses) == (1, 0)
+
+
+def test_undecodable_image_serves_the_original_and_is_not_rendered_again(client, db, variants):
+    blob_hash = store(db, b"\xff\xd8not really a jpeg")
+
+    first = client.get(f"/api/blobs/{blob_hash}/thumbnail")
+    second = client.get(f"/api/blobs/{blob_hash}/medium")
+    again = client.get(f"/api/blobs/{blob_hash}/thumbnail")
+
+    assert first.status_code == second.status_code == again.status_code == 200
+    assert again.content == b"\xff\xd8not really a jpeg"
+    assert variants.failures == 2
+    failed = asyncio.run(db.blob_variants.find_one({"_id": f"{blob_hash}:thumbnail"}))
+    assert failed["blob_hash"] is None and failed["error"]
+
+
+def test_unknown_variant_is_404(client, db, variants):
+    blob_hash = store(db, jpeg_bytes())
+
+    assert client.get(f"/api/blobs/{blob_hash}/huge").status_code == 404
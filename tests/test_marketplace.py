@@ -0,0 +1,158 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from marketplace_search import FacetCache, ListingFilters
+from pagination import NEXT_CURSOR_HEADER
+
+CARS = [("Toyota", "Camry"), ("Toyota", "Corolla"), ("Mazda", "CX-5"), ("Ford", "Ranger")]
+
+
+def listing(i, **overrides):
+    make, model = CARS[i % len(CARS)]
+    return {
+        "user_id": "seller", "vehicle_id": f"v{i}", "title": f"{make} {model}", "make": make, "model": model,
+        "year": 2005 + i % 20, "price": 4000.0 + 1000 * i, "condition": "Good", "description": "Well kept",
+        "images": [], "contact_name": "Seller", "contact_phone": "0400000000", "status": "Active",
+        "listed_date": datetime(2024, 1, 1) + timedelta(hours=i), **overrides
+    }
+
+
+def seed(db, listings):
+    asyncio.run(db.marketplace_listings.insert_many(listings))
+
+
+def search(client, **params):
+    response = client.get("/api/marketplace-listings", params=params)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_filters_combine(client, db):
+    seed(db, [listing(i) for i in range(40)] + [listing(40, status="Sold")])
+
+    rows = search(client, make="Toyota", model="Camry", year_min=2010, price_max=30000).json()
+
+    assert rows and all(r["make"] == "Toyota" and r["model"] == "Camry" for r in rows)
+    assert all(r["year"] >= 2010 and r["price"] <= 30000 for r in rows)
+    assert len(rows) == len([i for i in range(40) if i % 4 == 0 and 2005 + i % 20 >= 2010 and 4000 + 1000 * i <= 30000])
+    assert all(r["status"] == "Active" for r in search(client).json())
+    assert [r["vehicle_id"] for r in search(client, status="Sold").json()] == ["v40"]
+
+
+def test_sorted_pages_follow_the_cursor(client, db):
+    seed(db, [listing(i, price=float(1000 * (i % 7))) for i in range(25)])
+
+    seen, cursor = [], None
+    while True:
+        params = {"sort": "-price", "limit": 10, **({"cursor": cursor} if cursor else {})}
+        response = search(client, **params)
+        seen += response.json()
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+
+    prices = [r["price"] for r in seen]
+    assert len({r["id"] for r in seen}) == 25
+    assert prices == sorted(prices, reverse=True)
+
+
+def test_unindexed_sort_is_rejected(client):
+    assert client.get("/api/marketplace-listings", params={"sort": "odometer"}).status_code == 400
+
+
+def test_listing_created_from_a_vehicle_is_searchable(client, register):
+    headers = register()
+    vehicle_id = client.post("/api/vehicles", headers=headers, json={
+        "rego": "SELL01", "vin": "VIN-SELL01", "make": "Subaru", "model": "Outback", "year": 2019
+    }).json()["id"]
+
+    created = client.post("/api/marketplace-listings", headers=headers, json={
+        "vehicle_id": vehicle_id, "price": 25000, "condition": "Excellent", "description": "One owner",
+        "contact_name": "Seller", "contact_phone": "0400000000"
+    })
+    rows = search(client, make="Subaru").json()
+
+    assert created.status_code == 200
+    assert [(r["id"], r["model"], r["year"], r["title"]) for r in rows] == [
+        (created.json()["listing_id"], "Outback", 2019, "Subaru Outback 2019")
+    ]
+
+
+def test_listing_of_someone_elses_vehicle_is_refused(client, register):
+    owner, other = register(), register()
+    vehicle_id = client.post("/api/vehicles", headers=owner, json={
+        "rego": "SELL02", "vin": "VIN-SELL02", "make": "Subaru", "model": "Outback", "year": 2019
+    }).json()["id"]
+
+    response = client.post("/api/marketplace-listings", headers=other, json={
+        "vehicle_id": vehicle_id, "price": 1, "condition": "Good", "description": "x",
+        "contact_name": "x", "contact_phone": "x"
+    })
+
+    assert response.status_code == 404
+
+
+def test_query_puts_equality_fields_before_ranges_and_text():
+    query = ListingFilters(q="sunroof", make="Toyota", model="Camry", year_min=2015, year_max=None,
+                           price_min=None, price_max=30000).query()
+
+    assert list(query) == ["status", "make", "model", "year", "price", "$text"]
+    assert query["year"] == {"$gte": 2015} and query["price"] == {"$lte": 30000}
+    assert query["$text"] == {"$search": "sunroof"}
+
+
+def facets(client, **params):
+    response = client.get("/api/marketplace-listings/facets", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.fixture
+def facet_cache(monkeypatch):
+    cache = FacetCache()
+    monkeypatch.setattr(server, "facet_cache", cache)
+    return cache
+
+
+def test_facets_count_the_active_filters(client, db, facet_cache):
+    seed(db, [listing(i) for i in range(8)] + [listing(8, status="Sold")])
+
+    body = facets(client)
+    toyota = facets(client, make="Toyota")
+
+    assert body["make"] == [{"value": "Toyota", "count": 4}, {"value": "Ford", "count": 2}, {"value": "Mazda", "count": 2}]
+    assert {"make": "Toyota", "value": "Camry", "count": 2} in body["model"]
+    assert sum(band["count"] for band in body["price"]) == 8
+    assert {"min": 0, "max": 5000, "count": 1} in body["price"]
+    assert {"min": 2005, "max": 2010, "count": 5} in body["year"]
+    assert [m["value"] for m in toyota["make"]] == ["Toyota"]
+    assert {m["value"] for m in toyota["model"]} == {"Camry", "Corolla"}
+
+
+def test_facets_are_cached_per_filter_set_until_a_listing_is_created(client, db, register, facet_cache):
+    cache = facet_cache
+    seed(db, [listing(i) for i in range(4)])
+
+    facets(client, make="Toyota")
+    facets(client, make="Toyota")
+    facets(client, make="Mazda")
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # A write elsewhere is not seen until the cache expires or a listing is created through the API
+    seed(db, [listing(4)])
+    assert facets(client, make="Toyota")["make"] == [{"value": "Toyota", "count": 2}]
+
+    headers = register()
+    vehicle_id = client.post("/api/vehicles", headers=headers, json={
+        "rego": "SELL03", "vin": "VIN-SELL03", "make": "Toyota", "model": "Yaris", "year": 2020
+    }).json()["id"]
+    client.post("/api/marketplace-listings", headers=headers, json={
+        "vehicle_id": vehicle_id, "price": 15000, "condition": "Good", "description": "City car",
+        "contact_name": "Seller", "contact_phone": "0400000000"
+    })
+
+    assert facets(client, make="Toyota")["make"] == [{"value": "Toyota", "count": 4}]
+    assert cache.misses == 3
@@ -0,0 +1,135 @@
+"""Filtered marketplace searches and facet counts over a seeded listings collection, through the endpoints' code paths"""
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from db_indexes import INDEXES
+from marketplace_search import LISTING_SORTS, FacetCache, ListingFilters
+from pagination import PageParams, paginate
+from tests.benchmarks import mongo_database, ms, percentile, report, requires_mongo
+
+pytestmark = [pytest.mark.benchmark, requires_mongo]
+
+LISTINGS = int(os.getenv("MARKETPLACE_BENCHMARK_LISTINGS", 1_000_000))
+RUNS = 20
+TARGET_SECONDS = 0.05
+
+MAKES = {
+    "Toyota": ["Camry", "Corolla", "RAV4", "HiLux", "LandCruiser"],
+    "Mazda": ["3", "CX-5", "CX-9", "BT-50"],
+    "Ford": ["Ranger", "Everest", "Focus", "Mustang"],
+    "Hyundai": ["i30", "Tucson", "Santa Fe"],
+    "Kia": ["Rio", "Cerato", "Sportage", "Sorento"],
+    "Subaru": ["Outback", "Forester", "Impreza", "WRX"],
+    "Mitsubishi": ["Triton", "Outlander", "ASX"],
+    "Volkswagen": ["Golf", "Polo", "Amarok", "Tiguan"],
+}
+WORDS = ["tidy", "serviced", "towbar", "sunroof", "leather", "logbook", "rego", "tyres", "bullbar", "canopy"]
+
+# Search shapes the app sends
+SEARCHES = {
+    "make+model": (dict(make="Toyota", model="Camry"), None),
+    "make+price sorted by price": (dict(make="Mazda", price_min=10000, price_max=30000), "price"),
+    "year range newest first": (dict(year_min=2018, year_max=2022), "-listed_date"),
+    "price range sorted by price": (dict(price_min=15000, price_max=20000), "price"),
+    "make+model+year+price": (dict(make="Ford", model="Ranger", year_min=2015, price_max=40000), "-year"),
+    "text search": (dict(q="sunroof towbar", make="Subaru"), None),
+}
+
+
+async def seed(db):
+    rng = random.Random(42)
+    makes = list(MAKES)
+    started = datetime(2023, 1, 1)
+    batch = []
+    for i in range(LISTINGS):
+        make = rng.choice(makes)
+        model = rng.choice(MAKES[make])
+        batch.append({
+            "user_id": f"user{i % 50000}", "vehicle_id": f"v{i}", "title": f"{make} {model}",
+            "description": " ".join(rng.sample(WORDS, 3)), "make": make, "model": model,
+            "year": rng.randint(2000, 2024), "price": float(rng.randrange(2000, 120000, 500)),
+            "condition": "Good", "images": [], "contact_name": "Seller", "contact_phone": "0400000000",
+            "status": "Active" if rng.random() < 0.8 else "Sold", "listed_date": started + timedelta(seconds=i * 30)
+        })
+        if len(batch) == 10000:
+            await db.marketplace_listings.insert_many(batch)
+            batch = []
+    if batch:
+        await db.marketplace_listings.insert_many(batch)
+    await db.marketplace_listings.create_indexes(INDEXES["marketplace_listings"])
+
+
+def listing_filters(**filters) -> ListingFilters:
+    # Called outside FastAPI, so every parameter needs a plain value instead of its Query() default
+    params = dict(q=None, make=None, model=None, year_min=None, year_max=None, price_min=None, price_max=None)
+    return ListingFilters(**{**params, **filters})
+
+
+async def search_timings(db, filters: dict, sort) -> list:
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        rows, cursor = await paginate(db.marketplace_listings, listing_filters(**filters).query(),
+                                      PageParams(cursor=None, limit=20, sort=sort), allowed_sorts=LISTING_SORTS)
+        if cursor:
+            await paginate(db.marketplace_listings, listing_filters(**filters).query(),
+                           PageParams(cursor=cursor, limit=20, sort=sort), allowed_sorts=LISTING_SORTS)
+        timings.append((time.perf_counter() - started) / (2 if cursor else 1))
+        assert rows
+    return timings
+
+
+@pytest.fixture(scope="module")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="module")
+def listings(loop):
+    """Seeded once for every benchmark in this module"""
+    database = mongo_database("marketplace_benchmark")
+    db = loop.run_until_complete(database.__aenter__())
+    loop.run_until_complete(seed(db))
+    yield db
+    loop.run_until_complete(database.__aexit__(None, None, None))
+
+
+def test_filtered_searches_stay_under_50ms(loop, listings):
+    async def run():
+        return {name: await search_timings(listings, filters, sort) for name, (filters, sort) in SEARCHES.items()}
+
+    results = loop.run_until_complete(run())
+    report(f"marketplace search over {LISTINGS} listings, p50/p95 per page",
+           **{name: f"{ms(percentile(t, 50))}/{ms(percentile(t, 95))}" for name, t in results.items()})
+    slow = {name: percentile(t, 95) for name, t in results.items() if percentile(t, 95) >= TARGET_SECONDS}
+    assert not slow
+
+
+def test_facet_latency(loop, listings):
+    async def run():
+        results = {}
+        # The filter screen first opens with no filters, the widest aggregation
+        for name, (filters, _) in {"no filters": ({}, None), **SEARCHES}.items():
+            cache = FacetCache()
+            miss = []
+            for _ in range(5):
+                cache.invalidate()
+                started = time.perf_counter()
+                await cache.get(listings, listing_filters(**filters))
+                miss.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            await cache.get(listings, listing_filters(**filters))
+            results[name] = (min(miss), time.perf_counter() - started)
+        return results
+
+    results = loop.run_until_complete(run())
+    report(f"marketplace facets over {LISTINGS} listings, aggregation/cached",
+           **{name: f"{ms(miss)}/{ms(hit)}" for name, (miss, hit) in results.items()})
+    assert all(hit < 0.001 for _, hit in results.values())
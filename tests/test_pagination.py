@@ -0,0 +1,181 @@
+import asyncio
+
+from pagination import NEXT_CURSOR_HEADER
+
+
+def add_vehicles(client, headers, count):
+    ids = []
+    for i in range(count):
+        response = client.post("/api/vehicles", headers=headers, json={
+            "rego": f"REG{i:03d}", "vin": f"VIN{i:03d}", "make": "Toyota", "model": f"Model {i}", "year": 2020
+        })
+        assert response.status_code == 200, response.text
+        ids.append(response.json()["id"])
+    return ids
+
+
+def walk(client, headers, **params):
+    """Follow X-Next-Cursor until the last page; returns the pages' ids"""
+    pages = []
+    while True:
+        response = client.get("/api/vehicles", headers=headers, params=params)
+        assert response.status_code == 200, response.text
+        pages.append([v["id"] for v in response.json()])
+        params["cursor"] = response.headers.get(NEXT_CURSOR_HEADER)
+        if params["cursor"] is None:
+            return pages
+
+
+def test_keyset_paging_crosses_page_boundaries(client, register):
+    headers = register()
+    ids = add_vehicles(client, headers, 5)
+
+    pages = walk(client, headers, limit=2)
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [i for page in pages for i in page] == ids
+
+
+def test_keyset_paging_descending_sort(client, register):
+    headers = register()
+    ids = add_vehicles(client, headers, 5)
+
+    pages = walk(client, headers, limit=2, sort="-created_at")
+
+    assert [i for page in pages for i in page] == ids[::-1]
+
+
+def test_exact_page_has_no_next_cursor(client, register):
+    headers = register()
+    add_vehicles(client, headers, 2)
+
+    response = client.get("/api/vehicles?limit=2", headers=headers)
+
+    assert len(response.json()) == 2
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_cursor_from_another_sort_is_rejected(client, register):
+    headers = register()
+    add_vehicles(client, headers, 3)
+    cursor = client.get("/api/vehicles?limit=1", headers=headers).headers[NEXT_CURSOR_HEADER]
+
+    response = client.get("/api/vehicles", headers=headers, params={"limit": 1, "sort": "-created_at", "cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cursor does not match the requested sort"
+
+
+def test_invalid_cursor_and_sort_are_rejected(client, register):
+    headers = register()
+
+    assert client.get("/api/vehicles?cursor=not-a-cursor", headers=headers).status_code == 400
+    assert client.get("/api/vehicles?sort=vin", headers=headers).status_code == 400
+
+
+def test_users_only_page_through_their_own_vehicles(client, register):
+    first, second = register(), register()
+    ids = add_vehicles(client, first, 3)
+    add_vehicles(client, second, 3)
+
+    pages = walk(client, first, limit=2)
+
+    assert [i for page in pages for i in page] == ids
+
+
+def test_fields_projection(client, register):
+    headers = register()
+    add_vehicles(client, headers, 1)
+
+    response = client.get("/api/vehicles?fields=make,model", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json() == [{"id": response.json()[0]["id"], "make": "Toyota", "model": "Model 0"}]
+
+
+def test_unknown_field_is_rejected(client, register):
+    headers = register()
+
+    response = client.get("/api/vehicles?fields=make,secret", headers=headers)
+
+    assert response.status_code == 400
+
+
+def test_if_none_match_returns_304_until_the_list_changes(client, register):
+    headers = register()
+    add_vehicles(client, headers, 1)
+    first = client.get("/api/vehicles", headers=headers)
+    etag = first.headers["ETag"]
+
+    cached = client.get("/api/vehicles", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+    add_vehicles(client, headers, 1)
+    changed = client.get("/api/vehicles", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()) == 2
+
+
+def test_etag_depends_on_the_query(client, register):
+    headers = register()
+    add_vehicles(client, headers, 3)
+
+    full = client.get("/api/vehicles", headers=headers).headers["ETag"]
+    page = client.get("/api/vehicles?limit=1", headers=headers).headers["ETag"]
+
+    assert full != page
+
+
+
+def test_enveloped_lists_send_the_cursor_header_too(client, register, db):
+    headers = register()
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    asyncio.run(db.vehicles.insert_many([
+        {"user_id": user_id, "status": "quarantined", "make": "Holden", "model": "Astra", "year": 2010, "rego": f"Q{i}"}
+        for i in range(3)
+    ]))
+
+    first = client.get("/api/transfers/quarantined?limit=2", headers=headers)
+    cursor = first.headers[NEXT_CURSOR_HEADER]
+    assert cursor == first.json()["data"]["next_cursor"]
+    last = client.get("/api/transfers/quarantined", headers=headers, params={"limit": 2, "cursor": cursor})
+
+    assert len(first.json()["data"]["vehicles"]) == 2
+    assert len(last.json()["data"]["vehicles"]) == 1
+    assert NEXT_CURSOR_HEADER not in last.headers
+
+
+def test_304_repeats_the_vary_of_the_full_response(client, register):
+    headers = register()
+    add_vehicles(client, headers, 1)
+    full = client.get("/api/vehicles", headers=headers)
+
+    cached = client.get("/api/vehicles", headers={**headers, "If-None-Match": full.headers["ETag"]})
+
+    assert "accept-encoding" in full.headers["Vary"].lower()
+    assert cached.status_code == 304
+    assert cached.headers["Vary"] == full.headers["Vary"]
+
+
+def test_body_etag_304_repeats_the_vary_too(client):
+    full = client.get("/api/dealers")
+
+    cached = client.get("/api/dealers", headers={"If-None-Match": full.headers["ETag"]})
+
+    assert cached.status_code == 304
+    assert "accept-encoding" in cached.headers["Vary"].lower()
+
+
+def test_invalid_parameters_are_rejected_before_etag_matching(client, register):
+    headers = register()
+    add_vehicles(client, headers, 1)
+    conditional = {**headers, "If-None-Match": "*"}
+
+    assert client.get("/api/vehicles?fields=secret", headers=conditional).status_code == 400
+    assert client.get("/api/vehicles?sort=vin", headers=conditional).status_code == 400
+    assert client.get("/api/vehicles?cursor=bad", headers=conditional).status_code == 400
+    assert client.get("/api/finance-products?fields=secret", headers=conditional).status_code == 400
+    assert client.get("/api/vehicles", headers=conditional).status_code == 304
@@ -0,0 +1,77 @@
+"""
+Per-page cost of keyset pagination at depth, measured with explain() on a real MongoDB.
+
+Runs only when PAGINATION_BENCHMARK_MONGO_URL points at a disposable server, e.g.
+PAGINATION_BENCHMARK_MONGO_URL=mongodb://localhost:27017 pytest tests/test_pagination_benchmark.py
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+
+from db_indexes import INDEXES
+from pagination import decode_cursor, encode_cursor, keyset_filter, parse_sort
+
+BENCHMARK_MONGO_URL = os.getenv("PAGINATION_BENCHMARK_MONGO_URL")
+BENCHMARK_DOCS = int(os.getenv("PAGINATION_BENCHMARK_DOCS", 100000))
+PAGE_SIZE = 100
+
+pytestmark = pytest.mark.skipif(not BENCHMARK_MONGO_URL, reason="PAGINATION_BENCHMARK_MONGO_URL is not set")
+
+
+@pytest.fixture(scope="module")
+def vehicles():
+    client = MongoClient(BENCHMARK_MONGO_URL)
+    db = client[f"pagination_benchmark_{os.getpid()}"]
+    db.vehicles.create_indexes(INDEXES["vehicles"])
+    started = datetime(2024, 1, 1)
+    batch = []
+    for i in range(BENCHMARK_DOCS):
+        batch.append({"_id": ObjectId(), "user_id": "bench", "rego": f"R{i}", "created_at": started + timedelta(seconds=i // 3)})
+        if len(batch) == 10000:
+            db.vehicles.insert_many(batch)
+            batch = []
+    if batch:
+        db.vehicles.insert_many(batch)
+    yield db.vehicles
+    client.drop_database(db.name)
+    client.close()
+
+
+def page_query(collection, sort, depth):
+    """The query paginate() runs for the page starting after the depth-th document"""
+    field, direction = parse_sort(sort, ["created_at"])
+    sort_spec = [(field, direction)] if field == "_id" else [(field, direction), ("_id", direction)]
+    query = {"user_id": "bench"}
+    if depth:
+        anchor = collection.find(query).sort(sort_spec).skip(depth - 1).limit(1).next()
+        position = decode_cursor(encode_cursor(field, anchor), field)
+        query = {"$and": [query, keyset_filter(field, direction, position)]}
+    return collection.find(query).sort(sort_spec).limit(PAGE_SIZE + 1)
+
+
+@pytest.mark.parametrize("sort", [None, "created_at", "-created_at"])
+def test_deep_pages_examine_as_many_documents_as_the_first(vehicles, sort):
+    for depth in (0, BENCHMARK_DOCS // 2, BENCHMARK_DOCS - PAGE_SIZE):
+        stats = page_query(vehicles, sort, depth).explain()["executionStats"]
+        assert stats["nReturned"] == PAGE_SIZE + 1 or depth == BENCHMARK_DOCS - PAGE_SIZE
+        assert stats["totalDocsExamined"] <= PAGE_SIZE + 1
+        # The $or keyset filter on a non-unique field reads at most one extra index run per branch
+        assert stats["totalKeysExamined"] <= 2 * (PAGE_SIZE + 2)
+
+
+def test_deep_page_latency_matches_the_first(vehicles):
+    def timed(depth):
+        cursor_query = page_query(vehicles, "-created_at", depth)
+        started = time.perf_counter()
+        list(cursor_query)
+        return time.perf_counter() - started
+
+    # Best of several runs, so a cold cache or a scheduler hiccup does not decide the result
+    first = min(timed(0) for _ in range(5))
+    deep = min(timed(BENCHMARK_DOCS - 2 * PAGE_SIZE) for _ in range(5))
+    print(f"\nfirst page {first * 1000:.2f} ms, page at depth {BENCHMARK_DOCS - 2 * PAGE_SIZE}: {deep * 1000:.2f} ms")
+    assert deep < max(5 * first, 0.05)
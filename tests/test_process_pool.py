@@ -0,0 +1,47 @@
+import asyncio
+import io
+
+from PIL import Image
+
+import image_pipeline
+from credential_service import CredentialService
+from process_pool import new_process_pool
+
+
+def test_pools_do_not_fork_the_threaded_worker():
+    pool = new_process_pool(1)
+    try:
+        assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+    finally:
+        pool.shutdown()
+
+
+def test_image_work_runs_in_the_pool():
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 400), "green").save(buffer, "JPEG")
+
+    async def render():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(image_pipeline.get_image_pool(), image_pipeline.render_variant, buffer.getvalue(), 100, 70)
+
+    try:
+        rendered = asyncio.run(render())
+    finally:
+        image_pipeline.shutdown_image_pool()
+
+    with Image.open(io.BytesIO(rendered)) as img:
+        assert img.size == (100, 50)
+
+
+def test_process_mode_credentials_round_trip():
+    service = CredentialService(mode="process", workers=1)
+    service.start()
+
+    async def round_trip():
+        hashed = await service.hash_password("secret")
+        return await service.verify_password("secret", hashed), await service.verify_password("wrong", hashed)
+
+    try:
+        assert asyncio.run(round_trip()) == (True, False)
+    finally:
+        service.shutdown()
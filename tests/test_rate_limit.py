@@ -0,0 +1,133 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import rate_limit
+from rate_limit import LoginRateLimiter, SharedWindow, SlidingWindow, client_ip
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    monkeypatch.setattr(rate_limit.time, "time", clock)
+    return clock
+
+
+def fake_request(host="10.0.0.1", forwarded=None):
+    headers = {"x-forwarded-for": forwarded} if forwarded else {}
+    return SimpleNamespace(headers=headers, client=SimpleNamespace(host=host))
+
+
+def test_sliding_window_limits_and_recovers(clock):
+    window = SlidingWindow(limit=2, window=60)
+
+    assert window.hit("k") == 0
+    clock.now += 10
+    assert window.hit("k") == 0
+    assert window.hit("k") == pytest.approx(50)
+    assert window.retry_after("k") == pytest.approx(50)
+
+    clock.now += 50
+    assert window.retry_after("k") == 0
+    assert window.hit("k") == 0
+
+
+def test_sliding_window_reset(clock):
+    window = SlidingWindow(limit=1, window=60)
+    window.hit("k")
+
+    window.reset("k")
+
+    assert window.hit("k") == 0
+
+
+def test_client_ip_ignores_forwarded_for_without_trusted_proxies():
+    request = fake_request(forwarded="1.2.3.4")
+
+    assert client_ip(request) == "10.0.0.1"
+    assert client_ip(request, trusted_proxies=1) == "1.2.3.4"
+
+
+def test_client_ip_skips_client_supplied_hops():
+    request = fake_request(forwarded="6.6.6.6, 1.2.3.4, 172.16.0.1")
+
+    assert client_ip(request, trusted_proxies=2) == "1.2.3.4"
+
+
+def test_limiter_rejects_an_email_over_its_limit(clock):
+    limiter = LoginRateLimiter(enabled=True, window=60, per_email=2, per_ip=100, backend="memory")
+    request = fake_request()
+
+    async def attempts():
+        await limiter.check(None, request, "a@example.com")
+        await limiter.check(None, request, "A@Example.com ")
+        with pytest.raises(HTTPException) as rejected:
+            await limiter.check(None, request, "a@example.com")
+        # Other accounts from the same address are unaffected
+        await limiter.check(None, request, "b@example.com")
+        return rejected.value
+
+    error = asyncio.run(attempts())
+    assert error.status_code == 429
+    assert error.headers["Retry-After"] == "60"
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_limiter_counts_only_failures_per_ip(clock):
+    limiter = LoginRateLimiter(enabled=True, window=60, per_email=100, per_ip=2, backend="memory")
+    request = fake_request()
+
+    async def attempts():
+        for i in range(5):
+            await limiter.check(None, request, f"user{i}@example.com")
+        await limiter.failed(None, request)
+        await limiter.failed(None, request)
+        with pytest.raises(HTTPException):
+            await limiter.check(None, request, "another@example.com")
+        await limiter.check(None, fake_request(host="10.0.0.2"), "another@example.com")
+
+    asyncio.run(attempts())
+
+
+def test_shared_window_counts_across_limiters(clock, db):
+    window = SharedWindow(limit=2, window=60)
+
+    async def attempts():
+        assert await window.hit(db, "k") == 0
+        assert await window.hit(db, "k") == 0
+        assert await SharedWindow(limit=2, window=60).hit(db, "k") > 0
+        assert await window.retry_after(db, "k") > 0
+        await window.reset(db, "k")
+        assert await window.retry_after(db, "k") == 0
+
+    asyncio.run(attempts())
+
+
+def test_login_endpoint_returns_429_and_success_clears_the_email(client, register, monkeypatch):
+    import server
+    monkeypatch.setattr(server, "login_rate_limiter", LoginRateLimiter(enabled=True, per_email=3, per_ip=100, backend="memory"))
+    register("driver@example.com", password="right-password")
+
+    def login(password):
+        return client.post("/api/auth/login", json={"email": "driver@example.com", "password": password})
+
+    assert login("wrong").status_code == 401
+    assert login("wrong").status_code == 401
+    assert login("right-password").status_code == 200
+    # The success cleared the earlier failures, so three more attempts are allowed
+    for _ in range(3):
+        assert login("wrong").status_code == 401
+    blocked = login("right-password")
+    assert blocked.status_code == 429
+    assert int(blocked.headers["Retry-After"]) > 0
@@ -0,0 +1,106 @@
+"""PIN brute force and credential stuffing against /api/auth/pin-login, counting the user lookups that reach the database"""
+import asyncio
+import time
+from datetime import datetime
+
+import httpx
+import pytest
+
+import server
+from rate_limit import LoginRateLimiter
+from tests.benchmarks import ms, report
+
+pytestmark = pytest.mark.benchmark
+
+ATTEMPTS = 2000
+CONCURRENCY = 50
+VICTIM = "victim@example.com"
+
+# Each attack as a list of (client ip, email) attempts
+ATTACKS = {
+    "pin brute force from one ip": [("203.0.113.7", VICTIM)] * ATTEMPTS,
+    "pin brute force from 200 ips": [(f"198.51.100.{i % 200}", VICTIM) for i in range(ATTEMPTS)],
+    "credential stuffing from one ip": [("203.0.113.9", f"user{i}@example.com") for i in range(ATTEMPTS)],
+}
+
+
+class CountingDb:
+    """Passes every call through to the database, counting operations per collection"""
+
+    def __init__(self, db):
+        self._db = db
+        self.calls = {}
+
+    def __getattr__(self, name):
+        return self[name]
+
+    def __getitem__(self, name):
+        collection = self._db[name]
+        calls = self.calls
+
+        class Counting:
+            def __getattr__(self, method):
+                attr = getattr(collection, method)
+                if not callable(attr):
+                    return attr
+
+                def call(*args, **kwargs):
+                    calls[name] = calls.get(name, 0) + 1
+                    return attr(*args, **kwargs)
+
+                return call
+
+        return Counting()
+
+
+async def attack(attempts) -> float:
+    clients = {}
+    started = time.perf_counter()
+    for offset in range(0, len(attempts), CONCURRENCY):
+        requests = []
+        for ip, email in attempts[offset:offset + CONCURRENCY]:
+            if ip not in clients:
+                clients[ip] = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app, client=(ip, 40000)),
+                                                base_url="http://test")
+            requests.append(clients[ip].post("/api/auth/pin-login", json={"email": email, "pin": "0000"}))
+        for response in await asyncio.gather(*requests):
+            assert response.status_code in (401, 429)
+    elapsed = time.perf_counter() - started
+    for client in clients.values():
+        await client.aclose()
+    return elapsed
+
+
+def test_database_load_under_attack(db, monkeypatch):
+    asyncio.run(db.users.insert_one({
+        "email": VICTIM, "password": "x", "full_name": "Victim", "phone": "0400000000", "member_id": "MV-0000001",
+        "pin": "4321", "created_at": datetime(2024, 1, 1)
+    }))
+    limiters = {
+        "unprotected": dict(enabled=False),
+        "memory": dict(enabled=True, backend="memory"),
+        "mongo": dict(enabled=True, backend="mongo"),
+    }
+
+    results = {}
+    for mode, settings in limiters.items():
+        for name, attempts in ATTACKS.items():
+            counting = CountingDb(db)
+            monkeypatch.setattr(server, "db", counting)
+            monkeypatch.setattr(server, "login_rate_limiter", LoginRateLimiter(**settings))
+            asyncio.run(db.rate_limits.delete_many({}))
+            elapsed = asyncio.run(attack(attempts))
+            results[mode, name] = (counting.calls.get("users", 0), counting.calls.get("rate_limits", 0), elapsed)
+
+    for name in ATTACKS:
+        report(f"{name}, {ATTEMPTS} attempts: users lookups (rate_limits ops)",
+               **{mode: f"{users} ({limits}) in {ms(elapsed)}, {users / elapsed:.0f} lookups/s"
+                  for (mode, attack_name), (users, limits, elapsed) in results.items() if attack_name == name})
+
+    limiter = LoginRateLimiter()
+    for mode in ("memory", "mongo"):
+        assert results[mode, "pin brute force from one ip"][0] <= limiter.by_email.limit
+        assert results[mode, "pin brute force from 200 ips"][0] <= limiter.by_email.limit
+        # The IP window counts failures after the lookup, so one concurrent wave can overshoot it
+        assert results[mode, "credential stuffing from one ip"][0] <= limiter.by_ip.limit + CONCURRENCY
+    assert all(results["unprotected", name][0] >= ATTEMPTS for name in ATTACKS)
@@ -0,0 +1,161 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import rego_jobs
+from rego_jobs import RegoJobWorkerPool
+from rego_service import RegoParseError
+
+IMAGE = "aW1hZ2U="
+
+
+@pytest.fixture
+def extract(monkeypatch):
+    """Replaces the model call; set .behaviour to a coroutine function of (image, user_id)"""
+    class Extract:
+        calls = 0
+
+        async def behaviour(self, image, user_id):
+            return {"rego": "ABC123"}
+
+        async def __call__(self, db, image, user_id):
+            self.calls += 1
+            return await self.behaviour(image, user_id)
+
+    fake = Extract()
+    monkeypatch.setattr(rego_jobs.rego_service, "extract", fake)
+    return fake
+
+
+async def run_once(pool, db):
+    """One claim-and-process step of a worker loop"""
+    job = await pool._claim(db)
+    if job is not None:
+        await pool._process(db, job)
+    return job
+
+
+def test_scan_is_queued_and_only_visible_to_its_owner(client, register):
+    owner, other = register(), register()
+
+    response = client.post("/api/vehicles/extract-rego-data/jobs", headers=owner, json={"image_base64": IMAGE})
+    job_id = response.json()["job_id"]
+
+    assert response.status_code == 202
+    assert response.json()["status"] == "queued"
+    assert client.get(f"/api/vehicles/extract-rego-data/jobs/{job_id}", headers=owner).json()["status"] == "queued"
+    assert client.get(f"/api/vehicles/extract-rego-data/jobs/{job_id}", headers=other).status_code == 404
+    assert client.get("/api/vehicles/extract-rego-data/jobs/not-an-id", headers=owner).status_code == 404
+
+
+def test_full_queue_is_rejected(client, register, monkeypatch):
+    headers = register()
+    monkeypatch.setattr(rego_jobs, "REGO_JOB_MAX_QUEUED", 1)
+
+    assert client.post("/api/vehicles/extract-rego-data/jobs", headers=headers, json={"image_base64": IMAGE}).status_code == 202
+    response = client.post("/api/vehicles/extract-rego-data/jobs", headers=headers, json={"image_base64": IMAGE})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_jobs_are_processed_in_order_and_drop_the_image(db, extract):
+    pool = RegoJobWorkerPool(workers=1, timeout=5)
+
+    async def run():
+        first = await rego_jobs.enqueue(db, "u1", IMAGE)
+        await rego_jobs.enqueue(db, "u1", IMAGE)
+        claimed = await run_once(pool, db)
+        return first, claimed, await db.rego_jobs.find_one({"_id": first['_id']})
+
+    first, claimed, done = asyncio.run(run())
+
+    assert claimed['_id'] == first['_id']
+    assert done['status'] == "done" and done['result'] == {"rego": "ABC123"}
+    assert 'image_base64' not in done and done['expires_at'] > datetime.utcnow()
+
+
+def test_timeout_is_retried_then_fails(db, extract):
+    pool = RegoJobWorkerPool(workers=1, timeout=0.01)
+
+    async def slow(image, user_id):
+        await asyncio.sleep(1)
+
+    extract.behaviour = slow
+
+    async def run():
+        job = await rego_jobs.enqueue(db, "u1", IMAGE)
+        await run_once(pool, db)
+        retried = await db.rego_jobs.find_one({"_id": job['_id']})
+        await run_once(pool, db)
+        failed = await db.rego_jobs.find_one({"_id": job['_id']})
+        return retried, failed, await pool._claim(db)
+
+    retried, failed, leftover = asyncio.run(run())
+
+    assert (retried['status'], retried['attempts']) == ("queued", 1)
+    assert (failed['status'], failed['attempts']) == ("failed", rego_jobs.REGO_JOB_MAX_ATTEMPTS)
+    assert failed['error'] == "Timed out processing image"
+    assert leftover is None
+
+
+def test_expired_lease_is_reclaimed_and_the_dead_worker_cannot_overwrite(db, extract):
+    dead, alive = RegoJobWorkerPool(workers=1), RegoJobWorkerPool(workers=1)
+    dead.worker_id, alive.worker_id = "dead:1", "alive:1"
+
+    async def run():
+        job = await rego_jobs.enqueue(db, "u1", IMAGE)
+        claimed = await dead._claim(db)
+        # Still leased: nobody else may take it
+        assert await alive._claim(db) is None
+        await db.rego_jobs.update_one({"_id": job['_id']}, {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+        await run_once(alive, db)
+        # The original worker finishes late with a different answer
+        extract.behaviour = lambda image, user_id: asyncio.sleep(0, {"rego": "STALE"})
+        await dead._process(db, claimed)
+        return await db.rego_jobs.find_one({"_id": job['_id']})
+
+    job = asyncio.run(run())
+
+    assert (job['status'], job['worker'], job['attempts']) == ("done", "alive:1", 2)
+    assert job['result'] == {"rego": "ABC123"}
+
+
+def test_abandoned_job_on_its_last_attempt_is_failed(db, extract):
+    pool = RegoJobWorkerPool(workers=1)
+
+    async def run():
+        job = await rego_jobs.enqueue(db, "u1", IMAGE)
+        await db.rego_jobs.update_one({"_id": job['_id']}, {"$set": {
+            "status": "running", "attempts": rego_jobs.REGO_JOB_MAX_ATTEMPTS,
+            "lease_expires_at": datetime.utcnow() - timedelta(seconds=1)
+        }})
+        assert await pool._claim(db) is None
+        await pool._fail_abandoned(db)
+        return await db.rego_jobs.find_one({"_id": job['_id']})
+
+    job = asyncio.run(run())
+
+    assert job['status'] == "failed" and job['error'] == "Timed out processing image"
+    assert extract.calls == 0
+
+
+def test_unparseable_model_reply_fails_without_retry(db, extract):
+    pool = RegoJobWorkerPool(workers=1)
+
+    async def unparseable(image, user_id):
+        raise RegoParseError("not json")
+
+    extract.behaviour = unparseable
+
+    async def run():
+        job = await rego_jobs.enqueue(db, "u1", IMAGE)
+        await run_once(pool, db)
+        return await db.rego_jobs.find_one({"_id": job['_id']}), await pool._claim(db)
+
+    job, leftover = asyncio.run(run())
+
+    assert (job['status'], job['attempts']) == ("failed", 1)
+    assert job['error'] == "Failed to parse AI response"
+    assert leftover is None
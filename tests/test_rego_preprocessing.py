@@ -0,0 +1,85 @@
+import asyncio
+import base64
+import io
+import os
+import time
+
+import pytest
+from PIL import Image, ImageDraw
+
+import image_pipeline
+from image_pipeline import RegoImagePreprocessor, preprocess_rego_image
+from tests.benchmarks import ms, report
+
+# Mobile uplink the upload saving is computed for
+UPLINK_MBPS = float(os.getenv("BENCHMARK_UPLINK_MBPS", 5))
+EXIF_ORIENTATION = 0x0112
+
+
+def rego_photo(size=(4032, 3024), orientation=None) -> bytes:
+    """A registration paper as test_ai_rego.py draws it, at phone-camera size with sensor noise"""
+    img = Image.effect_noise(size, 24).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([size[0] // 10, size[1] // 10, size[0] * 9 // 10, size[1] * 9 // 10], fill="white")
+    for i, line in enumerate(["VEHICLE REGISTRATION", "Registration Number: ABC123", "VIN: 1HGBH41JXMN109186",
+                              "Make: Toyota", "Model: Camry", "Year: 2022", "Expiry Date: 2025-03-15"]):
+        draw.text((size[0] // 8, size[1] // 8 + i * 60), line, fill="black")
+    exif = Image.Exif()
+    if orientation:
+        exif[EXIF_ORIENTATION] = orientation
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=92, exif=exif)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pool():
+    yield
+    image_pipeline.shutdown_image_pool()
+
+
+def test_photo_is_rotated_downscaled_and_greyscale():
+    # Orientation 6: the camera was rotated, so the upright image is portrait
+    processed, timings = preprocess_rego_image(rego_photo((1600, 1200), orientation=6), 800, 70)
+
+    with Image.open(io.BytesIO(processed)) as img:
+        assert img.size == (600, 800)
+        assert img.mode == "L" and img.format == "JPEG"
+    assert set(timings) == {"decode", "resize", "encode"}
+
+
+def test_undecodable_image_is_passed_through(pool):
+    preprocessor = RegoImagePreprocessor()
+    garbage = base64.b64encode(b"\xff\xd8\xff" + b"not a photo" * 100).decode()
+
+    assert asyncio.run(preprocessor.process(garbage)) == garbage
+    assert preprocessor.failures == 1
+
+
+@pytest.mark.benchmark
+def test_preprocessing_cuts_bytes_and_upload_time(pool):
+    photo = rego_photo()
+    preprocessor = RegoImagePreprocessor()
+
+    async def run():
+        # The first call pays for starting the pool
+        await preprocessor.process(base64.b64encode(photo).decode())
+        started = time.perf_counter()
+        processed = await preprocessor.process(base64.b64encode(photo).decode())
+        return processed, time.perf_counter() - started
+
+    processed, total = asyncio.run(run())
+    processed = base64.b64decode(processed)
+    stages = preprocessor.stats()["stages"]
+
+    def upload(size):
+        return size * 8 / (UPLINK_MBPS * 1_000_000)
+
+    report(
+        "rego preprocessing",
+        bytes=f"{len(photo)} -> {len(processed)}",
+        stages=", ".join(f"{stage} p50 {h['p50_ms']} ms" for stage, h in stages.items()),
+        upload_at_mbps=f"{UPLINK_MBPS}: {ms(upload(len(photo)))} -> {ms(total + upload(len(processed)))} including preprocessing",
+    )
+    assert len(processed) * 10 < len(photo)
+    assert total + upload(len(processed)) < upload(len(photo))
@@ -0,0 +1,137 @@
+import asyncio
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+
+import rego_service as rego_module
+from rego_service import FakeLlmChat, RegoExtractionService, RegoParseError
+
+IMAGE = base64.b64encode(b"\xff\xd8\xff registration paper").decode()
+
+
+class CountingChat(FakeLlmChat):
+    """FakeLlmChat that counts model calls and can hold them until released"""
+
+    calls = 0
+    gate = None
+    reply = None
+
+    async def send_message(self, message) -> str:
+        type(self).calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.reply is not None:
+            return self.reply
+        return await super().send_message(message)
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    monkeypatch.setattr(rego_module, "REGO_PREPROCESS", False)
+    return type("Chat", (CountingChat,), {"calls": 0})
+
+
+@pytest.fixture
+def service(chat):
+    return RegoExtractionService(chat_factory=chat)
+
+
+def test_second_scan_of_an_image_is_a_cache_hit(db, service, chat):
+    async def scans():
+        return await service.extract(db, IMAGE, "u1"), await service.extract(db, IMAGE, "u2")
+
+    first, second = asyncio.run(scans())
+
+    assert first == second == FakeLlmChat.response
+    assert chat.calls == 1
+    assert (service.misses, service.memory_hits) == (1, 1)
+
+
+def test_data_uri_prefix_does_not_change_the_cache_key(db, service, chat):
+    async def scans():
+        await service.extract(db, f"data:image/jpeg;base64,{IMAGE}", "u1")
+        return await service.extract(db, IMAGE, "u1")
+
+    assert asyncio.run(scans()) == FakeLlmChat.response
+    assert chat.calls == 1
+    assert service.memory_hits == 1
+
+
+def test_concurrent_scans_of_one_image_share_a_model_call(db, service, chat):
+    async def scans():
+        chat.gate = asyncio.Event()
+        pending = [asyncio.ensure_future(service.extract(db, IMAGE, f"u{i}")) for i in range(3)]
+        # Hold the model call until the other two scans have joined it
+        for _ in range(100):
+            if service.coalesced == 2:
+                break
+            await asyncio.sleep(0)
+        chat.gate.set()
+        return await asyncio.gather(*pending)
+
+    results = asyncio.run(scans())
+
+    assert results == [FakeLlmChat.response] * 3
+    assert chat.calls == 1
+    assert (service.misses, service.coalesced) == (1, 2)
+    assert service.stats()["in_flight"] == 0
+
+
+def test_results_persist_in_rego_scan_cache(db, service, chat):
+    asyncio.run(service.extract(db, IMAGE, "u1"))
+    doc = asyncio.run(db.rego_scan_cache.find_one({}))
+
+    assert doc["result"] == FakeLlmChat.response
+    assert doc["expires_at"] > datetime.utcnow()
+
+    # A fresh worker has an empty memory cache but still skips the model
+    restarted = RegoExtractionService(chat_factory=chat)
+    assert asyncio.run(restarted.extract(db, IMAGE, "u1")) == FakeLlmChat.response
+    assert chat.calls == 1
+    assert restarted.mongo_hits == 1
+
+
+def test_expired_persisted_results_are_ignored(db, service, chat):
+    asyncio.run(service.extract(db, IMAGE, "u1"))
+    asyncio.run(db.rego_scan_cache.update_many({}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}))
+
+    restarted = RegoExtractionService(chat_factory=chat)
+    asyncio.run(restarted.extract(db, IMAGE, "u1"))
+
+    assert chat.calls == 2
+    assert restarted.misses == 1
+
+
+def test_unparseable_reply_is_not_cached(db, service, chat):
+    chat.reply = "I could not read this document"
+
+    with pytest.raises(RegoParseError):
+        asyncio.run(service.extract(db, IMAGE, "u1"))
+    with pytest.raises(RegoParseError):
+        asyncio.run(service.extract(db, IMAGE, "u1"))
+
+    assert chat.calls == 2
+    assert service.errors == 2
+    assert asyncio.run(db.rego_scan_cache.count_documents({})) == 0
+
+
+def test_endpoint_maps_parse_errors_to_502(client, register, service, chat, monkeypatch):
+    import server
+    monkeypatch.setattr(server, "rego_service", service)
+    chat.reply = "not json"
+
+    response = client.post("/api/vehicles/extract-rego-data", headers=register(), json={"image_base64": IMAGE})
+
+    assert response.status_code == 502
+    assert response.json()["detail"] == "Failed to parse AI response"
+
+
+def test_endpoint_returns_extracted_fields(client, register, service, monkeypatch):
+    import server
+    monkeypatch.setattr(server, "rego_service", service)
+
+    response = client.post("/api/vehicles/extract-rego-data", headers=register(), json={"image_base64": IMAGE})
+
+    assert response.status_code == 200
+    assert response.json() == FakeLlmChat.response
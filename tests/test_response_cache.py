@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+import auth_utils
+import server
+from response_cache import ResponseCache
+from serialization import FastJSONResponse
+
+
+def _cache():
+    cache = ResponseCache(enabled=True)
+    cache.namespace("dealers")
+    cache.namespace("promotions")
+    return cache
+
+
+async def _fill(cache, name, key, value):
+    async def build():
+        return FastJSONResponse(value)
+    return await cache.get_or_build(name, key, build)
+
+
+def test_hits_after_first_build_and_coalesces_concurrent_misses():
+    cache = _cache()
+    builds = 0
+
+    async def build():
+        nonlocal builds
+        builds += 1
+        await asyncio.sleep(0.01)
+        return FastJSONResponse({"dealers": []})
+
+    async def run():
+        first = await asyncio.gather(*[cache.get_or_build("dealers", "k", build) for _ in range(5)])
+        second = await cache.get_or_build("dealers", "k", build)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert builds == 1
+    assert {r.headers["X-Cache"] for r in first} == {"MISS"}
+    assert second.headers["X-Cache"] == "HIT"
+    assert cache.stats()["dealers"]["coalesced"] == 4
+
+
+def test_error_responses_are_not_cached():
+    cache = _cache()
+
+    async def build():
+        return FastJSONResponse({"detail": "down"}, status_code=503)
+
+    async def run():
+        await cache.get_or_build("dealers", "k", build)
+        return await cache.get_or_build("dealers", "k", build)
+
+    assert asyncio.run(run()).headers["X-Cache"] == "MISS"
+
+
+def test_broadcast_invalidation_reaches_other_workers(db):
+    serving, other = _cache(), _cache()
+
+    async def run():
+        await serving.sync(db)
+        await other.sync(db)
+        for cache in (serving, other):
+            await _fill(cache, "dealers", "a", {"v": 1})
+            await _fill(cache, "promotions", "a", {"v": 1})
+
+        removed = await serving.broadcast_invalidation(db, "dealers")
+        assert removed == 1
+        # The other worker still holds the entry until it syncs
+        assert (await _fill(other, "dealers", "a", {"v": 2})).headers["X-Cache"] == "HIT"
+
+        await other.sync(db)
+        dealers = await _fill(other, "dealers", "a", {"v": 2})
+        promotions = await _fill(other, "promotions", "a", {"v": 2})
+        # The serving worker does not clear its fresh entries again on its own next sync
+        await serving.sync(db)
+        rebuilt = await _fill(serving, "dealers", "a", {"v": 3})
+        return dealers, promotions, rebuilt
+
+    dealers, promotions, rebuilt = asyncio.run(run())
+    assert dealers.headers["X-Cache"] == "MISS" and dealers.body == b'{"v":2}'
+    assert promotions.headers["X-Cache"] == "HIT"
+    assert rebuilt.headers["X-Cache"] == "MISS"
+
+
+def test_first_broadcast_of_a_namespace_is_seen_by_workers_started_earlier(db):
+    other = _cache()
+
+    async def run():
+        await other.sync(db)
+        await _fill(other, "promotions", "a", {"v": 1})
+        await _cache().broadcast_invalidation(db)
+        await other.sync(db)
+        return await _fill(other, "promotions", "a", {"v": 2})
+
+    assert asyncio.run(run()).headers["X-Cache"] == "MISS"
+
+
+def test_admin_endpoint_broadcasts(client, db, monkeypatch):
+    monkeypatch.setattr(auth_utils, "ADMIN_API_KEY", "admin-key")
+    response = client.delete("/api/admin/cache", params={"namespace": "promotions"}, headers={"X-Admin-Key": "admin-key"})
+    assert response.status_code == 200
+    assert set(response.json()) == {"removed", "other_workers_within_seconds"}
+
+    async def generation():
+        return (await db.cache_generations.find_one({"_id": "promotions"}))['generation']
+
+    assert asyncio.run(generation()) == 1
+    assert client.delete("/api/admin/cache", params={"namespace": "nope"}, headers={"X-Admin-Key": "admin-key"}).status_code == 404
+
+
+@pytest.fixture
+def endpoint_cache(monkeypatch):
+    cache = ResponseCache(enabled=True)
+    for name in ("dealers", "providers", "promotions"):
+        cache.namespace(name)
+    monkeypatch.setattr(server, "response_cache", cache)
+    return cache
+
+
+def dealer(name):
+    return {"name": name, "address": "1 Main Rd", "phone": "0200000000", "email": "d@example.com",
+            "dealer_type": "Service Center", "services_offered": ["Servicing"], "is_approved": True}
+
+
+def test_public_endpoints_serve_cached_bytes_until_invalidated(client, db, endpoint_cache, monkeypatch):
+    monkeypatch.setattr(auth_utils, "ADMIN_API_KEY", "admin-key")
+    asyncio.run(db.dealers.insert_one(dealer("First")))
+
+    miss = client.get("/api/dealers")
+    hit = client.get("/api/dealers")
+    other_query = client.get("/api/dealers", params={"dealer_type": "Service Center"})
+    asyncio.run(db.dealers.insert_one(dealer("Second")))
+    stale = client.get("/api/dealers")
+    client.delete("/api/admin/cache", params={"namespace": "dealers"}, headers={"X-Admin-Key": "admin-key"})
+    fresh = client.get("/api/dealers")
+
+    assert [r.headers["X-Cache"] for r in (miss, hit, other_query, stale, fresh)] == ["MISS", "HIT", "MISS", "HIT", "MISS"]
+    assert hit.content == miss.content == stale.content
+    assert [d["name"] for d in fresh.json()] == ["First", "Second"]
+    assert endpoint_cache.stats()["dealers"]["hit_ratio"] == 0.4
+
+
+def test_errors_are_not_cached(client, endpoint_cache):
+    assert client.get("/api/dealers", params={"fields": "nope"}).status_code == 400
+    assert client.get("/api/dealers", params={"fields": "nope"}).status_code == 400
+    assert endpoint_cache.stats()["dealers"]["cached"] == 0
@@ -0,0 +1,127 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import orjson
+import pytest
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+
+from marketplace_models import MarketplaceListingResponse
+from models import DealerResponse, PromotionResponse, ServiceBookingResponse, VehicleResponse
+from serialization import FastJSONResponse, dumps, trusted
+from tests.benchmarks import best_of, ms, report
+
+ROWS = int(os.getenv("SERIALIZATION_BENCHMARK_ROWS", 200))
+CREATED = datetime(2024, 5, 1, 9, 30)
+
+
+def vehicle(i):
+    return {
+        "id": f"v{i}", "user_id": "u1", "rego": f"ABC{i:03}", "vin": f"1HGBH41JXMN{i:06}", "make": "Toyota",
+        "model": "Camry", "year": 2020, "body_type": "Sedan", "color": "White", "odometer": 42000 + i,
+        "image": f"/api/images/{i:024x}", "purchase_date": CREATED - timedelta(days=i), "purchase_price": 32000.0,
+        "dealer_id": "d1", "created_at": CREATED
+    }
+
+
+def dealer(i):
+    return {
+        "id": f"d{i}", "name": f"Dealer {i}", "logo": f"/api/images/{i:024x}", "address": f"{i} Parramatta Rd",
+        "phone": "0290000000", "email": f"dealer{i}@example.com", "website": "https://example.com",
+        "dealer_type": "Both", "services_offered": ["Servicing", "Tyres", "Brakes"], "latitude": -33.8,
+        "longitude": 151.0, "operating_hours": "Mon-Fri 8am-5pm", "is_approved": True
+    }
+
+
+def promotion(i):
+    return {
+        "id": f"p{i}", "title": f"Promotion {i}", "description": "Save on your next service " * 10,
+        "banner_image": f"/api/images/{i:024x}", "discount_details": "20% off", "category": "Service",
+        "provider_id": "pr1", "start_date": CREATED, "end_date": CREATED + timedelta(days=30),
+        "terms": "Conditions apply " * 20, "redemption_link": "https://example.com/redeem", "status": "Active"
+    }
+
+
+def booking(i):
+    return {
+        "id": f"b{i}", "user_id": "u1", "vehicle_id": f"v{i}", "dealer_id": "d1", "dealer_name": "Dealer 1",
+        "service_type": "Logbook service", "booking_date": CREATED + timedelta(days=i), "notes": "Rattle at idle",
+        "issue_photos": [f"/api/images/{i:024x}", f"/api/images/{i + 1:024x}"], "status": "Pending",
+        "created_at": CREATED
+    }
+
+
+def listing(i):
+    return {
+        "id": f"l{i}", "user_id": "u1", "vehicle_id": f"v{i}", "title": "Toyota Camry 2020", "make": "Toyota",
+        "model": "Camry", "year": 2020, "price": 25000.0, "odometer": 42000, "condition": "Good",
+        "description": "Well kept, full service history " * 8, "images": [f"/api/images/{i:024x}"] * 4,
+        "contact_name": "Seller", "contact_phone": "0400000000", "listed_date": CREATED, "status": "Active",
+        "features": ["Towbar", "Sunroof"]
+    }
+
+
+ENDPOINTS = {
+    "/api/vehicles": (VehicleResponse, vehicle),
+    "/api/dealers": (DealerResponse, dealer),
+    "/api/promotions": (PromotionResponse, promotion),
+    "/api/service-bookings": (ServiceBookingResponse, booking),
+    "/api/marketplace-listings": (MarketplaceListingResponse, listing),
+}
+
+
+def test_trusted_skips_validation_for_complete_documents():
+    doc = {**vehicle(1), "year": "2020"}
+
+    assert trusted(VehicleResponse, doc).year == "2020"
+    assert VehicleResponse(**doc).year == 2020
+
+
+def test_trusted_validates_documents_missing_a_required_field():
+    doc = vehicle(1)
+    del doc["make"]
+
+    with pytest.raises(ValidationError):
+        trusted(VehicleResponse, doc)
+
+
+def test_dumps_handles_models_object_ids_and_datetimes():
+    oid = ObjectId()
+    body = orjson.loads(dumps({"id": oid, "vehicle": trusted(VehicleResponse, vehicle(1)), 1: "int key"}))
+
+    assert body["id"] == str(oid)
+    assert body["vehicle"]["created_at"] == "2024-05-01T09:30:00"
+    assert body["1"] == "int key"
+
+
+@pytest.mark.parametrize("path", ENDPOINTS)
+def test_fast_response_matches_the_default_encoding(path):
+    model, doc = ENDPOINTS[path]
+    docs = [doc(i) for i in range(3)]
+
+    fast = FastJSONResponse(content=[trusted(model, d) for d in docs]).body
+    default = JSONResponse(content=jsonable_encoder([model(**d) for d in docs])).body
+
+    assert orjson.loads(fast) == json.loads(default)
+
+
+@pytest.mark.benchmark
+def test_serialization_time_per_endpoint():
+    results = {}
+    for path, (model, doc) in ENDPOINTS.items():
+        docs = [doc(i) for i in range(ROWS)]
+
+        def before():
+            JSONResponse(content=jsonable_encoder([model(**d) for d in docs]))
+
+        def after():
+            FastJSONResponse(content=[trusted(model, d) for d in docs])
+
+        results[path] = (best_of(before, runs=10), best_of(after, runs=10))
+
+    report(f"serialization of {ROWS} rows, jsonable_encoder+json.dumps -> trusted+orjson",
+           **{path: f"{ms(old)} -> {ms(new)}" for path, (old, new) in results.items()})
+    assert all(new * 2 < old for old, new in results.values())
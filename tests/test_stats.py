@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import stats_service
+
+
+def add_vehicle(client, headers, rego="STAT01"):
+    response = client.post("/api/vehicles", headers=headers, json={
+        "rego": rego, "vin": f"VIN-{rego}", "make": "Subaru", "model": "Forester", "year": 2017
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def add_policy(client, headers, vehicle_id, end_date="2030-01-01T00:00:00"):
+    response = client.post("/api/insurance-policies", headers=headers, json={
+        "vehicle_id": vehicle_id, "policy_type": "CTP", "provider_id": "p1", "policy_number": "P-1",
+        "premium": 500, "start_date": "2024-01-01T00:00:00", "end_date": end_date
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def stats(client, headers):
+    response = client.get("/api/dashboard/stats", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_creates_are_counted(client, register):
+    headers = register()
+    assert stats(client, headers)["total_vehicles"] == 0
+
+    vehicle_id = add_vehicle(client, headers)
+    add_policy(client, headers, vehicle_id)
+    add_policy(client, headers, vehicle_id, end_date="2020-01-01T00:00:00")
+
+    body = stats(client, headers)
+    assert body["total_vehicles"] == 1
+    assert body["active_insurance_policies"] == 1
+
+
+def test_deletes_are_counted(client, register):
+    headers = register()
+    vehicle_id = add_vehicle(client, headers)
+    policy_id = add_policy(client, headers, vehicle_id)
+    assert stats(client, headers)["active_insurance_policies"] == 1
+
+    assert client.delete(f"/api/insurance-policies/{policy_id}", headers=headers).status_code == 200
+    assert client.delete(f"/api/vehicles/{vehicle_id}", headers=headers).status_code == 200
+
+    body = stats(client, headers)
+    assert body["total_vehicles"] == 0
+    assert body["active_insurance_policies"] == 0
+
+
+def test_expired_products_drop_out_without_a_write(client, register, db):
+    headers = register()
+    policy_id = add_policy(client, headers, add_vehicle(client, headers))
+    assert stats(client, headers)["active_insurance_policies"] == 1
+
+    # Time passes: the stored next_expiry and the policy's end_date are now in the past
+    past = datetime.utcnow() - timedelta(seconds=1)
+    asyncio.run(db.insurance_policies.update_one({"_id": ObjectId(policy_id)}, {"$set": {"end_date": past}}))
+    asyncio.run(db.user_stats.update_many({}, {"$set": {"next_expiry": past}}))
+
+    assert stats(client, headers)["active_insurance_policies"] == 0
+
+
+def test_recount_between_write_and_hook_is_not_double_counted(db):
+    async def scenario():
+        user_id = "u1"
+        await stats_service.get_stats(db, user_id)
+        # The handler has inserted the row but not yet run its hook when a read recounts
+        await db.vehicles.insert_one({"user_id": user_id})
+        await stats_service.refresh_stats(db, user_id, datetime.utcnow())
+        await stats_service.vehicle_added(db, user_id)
+        return await stats_service.get_stats(db, user_id)
+
+    assert asyncio.run(scenario())["total_vehicles"] == 1
+
+
+def test_recount_started_before_a_write_is_not_stored(db, monkeypatch):
+    counted = stats_service.count_stats
+    raced = []
+
+    async def write_during_first_count(db, user_id, now):
+        result = await counted(db, user_id, now)
+        if not raced:
+            raced.append(True)
+            await db.vehicles.insert_one({"user_id": user_id})
+            await stats_service.vehicle_added(db, user_id)
+        return result
+
+    async def scenario():
+        user_id = "u1"
+        await stats_service.get_stats(db, user_id)
+        monkeypatch.setattr(stats_service, "count_stats", write_during_first_count)
+        stored = await stats_service.refresh_stats(db, user_id, datetime.utcnow())
+        monkeypatch.setattr(stats_service, "count_stats", counted)
+        return stored, await stats_service.get_stats(db, user_id)
+
+    stored, body = asyncio.run(scenario())
+
+    # The stale count was retried rather than stored
+    assert stored["total_vehicles"] == 1
+    assert body["total_vehicles"] == 1
@@ -0,0 +1,74 @@
+"""Dashboard stats from the materialized user_stats document against concurrent and serial counts"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import stats_service
+from db_indexes import INDEXES
+from stats_service import PRODUCT_COUNTERS, STAT_FIELDS
+from tests.benchmarks import mongo_database, ms, percentile, report, requires_mongo
+
+pytestmark = [pytest.mark.benchmark, requires_mongo]
+
+USERS = int(os.getenv("STATS_BENCHMARK_USERS", 2000))
+DOCS_PER_USER = 20
+REQUESTS = 300
+
+
+async def serial_counts(db, user_id: str) -> dict:
+    """The four one-after-another counts the endpoint used to run"""
+    counts = [await db.vehicles.count_documents({"user_id": user_id})]
+    for collection in PRODUCT_COUNTERS:
+        counts.append(await db[collection].count_documents({"user_id": user_id, "end_date": {"$gt": datetime.utcnow()}}))
+    return dict(zip(STAT_FIELDS, counts))
+
+
+async def seed(db):
+    for collection in ("vehicles", *PRODUCT_COUNTERS):
+        await db[collection].create_indexes(INDEXES[collection])
+    now = datetime.utcnow()
+    for collection in ("vehicles", *PRODUCT_COUNTERS):
+        await db[collection].insert_many([
+            {"user_id": f"user{u}", "end_date": now + timedelta(days=(i % 4 - 1) * 90)}
+            for u in range(USERS) for i in range(DOCS_PER_USER)
+        ])
+
+
+async def latencies(fn) -> list:
+    samples = []
+    for i in range(REQUESTS):
+        started = time.perf_counter()
+        await fn(f"user{i % USERS}")
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def test_materialized_stats_beat_counting(monkeypatch):
+    async def run():
+        async with mongo_database("stats_benchmark") as db:
+            await seed(db)
+            for i in range(REQUESTS):
+                # Warm the materialized documents, as the first dashboard load after a write does
+                await stats_service.get_stats(db, f"user{i % USERS}")
+
+            monkeypatch.setattr(stats_service, "DASHBOARD_STATS_MODE", "materialized")
+            materialized = await latencies(lambda user_id: stats_service.get_stats(db, user_id))
+            expected = await stats_service.get_stats(db, "user0")
+            monkeypatch.setattr(stats_service, "DASHBOARD_STATS_MODE", "concurrent")
+            concurrent = await latencies(lambda user_id: stats_service.get_stats(db, user_id))
+            assert await stats_service.get_stats(db, "user0") == expected
+            serial = await latencies(lambda user_id: serial_counts(db, user_id))
+            return materialized, concurrent, serial
+
+    materialized, concurrent, serial = asyncio.run(run())
+    report(
+        "dashboard stats p50/p99",
+        materialized=f"{ms(percentile(materialized, 50))}/{ms(percentile(materialized, 99))}",
+        concurrent=f"{ms(percentile(concurrent, 50))}/{ms(percentile(concurrent, 99))}",
+        serial=f"{ms(percentile(serial, 50))}/{ms(percentile(serial, 99))}",
+    )
+    assert percentile(materialized, 50) < percentile(concurrent, 50)
+    assert percentile(concurrent, 50) < percentile(serial, 50)
@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import sync_service
+
+
+def add_vehicle(client, headers, rego):
+    response = client.post("/api/vehicles", headers=headers, json={
+        "rego": rego, "vin": f"VIN-{rego}", "make": "Mazda", "model": "3", "year": 2019
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def sync(client, headers, since=None):
+    response = client.get("/api/sync", headers=headers, params={"since": since} if since else None)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_first_sync_is_full(client, register):
+    headers = register()
+    vehicle_id = add_vehicle(client, headers, "AAA111")
+
+    body = sync(client, headers)
+
+    assert body["full_sync"] is True
+    assert body["has_more"] is False
+    assert [v["id"] for v in body["vehicles"]] == [vehicle_id]
+    assert body["deleted"] == {}
+
+
+def test_delta_has_changes_and_tombstones(client, register, monkeypatch):
+    # Without the overlap window a delta holds exactly what changed after the token
+    monkeypatch.setattr(sync_service, "SYNC_OVERLAP_SECONDS", 0)
+    headers = register()
+    kept = add_vehicle(client, headers, "AAA111")
+    removed = add_vehicle(client, headers, "BBB222")
+    token = sync(client, headers)["sync_token"]
+
+    assert client.put(f"/api/vehicles/{kept}", headers=headers, json={"odometer": 50000}).status_code == 200
+    assert client.delete(f"/api/vehicles/{removed}", headers=headers).status_code == 200
+    added = add_vehicle(client, headers, "CCC333")
+
+    body = sync(client, headers, token)
+
+    assert body["full_sync"] is False
+    assert sorted(v["id"] for v in body["vehicles"]) == sorted([kept, added])
+    assert body["deleted"]["vehicles"] == [removed]
+
+    # Nothing changed since, so the next delta is empty
+    body = sync(client, headers, body["sync_token"])
+    assert body["vehicles"] == []
+    assert body["deleted"].get("vehicles", []) == []
+
+
+def test_product_that_expires_between_syncs_is_resent_as_expired(client, register, db, monkeypatch):
+    monkeypatch.setattr(sync_service, "SYNC_OVERLAP_SECONDS", 0)
+    headers = register()
+    vehicle_id = add_vehicle(client, headers, "EXP001")
+    policy = client.post("/api/insurance-policies", headers=headers, json={
+        "vehicle_id": vehicle_id, "policy_type": "CTP", "provider_id": "p1", "policy_number": "P-1",
+        "premium": 500, "start_date": "2024-01-01T00:00:00", "end_date": "2030-01-01T00:00:00"
+    }).json()
+    first = sync(client, headers)
+    assert [p["status"] for p in first["insurance_policies"]] == ["Active"]
+
+    # The policy runs out after the sync without being written to
+    asyncio.run(db.insurance_policies.update_one(
+        {"_id": ObjectId(policy["id"])},
+        {"$set": {"end_date": datetime.utcnow(), "updated_at": datetime.utcnow() - timedelta(days=30)}}
+    ))
+
+    body = sync(client, headers, first["sync_token"])
+
+    assert [(p["id"], p["status"]) for p in body["insurance_policies"]] == [(policy["id"], "Expired")]
+    assert body["vehicles"] == []
+    # Once delivered, the expiry is not sent again
+    assert sync(client, headers, body["sync_token"])["insurance_policies"] == []
+
+
+def test_full_sync_pages_until_has_more_is_false(client, register, monkeypatch):
+    monkeypatch.setattr(sync_service, "SYNC_PAGE_SIZE", 2)
+    headers = register()
+    ids = [add_vehicle(client, headers, f"REG{i}") for i in range(5)]
+
+    seen = []
+    body = sync(client, headers)
+    pages = 1
+    while body["has_more"]:
+        seen.extend(v["id"] for v in body["vehicles"])
+        body = sync(client, headers, body["sync_token"])
+        pages += 1
+    seen.extend(v["id"] for v in body["vehicles"])
+
+    assert pages == 3
+    assert sorted(seen) == sorted(ids)
+
+
+def test_tombstones_of_other_users_are_not_sent(client, register):
+    owner, other = register(), register()
+    token = sync(client, owner)["sync_token"]
+    vehicle_id = add_vehicle(client, other, "OTHER1")
+    assert client.delete(f"/api/vehicles/{vehicle_id}", headers=other).status_code == 200
+
+    body = sync(client, owner, token)
+
+    assert body["deleted"].get("vehicles", []) == []
+
+
+def test_malformed_token_is_rejected(client, register):
+    headers = register()
+
+    response = client.get("/api/sync", headers=headers, params={"since": "garbage"})
+
+    assert response.status_code == 400
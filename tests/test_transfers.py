@@ -0,0 +1,54 @@
+import asyncio
+
+from bson import ObjectId
+
+
+def add_vehicle(client, headers):
+    response = client.post("/api/vehicles", headers=headers, json={
+        "rego": "XFER01", "vin": "VIN-XFER01", "make": "Honda", "model": "Jazz", "year": 2015
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def initiate(client, headers, vehicle_id):
+    return client.post("/api/transfers/initiate", headers=headers, json={
+        "vehicle_id": vehicle_id,
+        "new_owner_member_number": "M123456",
+        "new_owner_name": "New Owner",
+        "new_owner_email": "buyer@example.com"
+    })
+
+
+def test_transfer_requires_premium(client, register):
+    headers = register()
+
+    response = initiate(client, headers, add_vehicle(client, headers))
+
+    assert response.status_code == 403
+
+
+def test_upgrade_then_transfer(client, register):
+    headers = register()
+    vehicle_id = add_vehicle(client, headers)
+
+    upgrade = client.post("/api/user/upgrade-subscription", headers=headers, json={"subscription_tier": "premium_monthly"})
+    assert upgrade.status_code == 200, upgrade.text
+
+    assert initiate(client, headers, vehicle_id).status_code == 200
+
+
+def test_upgrade_on_another_worker_applies_immediately(client, register, db):
+    headers = register()
+    vehicle_id = add_vehicle(client, headers)
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    # This worker caches the basic-tier record
+    assert client.get("/api/user/notification-preferences", headers=headers).status_code == 200
+
+    # Another worker handles the upgrade, so this worker's cache is not invalidated
+    asyncio.run(db.users.update_one(
+        {"_id": ObjectId(user_id)},
+        {"$set": {"subscription_tier": "premium_annual", "subscription_status": "active"}}
+    ))
+
+    assert initiate(client, headers, vehicle_id).status_code == 200
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import random
+import re
+import time
+from datetime import datetime
+
+import pytest
+
+import migrations
+import server
+import user_repository
+from auth_utils import hash_password
+from db_indexes import INDEXES
+from rate_limit import LoginRateLimiter
+from tests.benchmarks import app_client, mongo_database, ms, percentile, report, requires_mongo
+
+PASSWORD = "secret-password"
+USERS = int(os.getenv("LOGIN_BENCHMARK_USERS", 1_000_000))
+
+
+def user(email, password_hash="x", **fields):
+    return {
+        "email": email, "password": password_hash, "full_name": "Driver", "phone": "0400000000",
+        "member_id": f"MV-{random.randrange(10_000_000):07}", "pin": "1234", "created_at": datetime(2024, 1, 1),
+        "notification_preferences": {"email": True, "push": True}, **fields
+    }
+
+
+def login(client, email, password=PASSWORD):
+    return client.post("/api/auth/login", json={"email": email, "password": password})
+
+
+def test_registration_stores_the_email_lower_cased(client, db):
+    response = client.post("/api/auth/register", json={
+        "email": "  Mixed.Case@Example.COM ", "password": PASSWORD, "full_name": "Driver", "phone": "0400000000"
+    })
+
+    assert response.status_code == 200, response.text
+    assert response.json()["user"]["email"] == "mixed.case@example.com"
+    assert asyncio.run(db.users.count_documents({"email": "mixed.case@example.com"})) == 1
+
+
+def test_login_and_pin_login_ignore_case(client, db):
+    client.post("/api/auth/register", json={
+        "email": "driver@example.com", "password": PASSWORD, "full_name": "Driver", "phone": "0400000000"
+    })
+    pin = asyncio.run(db.users.find_one({"email": "driver@example.com"}))["pin"]
+
+    assert login(client, "Driver@Example.com").status_code == 200
+    assert login(client, "DRIVER@EXAMPLE.COM", "wrong-password").status_code == 401
+    assert client.post("/api/auth/pin-login", json={"email": "DRIVER@example.com", "pin": pin}).status_code == 200
+
+
+def test_registering_the_same_email_in_another_case_is_refused(client):
+    payload = {"password": PASSWORD, "full_name": "Driver", "phone": "0400000000"}
+    client.post("/api/auth/register", json={"email": "driver@example.com", **payload})
+
+    response = client.post("/api/auth/register", json={"email": "Driver@Example.com", **payload})
+
+    assert response.status_code == 400
+
+
+def test_legacy_mixed_case_accounts_can_still_log_in(client, db):
+    asyncio.run(db.users.insert_one(user("Legacy.Driver@example.com", hash_password(PASSWORD))))
+
+    assert login(client, "Legacy.Driver@example.com").status_code == 200
+    assert asyncio.run(user_repository.email_taken(db, "legacy.driver@example.com")) is False
+    assert asyncio.run(user_repository.email_taken(db, "Legacy.Driver@example.com")) is True
+
+
+def test_email_taken_ignores_the_users_own_account(db):
+    async def run():
+        own = (await db.users.insert_one(user("own@example.com"))).inserted_id
+        return (
+            await user_repository.email_taken(db, "Own@Example.com"),
+            await user_repository.email_taken(db, "own@example.com", exclude_user_id=str(own)),
+        )
+
+    assert asyncio.run(run()) == (True, False)
+
+
+def test_login_lookup_only_loads_the_login_fields(db):
+    asyncio.run(db.users.insert_one(user("driver@example.com")))
+
+    found = asyncio.run(user_repository.find_by_email(db, "Driver@Example.com", user_repository.LOGIN_PROJECTION))
+
+    assert set(found) == {"_id", *user_repository.LOGIN_PROJECTION}
+
+
+def test_migration_lower_cases_emails_and_leaves_conflicts(db):
+    async def run():
+        await db.users.insert_many([
+            user("Upper@Example.com"),
+            user(" padded@example.com "),
+            user("taken@example.com"),
+            user("Taken@Example.com"),
+        ])
+        await migrations.normalize_user_emails(db)
+        await migrations.normalize_user_emails(db)
+        return sorted([u["email"] async for u in db.users.find()])
+
+    assert asyncio.run(run()) == ["Taken@Example.com", "padded@example.com", "taken@example.com", "upper@example.com"]
+
+
+@pytest.mark.benchmark
+@requires_mongo
+def test_login_latency_over_a_million_users(monkeypatch):
+    monkeypatch.setattr(server, "login_rate_limiter", LoginRateLimiter(enabled=False))
+    password_hash = hash_password(PASSWORD)
+    rng = random.Random(7)
+    sample = [rng.randrange(USERS) for _ in range(200)]
+
+    async def seed(db):
+        for start in range(0, USERS, 10000):
+            await db.users.insert_many([
+                user(f"user{i}@example.com", password_hash, member_id=f"MV-{i:07}")
+                for i in range(start, min(start + 10000, USERS))
+            ])
+        await db.users.create_indexes(INDEXES["users"])
+
+    async def lookups(find, ids):
+        timings = []
+        for i in ids:
+            started = time.perf_counter()
+            assert await find(i)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    async def run():
+        async with mongo_database("login_benchmark") as db:
+            monkeypatch.setattr(server, "db", db)
+            await seed(db)
+            normalized = await lookups(lambda i: user_repository.find_by_email(
+                db, f"User{i}@Example.com", user_repository.LOGIN_PROJECTION), sample)
+            # Matching case-insensitively instead of normalizing cannot use the email index bounds
+            case_insensitive = await lookups(lambda i: db.users.find_one(
+                {"email": {"$regex": f"^{re.escape(f'user{i}@example.com')}$", "$options": "i"}},
+                user_repository.LOGIN_PROJECTION), sample[:5])
+            logins = []
+            async with app_client(server.app) as client:
+                # bcrypt dominates a full login, so a few are enough
+                for i in sample[:5]:
+                    started = time.perf_counter()
+                    response = await client.post("/api/auth/login", json={"email": f"User{i}@Example.com", "password": PASSWORD})
+                    logins.append(time.perf_counter() - started)
+                    assert response.status_code == 200
+            return normalized, case_insensitive, logins
+
+    normalized, case_insensitive, logins = asyncio.run(run())
+    report(f"login over {USERS} users, p50/p95",
+           normalized_lookup=f"{ms(percentile(normalized, 50))}/{ms(percentile(normalized, 95))}",
+           case_insensitive_regex=f"{ms(percentile(case_insensitive, 50))}/{ms(percentile(case_insensitive, 95))}",
+           full_login_with_bcrypt=f"{ms(percentile(logins, 50))}/{ms(percentile(logins, 95))}")
+    assert percentile(normalized, 95) < 0.01
@@ -0,0 +1,133 @@
+"""
+Throughput of `uvicorn server:app --workers N` for 1, 2, 4 and 8 workers against BENCHMARK_MONGO_URL.
+The load generator runs in this process, so give the machine more cores than the largest worker count.
+"""
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import pytest
+
+from tests.benchmarks import BENCHMARK_MONGO_URL, mongo_database, ms, percentile, report, requires_mongo
+
+pytestmark = [pytest.mark.benchmark, requires_mongo]
+
+BACKEND = Path(__file__).resolve().parent.parent / "backend"
+WORKER_COUNTS = [int(n) for n in os.getenv("BENCHMARK_WORKERS", "1,2,4,8").split(",")]
+DURATION_SECONDS = float(os.getenv("BENCHMARK_DURATION_SECONDS", 10))
+CONCURRENCY = int(os.getenv("BENCHMARK_CONCURRENCY", 64))
+# An authenticated list read and a public cached read, as the home screen sends them
+MIX = ["/api/vehicles", "/api/promotions"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            assert server.poll() is None, "uvicorn exited during startup"
+            try:
+                if (await client.get("/api/promotions")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError("uvicorn did not start in time")
+
+
+def start_server(workers: int, port: int, db_name: str) -> subprocess.Popen:
+    env = {**os.environ, "MONGO_URL": BENCHMARK_MONGO_URL, "DB_NAME": db_name}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND, env=env
+    )
+
+
+def stop_server(server: subprocess.Popen):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+async def load(base_url: str, headers: dict) -> tuple:
+    """Closed-loop load: CONCURRENCY clients each send their next request as soon as the last one returns"""
+    timings = []
+    errors = 0
+    deadline = time.monotonic() + DURATION_SECONDS
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+        async def user(i):
+            nonlocal errors
+            n = i
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                response = await client.get(MIX[n % len(MIX)])
+                timings.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+                n += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(CONCURRENCY)))
+        return timings, errors, time.perf_counter() - started
+
+
+async def seed(db, base_url: str) -> dict:
+    """Register the benchmark user through the API and give them a garage of vehicles"""
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        response = await client.post("/api/auth/register", json={
+            "email": "throughput@example.com", "password": "secret-password", "full_name": "Load", "phone": "0400000000"
+        })
+        response.raise_for_status()
+    body = response.json()
+    now = datetime.utcnow()
+    await db.vehicles.insert_many([
+        {"user_id": body["user"]["id"], "rego": f"LOAD{i:02}", "vin": f"VIN-LOAD{i:02}", "make": "Toyota",
+         "model": "Camry", "year": 2020, "created_at": now, "updated_at": now}
+        for i in range(20)
+    ])
+    return {"Authorization": f"Bearer {body['access_token']}"}
+
+
+def test_throughput_across_worker_counts():
+    async def run():
+        results = {}
+        async with mongo_database("workers_benchmark") as db:
+            headers = None
+            for workers in WORKER_COUNTS:
+                port = free_port()
+                base_url = f"http://127.0.0.1:{port}"
+                server = start_server(workers, port, db.name)
+                try:
+                    await wait_until_ready(base_url, server)
+                    if headers is None:
+                        headers = await seed(db, base_url)
+                    timings, errors, elapsed = await load(base_url, headers)
+                    status = await db.client.admin.command("serverStatus")
+                    results[workers] = (len(timings) / elapsed, percentile(timings, 95), errors,
+                                        status["connections"]["current"])
+                finally:
+                    stop_server(server)
+        return results
+
+    results = asyncio.run(run())
+    for workers, (rps, p95, errors, connections) in results.items():
+        report(f"{workers} worker(s), {CONCURRENCY} concurrent clients for {DURATION_SECONDS:.0f} s",
+               requests_per_second=f"{rps:.0f}", p95=ms(p95), errors=errors, mongo_connections=connections)
+    assert all(errors == 0 for _, _, errors, _ in results.values())